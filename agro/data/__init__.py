@@ -0,0 +1,61 @@
+from agro.data.loader import (
+    DATA_DIR,
+    DATASETS,
+    normalizar_texto,
+    normalizar_nombre,
+    version_dataset,
+    singleton_versionado,
+    cargar_dataset,
+    cargar_cultivos,
+    cargar_demanda,
+    cargar_terreno,
+    cargar_equivalencias,
+    cargar_calendario,
+    cargar_eficiencia,
+    cargar_recursos,
+    cargar_historial,
+    cargar_clima,
+    obtener_mapas_provincias,
+    limpiar_cache,
+)
+from agro.data.cubo_demanda import (
+    CuboDemanda,
+    como_cubo,
+    obtener_cubo_demanda,
+)
+from agro.data.costes import (
+    COSTE_GENERICO,
+    TablaCostes,
+    obtener_tabla_costes,
+)
+from agro.data.ventanas_siembra import (
+    VentanasSiembra,
+    meses_ventana,
+    obtener_ventanas_siembra,
+)
+from agro.data.recursos import (
+    HORAS_MES_POR_MAQUINA,
+    TARIFA_HORA_MAQUINARIA,
+    CatalogoRecursos,
+    horas_maquinaria_kg,
+    obtener_catalogo_recursos,
+)
+from agro.data.historial import (
+    FAMILIAS_BOTANICAS,
+    HistorialCultivos,
+    normalizar_familia,
+    familia_cultivo,
+    familias_por_cultivo,
+    obtener_historial_cultivos,
+)
+from agro.data.escenarios import (
+    DistribucionesMercado,
+    obtener_distribuciones_mercado,
+)
+from agro.data.compatibilidad import (
+    UMBRAL_APTITUD,
+    USOS_APTITUD,
+    MatrizCompatibilidad,
+    filtrar_aptitud,
+    obtener_matriz_compatibilidad,
+)
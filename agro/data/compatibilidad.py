@@ -0,0 +1,158 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+from agro.data.loader import cargar_cultivos, cargar_terreno, cargar_clima, normalizar_nombre, normalizar_texto, singleton_versionado
+
+# -------------------------------
+# Matriz de compatibilidad cultivo x perfil de suelo x clima
+# -------------------------------
+# El catálogo trae el suelo requerido, el rango de pH y el rango de temperatura óptima de cada cultivo, pero
+# los motores no los usaban. Aquí precalculo una vez una puntuación de aptitud entre 0 y 1 para cada
+# combinación de cultivo, textura del suelo, clase de pH y provincia con datos de clima
+# (clima_provincia_completo_variado.csv). En cada petición basta con una consulta a la matriz, sin
+# operaciones de texto sobre el catálogo. La aptitud es el producto de tres factores:
+#   - textura: 1 si coincide con la requerida y 0,25 menos por cada paso de distancia en la escala
+#     arenoso -> franco-arenoso -> franco -> franco-arcilloso -> arcilloso (el limoso queda entre el franco
+#     y el franco-arcilloso);
+#   - pH: 1 dentro del rango óptimo, bajando linealmente hasta 0 a TOLERANCIA_PH unidades fuera de él;
+#   - clima: meses con temperatura media dentro del rango óptimo respecto a los meses del ciclo (máximo 1).
+# Cada eje tiene una última posición "desconocido" con factor 1, para perfiles sin textura, pH o clima.
+POSICION_TEXTURA = {
+    "arenoso": 0.0,
+    "franco-arenoso": 1.0,
+    "franco": 2.0,
+    "limoso": 2.5,
+    "franco-arcilloso": 3.0,
+    "arcilloso": 4.0,
+}
+PENALIZACION_PASO_TEXTURA = 0.25
+CLASES_PH = np.round(np.arange(4.5, 9.01, 0.25), 2)
+TOLERANCIA_PH = 1.0
+MESES_CLIMA = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+UMBRAL_APTITUD = 0.5  # aptitud mínima para que un cultivo pase el filtro
+USOS_APTITUD = ("filtro", "ponderar")
+
+_TEXTURAS = list(POSICION_TEXTURA)
+
+
+# Factor de textura (cultivos x texturas) a partir de la distancia en la escala de POSICION_TEXTURA
+def _factor_textura(requerida):
+    posicion = np.array([POSICION_TEXTURA.get(t, np.nan) for t in requerida])
+    distancia = np.abs(posicion[:, None] - np.array(list(POSICION_TEXTURA.values()))[None, :])
+    factor = np.clip(1 - PENALIZACION_PASO_TEXTURA * distancia, 0, 1)
+    return np.where(np.isnan(factor), 1.0, factor)
+
+
+# Factor de pH (cultivos x clases de pH): distancia de la clase al rango óptimo del cultivo
+def _factor_ph(ph_min, ph_max):
+    fuera = np.maximum(ph_min[:, None] - CLASES_PH[None, :], 0) + np.maximum(CLASES_PH[None, :] - ph_max[:, None], 0)
+    factor = np.clip(1 - fuera / TOLERANCIA_PH, 0, 1)
+    return np.where(np.isnan(factor), 1.0, factor)
+
+
+# Factor de clima (cultivos x provincias): meses con temperatura media dentro del rango del cultivo
+# respecto a los meses que dura su ciclo
+def _factor_clima(t_min, t_max, meses_ciclo, temperaturas):
+    viables = ((temperaturas[None, :, :] >= t_min[:, None, None]) & (temperaturas[None, :, :] <= t_max[:, None, None])).sum(axis=2)
+    factor = np.clip(viables / meses_ciclo[:, None], 0, 1)
+    return np.where(np.isnan(t_min)[:, None] | np.isnan(t_max)[:, None], 1.0, factor)
+
+
+class MatrizCompatibilidad:
+    def __init__(self, cultivos_df, terreno_df, clima_df):
+        cultivos = cultivos_df.drop_duplicates("Nombre_cultivo", keep="last")
+        self.cultivos = cultivos["Nombre_cultivo"].tolist()
+        # Fila de la matriz de cada fila del catálogo (un cultivo repetido usa su última aparición), para
+        # devolver la aptitud en el mismo orden que el catálogo que reciben los motores
+        self._fila = pd.Index(self.cultivos).get_indexer(cultivos_df["Nombre_cultivo"])
+        requerida = normalizar_texto(cultivos["Tipo_suelo_requerido"]).to_numpy()
+        meses_ciclo = np.clip(np.ceil(cultivos["Duración_cultivo_días"].to_numpy(dtype=float) / 30), 1, 12)
+
+        clima = clima_df.dropna(subset=["Clave_provincia"]).drop_duplicates("Clave_provincia")
+        self._clima = {p: i for i, p in enumerate(clima["Clave_provincia"])}
+        self.zonas = dict(zip(clima["Provincia"], clima["Zona_climática"]))
+        temperaturas = clima[[f"Temp_media_{mes}" for mes in MESES_CLIMA]].to_numpy(dtype=float)
+
+        # Añado la posición "desconocido" (factor 1) al final de cada eje
+        unos = np.ones((len(cultivos), 1))
+        textura = np.hstack([_factor_textura(requerida), unos])
+        ph = np.hstack([_factor_ph(cultivos["pH_optimo_min"].to_numpy(dtype=float), cultivos["pH_optimo_max"].to_numpy(dtype=float)), unos])
+        factor_clima = np.hstack([
+            _factor_clima(
+                cultivos["Temperatura_optima_min"].to_numpy(dtype=float), cultivos["Temperatura_optima_max"].to_numpy(dtype=float),
+                meses_ciclo, temperaturas
+            ),
+            unos,
+        ])
+        self.puntuacion = (
+            textura[:, :, None, None] * ph[:, None, :, None] * factor_clima[:, None, None, :]
+        ).astype(np.float32)
+
+        # Perfil de cada terreno de terreno_suelo_final.csv (textura, pH y provincia)
+        self._terrenos = {
+            int(i): {"tipo_suelo": tipo, "ph_suelo": ph_suelo, "provincia": provincia}
+            for i, tipo, ph_suelo, provincia in zip(
+                terreno_df["ID_terreno"], terreno_df["Tipo_suelo"], terreno_df["pH_suelo"], terreno_df["Ubicación"]
+            )
+        }
+
+        h = hashlib.sha256()
+        h.update(pd.util.hash_pandas_object(pd.Series(self.cultivos), index=False).to_numpy().tobytes())
+        h.update(self._fila.tobytes())
+        h.update(self.puntuacion.tobytes())
+        self._huella = h.hexdigest()
+
+    @property
+    def forma(self):
+        return self.puntuacion.shape
+
+    def indice_textura(self, tipo_suelo):
+        clave = normalizar_nombre(tipo_suelo)
+        return _TEXTURAS.index(clave) if clave in POSICION_TEXTURA else len(_TEXTURAS)
+
+    def indice_ph(self, ph_suelo):
+        if ph_suelo is None or pd.isna(ph_suelo):
+            return len(CLASES_PH)
+        return int(np.abs(CLASES_PH - float(ph_suelo)).argmin())
+
+    # Primera provincia de la lista con datos de clima (p. ej. la del usuario y, si no, su equivalente)
+    def indice_clima(self, *provincias):
+        for provincia in provincias:
+            clave = normalizar_nombre(provincia)
+            if clave in self._clima:
+                return self._clima[clave]
+        return len(self._clima)
+
+    # Aptitud de todo el catálogo para un perfil: una sola consulta a la matriz. Devuelvo un array alineado con
+    # las filas del catálogo, para que los motores lo indexen por posición sin buscar cada cultivo por nombre
+    def aptitud(self, tipo_suelo=None, ph_suelo=None, provincias=()):
+        columna = self.puntuacion[:, self.indice_textura(tipo_suelo), self.indice_ph(ph_suelo), self.indice_clima(*provincias)]
+        return columna.astype(float).round(4)[self._fila]
+
+    def perfil_terreno(self, id_terreno):
+        return self._terrenos.get(int(id_terreno))
+
+    # Huella de la matriz de puntuaciones y del orden de cultivos con el que se indexa
+    def huella(self):
+        return self._huella
+
+
+# Factor de aptitud por fila del catálogo y máscara de los cultivos que pasan: con "filtro" descarto los que
+# quedan bajo UMBRAL_APTITUD y con "ponderar" solo los de aptitud 0
+def filtrar_aptitud(aptitud, n_cultivos, uso_aptitud):
+    if uso_aptitud not in USOS_APTITUD:
+        raise ValueError(f"Uso de la aptitud no soportado: {uso_aptitud}")
+    factor = np.asarray(aptitud, dtype=float)
+    if factor.shape != (n_cultivos,):
+        raise ValueError(f"La aptitud tiene {factor.size} valores y el catálogo {n_cultivos} cultivos")
+    return factor, factor >= (UMBRAL_APTITUD if uso_aptitud == "filtro" else np.finfo(float).tiny)
+
+
+# Matriz compartida por todo el proceso, reconstruida solo si cambia el catálogo, el terreno o el clima
+@singleton_versionado("cultivos", "terreno", "clima")
+def obtener_matriz_compatibilidad():
+    return MatrizCompatibilidad(cargar_cultivos(copiar=False), cargar_terreno(copiar=False), cargar_clima(copiar=False))
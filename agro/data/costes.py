@@ -0,0 +1,86 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+from agro.data.loader import cargar_eficiencia, normalizar_nombre, normalizar_texto, singleton_versionado
+
+# -------------------------------
+# Tabla de costes por (cultivo, provincia)
+# -------------------------------
+# eficiencia_productiva.csv trae, por cultivo y provincia, el coste total estimado por kg (agua, fertilizante,
+# fitosanitarios, semilla, mano de obra, transporte) y los litros de agua por kg. La preparo una vez por
+# proceso y la consulto de forma vectorizada para listas completas de cultivos. El CSV no cubre todas las
+# combinaciones, así que uso una cascada: (cultivo, provincia) -> media del cultivo en las provincias que
+# sí aparecen -> valor por defecto (el coste genérico de siempre; para el resto de medidas, la media de la tabla).
+# La cascada se resuelve una sola vez por provincia y se guarda como una serie por cultivo, de modo que
+# cada consulta es un reindex sobre la serie ya preparada.
+COSTE_GENERICO = 0.30  # €/kg, coste estimado cuando no hay datos del cultivo
+
+
+class TablaCostes:
+    def __init__(self, eficiencia_df, coste_defecto=COSTE_GENERICO):
+        eficiencia_df = eficiencia_df.dropna(subset=["Cultivo", "Provincia"])
+        claves = pd.MultiIndex.from_arrays(
+            [normalizar_texto(eficiencia_df["Cultivo"]).to_numpy(), normalizar_texto(eficiencia_df["Provincia"]).to_numpy()],
+            names=["cultivo", "provincia"],
+        )
+        medidas = pd.DataFrame({
+            "coste_kg": eficiencia_df["Coste_total_estimado_€/kg"].to_numpy(),
+            "agua_l_kg": eficiencia_df["Agua_litros_por_kg"].to_numpy(),
+            "siembra_kg": eficiencia_df["Siembra_€/kg"].to_numpy(),
+            "recoleccion_kg": eficiencia_df["Recolección_€/kg"].to_numpy(),
+        }, index=claves)
+        self._exacto = medidas[~medidas.index.duplicated()]
+        self._por_cultivo = self._exacto.groupby(level="cultivo").mean()
+        # Sin datos del cultivo: coste genérico para el coste total y media de la tabla para el resto de medidas
+        self._defecto = {columna: float(self._exacto[columna].mean()) for columna in medidas.columns}
+        self._defecto["coste_kg"] = coste_defecto
+        self._provincias = set(self._exacto.index.get_level_values("provincia"))
+        self._por_provincia = {}
+
+        h = hashlib.sha256(repr(coste_defecto).encode())
+        h.update(pd.util.hash_pandas_object(self._exacto, index=True, categorize=False).to_numpy().tobytes())
+        self._huella = h.hexdigest()
+
+    def __len__(self):
+        return len(self._exacto)
+
+    # Serie por cultivo con la cascada ya aplicada para una provincia (None = solo medias por cultivo)
+    def _serie_provincia(self, columna, clave_provincia):
+        serie = self._por_provincia.get((columna, clave_provincia))
+        if serie is None:
+            serie = self._por_cultivo[columna].dropna()
+            if clave_provincia in self._provincias:
+                exacto = self._exacto[columna].xs(clave_provincia, level="provincia").dropna()
+                serie = pd.concat([exacto, serie[~serie.index.isin(exacto.index)]])
+            self._por_provincia[columna, clave_provincia] = serie
+        return serie
+
+    def _consultar(self, columna, productos, provincia):
+        clave_provincia = normalizar_nombre(provincia) if isinstance(provincia, str) else None
+        # Normalizo la lista entera de una vez (cada nombre distinto una sola vez) y cruzo con un reindex
+        claves_cultivo = normalizar_texto(pd.Series(list(productos), dtype=object)).to_numpy()
+        valores = self._serie_provincia(columna, clave_provincia).reindex(claves_cultivo).to_numpy(dtype=float)
+        return np.where(np.isnan(valores), self._defecto[columna], valores)
+
+    # Coste estimado en €/kg para cada cultivo de la lista en la provincia indicada
+    def coste_kg(self, productos, provincia=None):
+        return self._consultar("coste_kg", productos, provincia)
+
+    # Litros de agua por kg producido para cada cultivo de la lista en la provincia indicada
+    def agua_l_kg(self, productos, provincia=None):
+        return self._consultar("agua_l_kg", productos, provincia)
+
+    # Coste de las labores de siembra y de recolección en €/kg (base para estimar horas de maquinaria)
+    def labores_kg(self, productos, provincia=None):
+        return self._consultar("siembra_kg", productos, provincia), self._consultar("recoleccion_kg", productos, provincia)
+
+    # Huella de la tabla exacta (cultivo, provincia) y del coste genérico con el que se rellenan los huecos
+    def huella(self):
+        return self._huella
+
+
+# Tabla compartida por todo el proceso, reconstruida solo si el CSV cambia en disco
+@singleton_versionado("eficiencia")
+def obtener_tabla_costes():
+    return TablaCostes(cargar_eficiencia(copiar=False))
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from agro.data.loader import cargar_demanda, singleton_versionado
+
+# -------------------------------
+# Cubo de demanda preagregado
+# -------------------------------
+# En lugar de agrupar las transacciones de demanda_clientes.csv en cada petición, las agrego una vez
+# por (Producto, Mes, Tipo_cliente) guardando sumas y recuentos. Como solo guardo magnitudes aditivas,
+# puedo añadir compras nuevas sin recalcular el histórico, y de ahí salen tanto los totales anuales
+# por producto como la demanda mensual que necesitan las restricciones por mes.
+DIMENSIONES = ["Producto", "Mes", "Tipo_cliente"]
+MEDIDAS = ["kg", "suma_precio", "n_precios", "compras"]
+
+
+def _agregar(transacciones):
+    # Mes 0 = fecha de compra desconocida: la compra cuenta en los totales anuales pero no en ningún mes
+    mes = pd.to_datetime(transacciones["Fecha_compra"], format="%Y-%m-%d", errors="coerce").dt.month.fillna(0).astype(int)
+    precio = transacciones["Precio_kg_€"]
+    tabla = pd.DataFrame({
+        "Producto": transacciones["Producto"].to_numpy(),
+        "Mes": mes.to_numpy(),
+        "Tipo_cliente": transacciones["Tipo_cliente"].fillna("desconocido").to_numpy(),
+        "kg": transacciones["Kg_comprados"].fillna(0).to_numpy(),
+        "suma_precio": precio.fillna(0).to_numpy(),
+        "n_precios": precio.notna().to_numpy().astype(int),
+        "compras": 1,
+    })
+    return tabla.groupby(DIMENSIONES, sort=True)[MEDIDAS].sum()
+
+
+def _primer_precio(transacciones):
+    # Precio de la primera compra registrada de cada producto (criterio del motor de monocultivo)
+    primera = ~transacciones["Producto"].duplicated()
+    return pd.Series(
+        transacciones["Precio_kg_€"].to_numpy()[primera.to_numpy()],
+        index=transacciones["Producto"].to_numpy()[primera.to_numpy()],
+    )
+
+
+class CuboDemanda:
+    def __init__(self, tabla, primer_precio):
+        self.tabla = tabla
+        self.primer_precio = primer_precio
+        self._lock = threading.Lock()
+        self._invalidar()
+
+    @classmethod
+    def desde_transacciones(cls, transacciones):
+        return cls(_agregar(transacciones), _primer_precio(transacciones))
+
+    # El lock no se puede serializar: lo excluyo para poder enviar el cubo a otros procesos
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        del estado["_lock"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
+
+    def _invalidar(self):
+        self._por_producto = None
+        self._mensual = None
+        self._huella = None
+
+    # Añado nuevas compras sumando sus agregados a los existentes, sin volver a leer el histórico
+    def anadir(self, transacciones):
+        nuevo = _agregar(transacciones)
+        nuevos_precios = _primer_precio(transacciones)
+        with self._lock:
+            self.tabla = self.tabla.add(nuevo, fill_value=0).astype({"n_precios": int, "compras": int})
+            faltan = ~nuevos_precios.index.isin(self.primer_precio.index)
+            self.primer_precio = pd.concat([self.primer_precio, nuevos_precios[faltan]])
+            self._invalidar()
+        return self
+
+    @property
+    def productos(self):
+        return self.por_producto().index
+
+    @property
+    def n_transacciones(self):
+        return int(self.tabla["compras"].sum())
+
+    # Totales anuales por producto: kg demandados, precio medio y precio de la primera compra
+    def por_producto(self):
+        if self._por_producto is None:
+            totales = self.tabla.groupby(level="Producto", sort=False)[MEDIDAS].sum()
+            resumen = pd.DataFrame({
+                "demanda_total_kg": totales["kg"],
+                "precio_medio": totales["suma_precio"] / totales["n_precios"].replace(0, np.nan),
+            })
+            resumen["precio_primera_compra"] = self.primer_precio.reindex(resumen.index)
+            self._por_producto = resumen
+        return self._por_producto
+
+    # Demanda mensual en kg: una fila por producto y columnas 1..12 (se ignoran las compras sin fecha)
+    def mensual(self):
+        if self._mensual is None:
+            kg = self.tabla["kg"].groupby(level=["Producto", "Mes"]).sum().unstack("Mes", fill_value=0.0)
+            self._mensual = kg.reindex(columns=range(1, 13), fill_value=0.0)
+        return self._mensual
+
+    # Huella de los agregados por producto y mes y del primer precio; cambia con cada anadir()
+    def huella(self):
+        if self._huella is None:
+            h = hashlib.sha256()
+            h.update(pd.util.hash_pandas_object(self.tabla, index=True, categorize=False).to_numpy().tobytes())
+            h.update(pd.util.hash_pandas_object(self.primer_precio, index=True, categorize=False).to_numpy().tobytes())
+            self._huella = h.hexdigest()
+        return self._huella
+
+
+# Acepto tanto un cubo ya construido como el DataFrame de transacciones de siempre
+def como_cubo(demanda):
+    if isinstance(demanda, CuboDemanda):
+        return demanda
+    return CuboDemanda.desde_transacciones(demanda)
+
+
+# Cubo compartido por todo el proceso, construido a partir de demanda_clientes.csv y
+# reconstruido solo si el archivo cambia en disco
+@singleton_versionado("demanda")
+def obtener_cubo_demanda():
+    return CuboDemanda.desde_transacciones(cargar_demanda(copiar=False))
@@ -0,0 +1,101 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+from agro.data.loader import cargar_demanda, cargar_calendario, normalizar_texto, singleton_versionado
+
+# -------------------------------
+# Distribuciones de precio y rendimiento para escenarios
+# -------------------------------
+# Los motores trabajan con el precio medio y el rendimiento promedio. Para las bandas de riesgo muestreo:
+#   - precio: remuestreo (bootstrap) de los precios observados de cada producto en demanda_clientes.csv,
+#     multiplicado por un factor lognormal de media 1 con la dispersión entre provincias del precio en
+#     calendario_cultivos_actualizado.csv (coeficiente de variación por cultivo);
+#   - rendimiento: factor lognormal de media 1 con el coeficiente de variación entre provincias del
+#     rendimiento en el mismo calendario (los cultivos sin dispersión quedan con factor 1).
+# Todo se prepara una vez en matrices por producto para muestrear miles de escenarios con numpy.
+
+
+# Coeficiente de variación (desviación / media) de una columna por cultivo
+def _cv_por_cultivo(claves, valores):
+    agregado = pd.Series(valores.to_numpy(dtype=float)).groupby(claves.to_numpy()).agg(["mean", "std"])
+    return (agregado["std"].fillna(0) / agregado["mean"]).replace([np.inf, -np.inf], 0).fillna(0)
+
+
+# Claves normalizadas de una lista de productos, de una vez (cada nombre distinto se normaliza una sola vez)
+def _claves(productos):
+    return normalizar_texto(pd.Series(list(productos), dtype=object)).to_numpy()
+
+
+# Factores lognormales de media 1 con el coeficiente de variación de cada columna
+def _factor_lognormal(rng, cv, n):
+    sigma = np.sqrt(np.log1p(np.square(cv)))
+    return np.exp(rng.standard_normal((n, len(cv))) * sigma - sigma ** 2 / 2)
+
+
+class DistribucionesMercado:
+    def __init__(self, demanda_df, calendario_df):
+        demanda = demanda_df.dropna(subset=["Producto", "Precio_kg_€"])
+        claves = normalizar_texto(demanda["Producto"])
+        precios = demanda["Precio_kg_€"].to_numpy(dtype=float)
+        orden = np.argsort(claves.to_numpy(), kind="stable")
+        claves_ordenadas = claves.to_numpy()[orden]
+        # Precios observados en una matriz por producto (rellena con NaN) y número de observaciones por fila
+        self._productos, inicio, conteos = np.unique(claves_ordenadas, return_index=True, return_counts=True)
+        self._fila = pd.Series(np.arange(len(self._productos)), index=self._productos)
+        self._precios = np.full((len(self._productos), conteos.max() if len(conteos) else 0), np.nan)
+        for i, (desde, n) in enumerate(zip(inicio, conteos)):
+            self._precios[i, :n] = precios[orden][desde:desde + n]
+        self._conteos = conteos
+
+        calendario = calendario_df.dropna(subset=["Cultivo"])
+        clave_cultivo = normalizar_texto(calendario["Cultivo"])
+        self._cv_precio = _cv_por_cultivo(clave_cultivo, calendario["Precio_promedio_kg (€)"])
+        self._cv_rendimiento = _cv_por_cultivo(clave_cultivo, calendario["Rendimiento_promedio (kg/ha)"])
+
+        h = hashlib.sha256()
+        h.update(pd.util.hash_pandas_object(pd.Series(self._productos), index=False).to_numpy().tobytes())
+        h.update(np.nan_to_num(self._precios).tobytes())
+        h.update(self._cv_precio.to_numpy().tobytes())
+        h.update(self._cv_rendimiento.to_numpy().tobytes())
+        self._huella = h.hexdigest()
+
+    def __len__(self):
+        return len(self._productos)
+
+    def cv_precio(self, productos):
+        return self._cv_precio.reindex(_claves(productos)).fillna(0).to_numpy()
+
+    def cv_rendimiento(self, productos):
+        return self._cv_rendimiento.reindex(_claves(productos)).fillna(0).to_numpy()
+
+    # Muestras (n x productos) de precio en €/kg y de factor de rendimiento. Los productos sin precios observados
+    # usan `precio_referencia` (dict) como base del factor de provincia; si tampoco está, su precio es NaN.
+    def muestrear(self, productos, n, rng=None, precio_referencia=None):
+        rng = np.random.default_rng(rng)
+        precio_referencia = precio_referencia or {}
+        claves = _claves(productos)
+        filas = self._fila.reindex(claves).fillna(-1).to_numpy(dtype=np.int64)
+        conocidos = filas >= 0
+
+        precios = np.empty((n, len(productos)))
+        if conocidos.any():
+            conteos = self._conteos[filas[conocidos]]
+            columnas = (rng.random((n, conocidos.sum())) * conteos).astype(int)
+            precios[:, conocidos] = self._precios[filas[conocidos], columnas]
+        referencia = np.array([precio_referencia.get(p, np.nan) for p in np.asarray(productos, dtype=object)[~conocidos]])
+        precios[:, ~conocidos] = referencia
+        precios *= _factor_lognormal(rng, self._cv_precio.reindex(claves).fillna(0).to_numpy(), n)
+
+        factores_rendimiento = _factor_lognormal(rng, self._cv_rendimiento.reindex(claves).fillna(0).to_numpy(), n)
+        return precios, factores_rendimiento
+
+    # Huella de lo que se muestrea: productos, precios observados y dispersiones por cultivo
+    def huella(self):
+        return self._huella
+
+
+# Distribuciones compartidas por todo el proceso, reconstruidas solo si cambia la demanda o el calendario
+@singleton_versionado("demanda", "calendario")
+def obtener_distribuciones_mercado():
+    return DistribucionesMercado(cargar_demanda(copiar=False), cargar_calendario(copiar=False))
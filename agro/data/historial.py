@@ -0,0 +1,111 @@
+import hashlib
+import pandas as pd
+
+from agro.data.loader import cargar_historial, cargar_cultivos, normalizar_nombre, normalizar_texto, singleton_versionado
+
+# -------------------------------
+# Historial de cultivos por terreno y familias botánicas
+# -------------------------------
+# historial_cultivos_final_limpio.csv registra lo que se sembró en cada terreno (id_terreno), con fechas,
+# rendimiento y margen. Lo uso como estado inicial de la planificación plurianual: qué familias ocuparon
+# cada terreno en su última campaña y en cuánta superficie. La columna `familia` del CSV no es coherente
+# (el mismo cultivo aparece con familias distintas), así que la familia de cada cultivo sale de la tabla
+# botánica de abajo y la del CSV solo se usa, normalizando sinónimos, para cultivos que no estén en ella.
+FAMILIAS_BOTANICAS = {
+    "Solanácea": ["Tomate", "Pimiento", "Berenjena"],
+    "Asterácea": ["Lechuga", "Alcachofa", "Escarola", "Endivia", "Achicoria", "Cardo"],
+    "Apiácea": ["Zanahoria", "Apio"],
+    "Amarilidácea": ["Cebolla", "Ajo", "Puerro"],
+    "Cucurbitácea": ["Pepino", "Calabacín", "Pepinillo"],
+    "Quenopodiácea": ["Espinaca", "Remolacha", "Acelga", "Acelga de verano", "Bledo"],
+    "Brassicácea": [
+        "Repollo", "Brócoli", "Coliflor", "Nabo", "Rábano", "Col rizada", "Mostaza verde", "Berro", "Berza",
+        "Coles de Bruselas", "Mizuna", "Pak Choi", "Rúcula",
+    ],
+    "Leguminosa": ["Guisante", "Habas", "Judía verde"],
+    "Valerianácea": ["Canónigos"],
+}
+# Nombres alternativos de una misma familia que aparecen en el historial
+SINONIMOS_FAMILIA = {
+    "compuesta": "Asterácea",
+    "umbelifera": "Apiácea",
+    "crucifera": "Brassicácea",
+    "brasicacea": "Brassicácea",
+    "liliacea": "Amarilidácea",
+}
+
+_FAMILIA_POR_CULTIVO = {normalizar_nombre(c): f for f, cultivos in FAMILIAS_BOTANICAS.items() for c in cultivos}
+_FAMILIAS = {normalizar_nombre(f): f for f in FAMILIAS_BOTANICAS}
+
+
+# Nombre canónico de una familia (resuelve sinónimos y variantes de tildes/mayúsculas)
+def normalizar_familia(familia):
+    if not isinstance(familia, str) or not familia.strip():
+        return None
+    clave = normalizar_nombre(familia)
+    return SINONIMOS_FAMILIA.get(clave) or _FAMILIAS.get(clave) or familia.strip().capitalize()
+
+
+# Familia botánica de un cultivo (None si no está en la tabla)
+def familia_cultivo(cultivo):
+    return _FAMILIA_POR_CULTIVO.get(normalizar_nombre(cultivo))
+
+
+def familias_por_cultivo(productos):
+    return {p: familia_cultivo(p) for p in productos if familia_cultivo(p) is not None}
+
+
+class HistorialCultivos:
+    def __init__(self, historial_df, cultivos_df):
+        historial = pd.DataFrame({
+            "id_terreno": historial_df["id_terreno"].to_numpy(),
+            "Cultivo": historial_df["Nombre_cultivo"].to_numpy(),
+            "Año": pd.to_datetime(historial_df["fecha_siembra"], errors="coerce").dt.year.to_numpy(),
+        })
+        familia_botanica = normalizar_texto(historial["Cultivo"]).map(_FAMILIA_POR_CULTIVO)
+        familia_registrada = historial_df["familia"].map(normalizar_familia).to_numpy()
+        historial["Familia"] = familia_botanica.fillna(pd.Series(familia_registrada, index=historial.index))
+
+        # Superficie estimada de cada siembra: unidades sembradas / plantas por m² del catálogo
+        unidades_m2 = cultivos_df.set_index("Clave_cultivo")["Unidades_m2"]
+        unidades_m2 = unidades_m2[~unidades_m2.index.duplicated()]
+        plantas_m2 = normalizar_texto(historial["Cultivo"]).map(unidades_m2).to_numpy(dtype=float)
+        historial["Superficie_ha"] = historial_df["unidades_sembradas_total"].to_numpy(dtype=float) / plantas_m2 / 10000
+        historial["Margen_€"] = pd.to_numeric(
+            historial_df["margen_neto_total (€)"].astype(str).str.replace("€", "", regex=False).str.strip(), errors="coerce"
+        ).to_numpy()
+
+        self._historial = historial.dropna(subset=["id_terreno", "Año"]).sort_values(["id_terreno", "Año"]).reset_index(drop=True)
+        self.terrenos = tuple(sorted(int(t) for t in self._historial["id_terreno"].unique()))
+
+        h = hashlib.sha256()
+        h.update(pd.util.hash_pandas_object(self._historial, index=False, categorize=False).to_numpy().tobytes())
+        self._huella = h.hexdigest()
+
+    def __len__(self):
+        return len(self._historial)
+
+    def de_terreno(self, id_terreno):
+        return self._historial[self._historial["id_terreno"] == id_terreno].reset_index(drop=True)
+
+    # Año y superficie (ha) por familia de la última campaña registrada del terreno. Si no se puede estimar
+    # la superficie de una siembra, supongo que ocupó todo el terreno (superficie_terreno_ha o infinito).
+    def ultima_campana(self, id_terreno, superficie_terreno_ha=None):
+        registros = self.de_terreno(id_terreno)
+        if registros.empty:
+            return None, {}
+        año = int(registros["Año"].max())
+        ultima = registros[registros["Año"] == año].dropna(subset=["Familia"])
+        completa = float("inf") if superficie_terreno_ha is None else superficie_terreno_ha
+        superficie = ultima["Superficie_ha"].fillna(completa).clip(upper=completa)
+        return año, superficie.groupby(ultima["Familia"]).sum().clip(upper=completa).to_dict()
+
+    # Huella del historial ya limpio: años, familias resueltas y superficies estimadas
+    def huella(self):
+        return self._huella
+
+
+# Historial compartido por todo el proceso, reconstruido solo si cambia el CSV del historial o el del catálogo
+@singleton_versionado("historial", "cultivos")
+def obtener_historial_cultivos():
+    return HistorialCultivos(cargar_historial(copiar=False), cargar_cultivos(copiar=False))
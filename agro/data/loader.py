@@ -0,0 +1,293 @@
+import os
+import threading
+from functools import lru_cache, wraps
+import pandas as pd
+
+# -------------------------------
+# Capa de datos de referencia con caché compartida
+# -------------------------------
+# Centralizo aquí la lectura de los CSV de /agro/data para que cada dataset se parsee una sola vez
+# por proceso. La caché es un diccionario a nivel de módulo, así que la comparten todas las sesiones
+# de Streamlit (y cualquier otro consumidor) que vivan en el mismo proceso.
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Esquema de cada dataset: archivo, tipos explícitos y columnas clave que normalizo
+# (minúsculas y sin tildes) en una columna adicional para hacer cruces robustos.
+DATASETS = {
+    "cultivos": {
+        "archivo": "cultivos_hortalizas_final.csv",
+        "dtypes": {
+            "ID_cultivo": "int64",
+            "Nombre_cultivo": "object",
+            "Tipo_cultivo": "object",
+            "Fecha_siembra": "object",
+            "Fecha_cosecha": "object",
+            "Duración_cultivo_días": "int64",
+            "Temperatura_optima_min": "float64",
+            "Temperatura_optima_max": "float64",
+            "Necesidad_agua": "object",
+            "Tipo_suelo_requerido": "object",
+            "pH_optimo_min": "float64",
+            "pH_optimo_max": "float64",
+            "Sensibilidad_plagas": "object",
+            "Rendimiento_promedio (kg/ha)": "float64",
+            "Unidades_m2": "int64",
+            "Zona_climatica": "object",
+        },
+        "claves": {"Nombre_cultivo": "Clave_cultivo"},
+    },
+    "demanda": {
+        "archivo": "demanda_clientes.csv",
+        "dtypes": {
+            "Cliente": "object",
+            "Tipo_cliente": "object",
+            "Producto": "object",
+            "Kg_comprados": "float64",
+            "Fecha_compra": "object",
+            "Precio_kg_€": "float64",
+        },
+        "claves": {"Producto": "Clave_producto"},
+    },
+    "terreno": {
+        "archivo": "terreno_suelo_final.csv",
+        "dtypes": {
+            "ID_terreno": "int64",
+            "Nombre_terreno": "object",
+            "Ubicación": "object",
+            "Superficie_ha": "float64",
+            "Tipo_suelo": "object",
+            "pH_suelo": "float64",
+        },
+        "claves": {"Ubicación": "Clave_provincia"},
+    },
+    "equivalencias": {
+        "archivo": "equivalencias_provincias_clima.csv",
+        "dtypes": {
+            "Provincia_usuario": "object",
+            "Provincia_equivalente": "object",
+            "Zona_climatica": "object",
+        },
+        "claves": {"Provincia_usuario": "Clave_provincia"},
+    },
+    "calendario": {
+        "archivo": "calendario_cultivos_actualizado.csv",
+        "dtypes": {
+            "ID_calendario": "int64",
+            "Cultivo": "object",
+            "Provincia": "object",
+            "Siembra_inicio": "object",
+            "Siembra_fin": "object",
+            "Cosecha_inicio": "object",
+            "Cosecha_fin": "object",
+            "Duración_días": "int64",
+            "Rendimiento_promedio (kg/ha)": "float64",
+            "Precio_promedio_kg (€)": "float64",
+            "Ingresos_estimados_ha (€)": "float64",
+            "Meses_mercado_optimos": "object",
+        },
+        "claves": {"Cultivo": "Clave_cultivo", "Provincia": "Clave_provincia"},
+    },
+    "eficiencia": {
+        "archivo": "eficiencia_productiva.csv",
+        "dtypes": {
+            "Cultivo": "object",
+            "Provincia": "object",
+            "Agua_litros_por_kg": "float64",
+            "Fertilizante_kg_por_kg": "float64",
+            "Fitosanitario_kg_por_kg": "float64",
+            "Precio_agua_€/L": "float64",
+            "Precio_fito_€/kg": "float64",
+            "Precio_semilla_€/kg": "float64",
+            "Cuidado_€/kg": "float64",
+            "Siembra_€/kg": "float64",
+            "Recolección_€/kg": "float64",
+            "Transporte_€/kg": "float64",
+            "Precio_venta_€/kg": "float64",
+            "Superficie_m2_por_kg": "float64",
+            "Coste_total_estimado_€/kg": "float64",
+            "Beneficio_neto_estimado_€/kg": "float64",
+        },
+        "claves": {"Cultivo": "Clave_cultivo", "Provincia": "Clave_provincia"},
+    },
+    "recursos": {
+        "archivo": "recursos_catalogo_neutral.csv",
+        "dtypes": {
+            "id_recurso": "int64",
+            "nombre_recurso": "object",
+            "tipo": "object",
+            "cantidad": "int64",
+            "id_terreno": "float64",
+        },
+        "claves": {"tipo": "Clave_tipo"},
+    },
+    "historial": {
+        "archivo": "historial_cultivos_final_limpio.csv",
+        "dtypes": {
+            "id_historial": "int64",
+            "id_terreno": "int64",
+            "Nombre_cultivo": "object",
+            "familia": "object",
+            "fecha_siembra": "object",
+            "fecha_cosecha": "object",
+            "rendimiento_kg_total": "float64",
+            "margen_neto_total (€)": "object",
+            "unidades_sembradas_total": "float64",
+        },
+        "claves": {"Nombre_cultivo": "Clave_cultivo"},
+    },
+    "clima": {
+        "archivo": "clima_provincia_completo_variado.csv",
+        "dtypes": {
+            "Provincia": "object",
+            "Zona_climática": "object",
+            "Temp_media_anual_C": "float64",
+            **{f"Temp_media_{mes}": "float64" for mes in (
+                "enero", "febrero", "marzo", "abril", "mayo", "junio",
+                "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+            )},
+        },
+        "claves": {"Provincia": "Clave_provincia"},
+    },
+}
+
+_cache = {}
+_lock = threading.Lock()
+
+
+# Normalizo una serie de texto de forma vectorizada: quito espacios, paso a minúsculas y elimino tildes.
+# Las columnas de nombres repiten pocos valores distintos, así que normalizo solo los valores únicos
+# y reparto el resultado con sus códigos (los nulos conservan su valor nulo).
+def normalizar_texto(serie):
+    codigos, unicos = pd.factorize(serie.astype("object"))
+    normalizados = (
+        pd.Series(unicos, dtype="object")
+        .str.strip()
+        .str.lower()
+        .str.normalize("NFD")
+        .str.replace(r"[\u0300-\u036f]", "", regex=True)
+    )
+    return normalizados.reindex(codigos).set_axis(serie.index).rename(serie.name)
+
+
+# Versión escalar de la misma normalización, para claves sueltas (p. ej. la provincia del formulario).
+# Se consulta con los mismos pocos nombres una y otra vez, así que memorizo el resultado.
+@lru_cache(maxsize=4096)
+def normalizar_nombre(texto):
+    if not isinstance(texto, str):
+        return texto
+    return normalizar_texto(pd.Series([texto])).iloc[0]
+
+
+def _ruta(nombre):
+    if nombre not in DATASETS:
+        raise KeyError(f"Dataset desconocido: {nombre}")
+    return os.path.join(DATA_DIR, DATASETS[nombre]["archivo"])
+
+
+# Uso (mtime, tamaño) del archivo como versión: si el CSV cambia en disco, la caché se invalida sola
+def version_dataset(nombre):
+    info = os.stat(_ruta(nombre))
+    return info.st_mtime_ns, info.st_size
+
+
+# Decorador para los objetos de datos compartidos por todo el proceso (cubo, índices, tablas): la función
+# decorada los construye y el decorador los guarda junto a la versión de los datasets de los que salen, y solo
+# los reconstruye si alguno de esos CSV cambia en disco
+def singleton_versionado(*datasets):
+    def decorador(constructor):
+        estado = {}
+        lock = threading.Lock()
+
+        @wraps(constructor)
+        def obtener():
+            version = tuple(version_dataset(nombre) for nombre in datasets)
+            with lock:
+                if estado.get("version") != version:
+                    estado["objeto"] = constructor()
+                    estado["version"] = version
+                return estado["objeto"]
+
+        return obtener
+    return decorador
+
+
+def _parsear(nombre):
+    esquema = DATASETS[nombre]
+    df = pd.read_csv(_ruta(nombre))
+    df.columns = df.columns.str.strip()
+
+    # Solo aplico los tipos de las columnas que existen, para tolerar CSV con columnas de más o de menos
+    dtypes = {col: tipo for col, tipo in esquema["dtypes"].items() if col in df.columns}
+    df = df.astype(dtypes)
+
+    for col in df.columns[df.dtypes == "object"]:
+        df[col] = df[col].str.strip()
+
+    for col, col_clave in esquema["claves"].items():
+        if col in df.columns:
+            df[col_clave] = normalizar_texto(df[col])
+
+    return df
+
+
+# Devuelvo el dataset pedido desde la caché, parseándolo solo si no está o si el archivo ha cambiado.
+# Por defecto entrego una copia para que ningún consumidor pueda modificar la versión compartida.
+def cargar_dataset(nombre, copiar=True):
+    version = version_dataset(nombre)
+    with _lock:
+        entrada = _cache.get(nombre)
+        if entrada is None or entrada[0] != version:
+            entrada = (version, _parsear(nombre))
+            _cache[nombre] = entrada
+    df = entrada[1]
+    return df.copy() if copiar else df
+
+
+def cargar_cultivos(copiar=True):
+    return cargar_dataset("cultivos", copiar)
+
+
+def cargar_demanda(copiar=True):
+    return cargar_dataset("demanda", copiar)
+
+
+def cargar_terreno(copiar=True):
+    return cargar_dataset("terreno", copiar)
+
+
+def cargar_equivalencias(copiar=True):
+    return cargar_dataset("equivalencias", copiar)
+
+
+def cargar_calendario(copiar=True):
+    return cargar_dataset("calendario", copiar)
+
+
+def cargar_eficiencia(copiar=True):
+    return cargar_dataset("eficiencia", copiar)
+
+
+def cargar_recursos(copiar=True):
+    return cargar_dataset("recursos", copiar)
+
+
+def cargar_historial(copiar=True):
+    return cargar_dataset("historial", copiar)
+
+
+def cargar_clima(copiar=True):
+    return cargar_dataset("clima", copiar)
+
+
+# Construyo los diccionarios de provincia que usa el formulario (lista, provincia equivalente y zona climática)
+def obtener_mapas_provincias():
+    equivalencias = cargar_equivalencias(copiar=False)
+    provincias_disponibles = sorted(equivalencias["Provincia_usuario"].dropna().unique().tolist())
+    provincia_equivalencias = dict(zip(equivalencias["Provincia_usuario"], equivalencias["Provincia_equivalente"]))
+    provincia_zonaclimatica = dict(zip(equivalencias["Provincia_usuario"], equivalencias["Zona_climatica"].str.lower()))
+    return provincias_disponibles, provincia_equivalencias, provincia_zonaclimatica
+
+
+def limpiar_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,60 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+from agro.data.loader import cargar_recursos, singleton_versionado
+
+# -------------------------------
+# Catálogo de recursos y capacidad de maquinaria
+# -------------------------------
+# recursos_catalogo_neutral.csv lista la maquinaria, el equipamiento y la mano de obra disponibles, con
+# su cantidad y, opcionalmente, el terreno al que están asignados (vacío = compartido por todos).
+# De aquí saco la capacidad mensual en horas de maquinaria que usa la restricción de recursos del
+# modelo multicultivo. El consumo de horas de cada cultivo se estima a partir del coste de las labores
+# de siembra y recolección de eficiencia_productiva.csv dividido por la tarifa horaria de maquinaria.
+HORAS_MES_POR_MAQUINA = 160  # horas de trabajo útiles al mes por máquina
+TARIFA_HORA_MAQUINARIA = 25.0  # €/h de tractor con operario, para pasar €/kg de labores a horas/kg
+TIPO_MAQUINARIA = "maquinaria"
+
+
+class CatalogoRecursos:
+    def __init__(self, recursos_df, horas_mes_por_maquina=HORAS_MES_POR_MAQUINA):
+        self._recursos = recursos_df[["id_recurso", "nombre_recurso", "Clave_tipo", "cantidad", "id_terreno"]].reset_index(drop=True)
+        self.horas_mes_por_maquina = horas_mes_por_maquina
+
+        h = hashlib.sha256(repr(horas_mes_por_maquina).encode())
+        h.update(pd.util.hash_pandas_object(self._recursos, index=False, categorize=False).to_numpy().tobytes())
+        self._huella = h.hexdigest()
+
+    def __len__(self):
+        return len(self._recursos)
+
+    # Recursos disponibles para un terreno: los compartidos (sin id_terreno) más los asignados a ese terreno
+    def disponibles(self, id_terreno=None, tipo=None):
+        recursos = self._recursos
+        asignacion = recursos["id_terreno"]
+        mascara = asignacion.isna() if id_terreno is None else asignacion.isna() | (asignacion == id_terreno)
+        if tipo is not None:
+            mascara &= recursos["Clave_tipo"] == tipo
+        return recursos[mascara]
+
+    # Capacidad mensual en horas de toda la maquinaria disponible para el terreno
+    def horas_maquinaria_mes(self, id_terreno=None):
+        maquinas = self.disponibles(id_terreno, TIPO_MAQUINARIA)["cantidad"].sum()
+        return float(maquinas * self.horas_mes_por_maquina)
+
+    # Huella de las filas del catálogo y de las horas por máquina y mes con las que se calcula la capacidad
+    def huella(self):
+        return self._huella
+
+
+# Horas de maquinaria por kg en siembra y en recolección para cada cultivo de la lista
+def horas_maquinaria_kg(costes, productos, provincia=None, tarifa_hora=TARIFA_HORA_MAQUINARIA):
+    siembra, recoleccion = costes.labores_kg(productos, provincia)
+    return np.asarray(siembra) / tarifa_hora, np.asarray(recoleccion) / tarifa_hora
+
+
+# Catálogo compartido por todo el proceso, reconstruido solo si el CSV cambia en disco
+@singleton_versionado("recursos")
+def obtener_catalogo_recursos():
+    return CatalogoRecursos(cargar_recursos(copiar=False))
@@ -0,0 +1,94 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+from agro.data.loader import cargar_calendario, normalizar_nombre, normalizar_texto, singleton_versionado
+
+# -------------------------------
+# Índice de ventanas de siembra por (cultivo, provincia)
+# -------------------------------
+# calendario_cultivos_actualizado.csv trae, para cada cultivo y provincia, la ventana de siembra y de cosecha,
+# la duración, el rendimiento y el precio. Lo paso una vez a un diccionario con claves normalizadas
+# (cultivo, provincia) para consultar cualquier ventana en O(1). El modelo multicultivo lo usa para no
+# crear variables de siembra fuera de la ventana de la provincia equivalente del usuario.
+
+
+# Mes de un texto "dd-mm" o "dd/mm" (NaN si no tiene ese formato)
+def _mes(textos):
+    return textos.astype(str).str.extract(r"^\s*\d{1,2}\s*[/-]\s*(\d{1,2})\s*$")[0].astype(float)
+
+
+# Meses de la ventana de mes_inicio a mes_fin, ambos incluidos; si mes_fin < mes_inicio la ventana cruza el fin de año
+def meses_ventana(mes_inicio, mes_fin):
+    longitud = (int(mes_fin) - int(mes_inicio)) % 12 + 1
+    return tuple(sorted(int(m) for m in (int(mes_inicio) - 1 + np.arange(longitud)) % 12 + 1))
+
+
+class VentanasSiembra:
+    def __init__(self, calendario_df):
+        calendario_df = calendario_df.dropna(subset=["Cultivo", "Provincia"])
+        claves_cultivo = normalizar_texto(calendario_df["Cultivo"])
+        claves_provincia = normalizar_texto(calendario_df["Provincia"])
+        mes_siembra_inicio = _mes(calendario_df["Siembra_inicio"])
+        mes_siembra_fin = _mes(calendario_df["Siembra_fin"])
+
+        self._indice = {}
+        for fila, c, p, m0, m1 in zip(
+            calendario_df.to_dict("records"), claves_cultivo, claves_provincia, mes_siembra_inicio, mes_siembra_fin
+        ):
+            if pd.isna(m0) or pd.isna(m1):
+                continue
+            self._indice[c, p] = {
+                "cultivo": fila["Cultivo"],
+                "provincia": fila["Provincia"],
+                "siembra": (fila["Siembra_inicio"], fila["Siembra_fin"]),
+                "cosecha": (fila["Cosecha_inicio"], fila["Cosecha_fin"]),
+                "meses_siembra": meses_ventana(m0, m1),
+                "duracion_dias": fila.get("Duración_días"),
+                "rendimiento_kg_ha": fila.get("Rendimiento_promedio (kg/ha)"),
+                "precio_kg": fila.get("Precio_promedio_kg (€)"),
+            }
+        self.provincias = frozenset(p for _, p in self._indice)
+        # Meses de siembra por provincia como Series con índice cultivo normalizado: meses_por_cultivo() consulta
+        # todo el catálogo con un solo reindex
+        por_provincia = {}
+        for (c, p), ventana in self._indice.items():
+            por_provincia.setdefault(p, {})[c] = ventana["meses_siembra"]
+        self._meses_por_provincia = {p: pd.Series(meses, dtype=object) for p, meses in por_provincia.items()}
+
+        h = hashlib.sha256()
+        h.update(pd.util.hash_pandas_object(calendario_df, index=False, categorize=False).to_numpy().tobytes())
+        self._huella = h.hexdigest()
+
+    def __len__(self):
+        return len(self._indice)
+
+    def tiene_provincia(self, provincia):
+        return normalizar_nombre(provincia) in self.provincias
+
+    # Ventana completa de un cultivo en una provincia (None si el calendario no la recoge)
+    def ventana(self, cultivo, provincia):
+        return self._indice.get((normalizar_nombre(cultivo), normalizar_nombre(provincia)))
+
+    def meses_siembra(self, cultivo, provincia):
+        ventana = self.ventana(cultivo, provincia)
+        return None if ventana is None else ventana["meses_siembra"]
+
+    # Meses de siembra permitidos para cada cultivo de la lista; los que no tienen ventana no aparecen
+    def meses_por_cultivo(self, productos, provincia):
+        meses_provincia = self._meses_por_provincia.get(normalizar_nombre(provincia))
+        if meses_provincia is None:
+            return {}
+        productos = pd.Series(list(productos), dtype=object)
+        meses = meses_provincia.reindex(normalizar_texto(productos)).to_numpy()
+        return {p: list(m) for p, m in zip(productos, meses) if isinstance(m, tuple)}
+
+    # Huella del calendario del que sale el índice (los meses de siembra de cada provincia)
+    def huella(self):
+        return self._huella
+
+
+# Índice compartido por todo el proceso, reconstruido solo si el CSV cambia en disco
+@singleton_versionado("calendario")
+def obtener_ventanas_siembra():
+    return VentanasSiembra(cargar_calendario(copiar=False))
@@ -0,0 +1,22 @@
+from agro.service.pipeline import (
+    PIPELINES,
+    recomendar_monocultivo,
+    recomendar_multicultivo,
+    curva_sensibilidad,
+    recomendar_plan_rotacion,
+    preparar_resultado_monocultivo,
+    preparar_resultado_multicultivo,
+    exportar_excel,
+    serializar,
+    deserializar,
+)
+from agro.service.exportacion import (
+    FORMATOS,
+    EscritorExcelIncremental,
+    exportar,
+    generar_exportacion,
+    huella_exportacion,
+    descripcion_archivo,
+)
+from agro.service.calendario import construir_calendario, fechas_desde_mes, fechas_desde_texto
+from agro.service.cliente import ErrorServicio, recomendar, recomendar_en_segundo_plano, sensibilidad
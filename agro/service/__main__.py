@@ -0,0 +1,28 @@
+import os
+import sys
+import argparse
+
+
+# Arranco la API con uvicorn: --workers son los procesos que atienden HTTP (bucle asíncrono) y
+# --procesos los que resuelven los modelos dentro de cada uno de ellos
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de recomendaciones AgroSmart")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de uvicorn que atienden peticiones")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de resolución por worker")
+    parser.add_argument("--metricas", action="store_true", help="Medir las etapas y publicar GET /metricas")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    if args.procesos:
+        os.environ["AGROSMART_PROCESOS"] = str(args.procesos)
+    if args.metricas:
+        os.environ["AGROSMART_METRICAS"] = "1"
+    uvicorn.run("agro.service.api:app", host=args.host, port=args.port, workers=args.workers, lifespan="on")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import os
+import json
+import math
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+from agro.service.pipeline import PIPELINES, USOS_SUELO, curva_sensibilidad, serializar
+from app.metricas_module import REGISTRO, metricas_activas, extraer_metricas, observar, tramo, texto_prometheus
+
+# -------------------------------
+# API HTTP (ASGI) de recomendaciones
+# -------------------------------
+# Aplicación ASGI mínima, sin framework: recibe JSON, valida los parámetros y manda la resolución
+# (CPU intensiva) a un pool de procesos para que el bucle de eventos siga atendiendo peticiones.
+# Así puedo escalar los procesos de resolución con AGROSMART_PROCESOS independientemente de las
+# sesiones de Streamlit y hacer pruebas de carga solo contra el servicio.
+# Arranque: python -m agro.service --port 8000   (o: uvicorn agro.service.api:app)
+#
+#   GET  /salud             -> estado del servicio
+#   GET  /v1/provincias     -> provincias disponibles en el formulario
+#   GET  /metricas          -> métricas por etapa y del solver en formato Prometheus (con AGROSMART_METRICAS=1)
+#   POST /v1/monocultivo    -> {"superficie_ha": 1.5, "provincia": "Murcia"}
+#   POST /v1/multicultivo   -> {"superficie_ha": 1.5, "acceso_agua": "medio", "provincia": "Murcia", ...}
+#   POST /v1/sensibilidad   -> mismos parámetros que multicultivo (+ "puntos")
+#   POST /v1/plurianual     -> {"superficie_ha": 1.5, "acceso_agua": "medio", "provincia": "Murcia", "anios": 3, "id_terreno": 6}
+#   POST /v1/pareto         -> mismos parámetros que multicultivo (+ "puntos_agua", "niveles_diversidad")
+NIVELES_AGUA = ("bajo", "medio", "alto")
+MAX_ESCENARIOS = 1_000_000
+MAX_ESCENARIOS_SAA = 1_000
+MAX_PUNTOS_FRONTERA = 20
+
+# Parámetros aceptados por cada ruta: (tipo, obligatorio)
+PARAMETROS = {
+    "monocultivo": {
+        "superficie_ha": (float, True),
+        "provincia": (str, False),
+        "tipo_suelo": (str, False),
+        "ph_suelo": (float, False),
+        "uso_suelo": (str, False),
+        "n_escenarios": (int, False),
+        "semilla": (int, False),
+    },
+    "multicultivo": {
+        "superficie_ha": (float, True),
+        "acceso_agua": (str, True),
+        "provincia": (str, True),
+        "tipo_suelo": (str, False),
+        "ph_suelo": (float, False),
+        "uso_suelo": (str, False),
+        "modo_flexible": (bool, False),
+        "restriccion_mensual": (bool, False),
+        "presupuesto_agua_l": (float, False),
+        "agua_mensual_l": (float, False),
+        "limitar_maquinaria": (bool, False),
+        "n_escenarios": (int, False),
+        "escenarios_saa": (int, False),
+        "semilla": (int, False),
+        "solver": (str, False),
+        "vista_previa": (bool, False),
+    },
+    "plurianual": {
+        "superficie_ha": (float, True),
+        "acceso_agua": (str, True),
+        "provincia": (str, True),
+        "anios": (int, False),
+        "id_terreno": (int, False),
+        "penalizacion_ha": (float, False),
+        "tipo_suelo": (str, False),
+        "ph_suelo": (float, False),
+        "uso_suelo": (str, False),
+        "modo_flexible": (bool, False),
+        "restriccion_mensual": (bool, False),
+        "presupuesto_agua_l": (float, False),
+        "agua_mensual_l": (float, False),
+        "limitar_maquinaria": (bool, False),
+        "solver": (str, False),
+    },
+    "pareto": {
+        "superficie_ha": (float, True),
+        "acceso_agua": (str, True),
+        "provincia": (str, True),
+        "tipo_suelo": (str, False),
+        "ph_suelo": (float, False),
+        "uso_suelo": (str, False),
+        "modo_flexible": (bool, False),
+        "restriccion_mensual": (bool, False),
+        "presupuesto_agua_l": (float, False),
+        "agua_mensual_l": (float, False),
+        "limitar_maquinaria": (bool, False),
+        "puntos_agua": (int, False),
+        "niveles_diversidad": (int, False),
+        "solver": (str, False),
+    },
+    "sensibilidad": {
+        "superficie_ha": (float, True),
+        "acceso_agua": (str, True),
+        "provincia": (str, True),
+        "tipo_suelo": (str, False),
+        "ph_suelo": (float, False),
+        "uso_suelo": (str, False),
+        "modo_flexible": (bool, False),
+        "restriccion_mensual": (bool, False),
+        "presupuesto_agua_l": (float, False),
+        "agua_mensual_l": (float, False),
+        "limitar_maquinaria": (bool, False),
+        "puntos": (int, False),
+        "solver": (str, False),
+    },
+}
+
+_pool = {}
+
+
+class ErrorPeticion(Exception):
+    def __init__(self, mensaje, codigo=400):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def validar_parametros(ruta, cuerpo):
+    if not isinstance(cuerpo, dict):
+        raise ErrorPeticion("El cuerpo debe ser un objeto JSON")
+
+    esquema = PARAMETROS[ruta]
+    desconocidos = sorted(set(cuerpo) - set(esquema))
+    if desconocidos:
+        raise ErrorPeticion(f"Parámetros no reconocidos: {desconocidos}")
+
+    parametros = {}
+    for nombre, (tipo, obligatorio) in esquema.items():
+        if nombre not in cuerpo or cuerpo[nombre] is None:
+            if obligatorio:
+                raise ErrorPeticion(f"Falta el parámetro obligatorio '{nombre}'")
+            continue
+        valor = cuerpo[nombre]
+        # bool es subclase de int: lo rechazo explícitamente en los campos numéricos y enteros
+        if tipo in (int, float) and isinstance(valor, bool):
+            raise ErrorPeticion(f"'{nombre}' debe ser de tipo {tipo.__name__}")
+        if tipo is float and not isinstance(valor, (int, float)):
+            raise ErrorPeticion(f"'{nombre}' debe ser numérico")
+        if tipo is not float and not isinstance(valor, tipo):
+            raise ErrorPeticion(f"'{nombre}' debe ser de tipo {tipo.__name__}")
+        # json.loads acepta NaN e Infinity, que no tienen sentido en ningún parámetro
+        if tipo is float and not math.isfinite(valor):
+            raise ErrorPeticion(f"'{nombre}' debe ser un número finito")
+        parametros[nombre] = tipo(valor)
+
+    if not parametros["superficie_ha"] > 0:
+        raise ErrorPeticion("'superficie_ha' debe ser mayor que 0")
+    for nombre in ("presupuesto_agua_l", "agua_mensual_l", "penalizacion_ha"):
+        if parametros.get(nombre, 0) < 0:
+            raise ErrorPeticion(f"'{nombre}' no puede ser negativo")
+    if not 0 <= parametros.get("n_escenarios", 0) <= MAX_ESCENARIOS:
+        raise ErrorPeticion(f"'n_escenarios' debe estar entre 0 y {MAX_ESCENARIOS}")
+    if not 0 <= parametros.get("escenarios_saa", 0) <= MAX_ESCENARIOS_SAA:
+        raise ErrorPeticion(f"'escenarios_saa' debe estar entre 0 y {MAX_ESCENARIOS_SAA}")
+    if parametros.get("vista_previa") and parametros.get("escenarios_saa"):
+        raise ErrorPeticion("'vista_previa' no admite 'escenarios_saa'")
+    for nombre in ("puntos_agua", "niveles_diversidad"):
+        if not 1 <= parametros.get(nombre, 1) <= MAX_PUNTOS_FRONTERA:
+            raise ErrorPeticion(f"'{nombre}' debe estar entre 1 y {MAX_PUNTOS_FRONTERA}")
+    if not 0 <= parametros.get("ph_suelo", 7.0) <= 14:
+        raise ErrorPeticion("'ph_suelo' debe estar entre 0 y 14")
+    if parametros.get("uso_suelo", USOS_SUELO[0]) not in USOS_SUELO:
+        raise ErrorPeticion(f"'uso_suelo' debe ser uno de {list(USOS_SUELO)}")
+    if "acceso_agua" in parametros:
+        parametros["acceso_agua"] = parametros["acceso_agua"].strip().lower()
+        if parametros["acceso_agua"] not in NIVELES_AGUA:
+            raise ErrorPeticion(f"'acceso_agua' debe ser uno de {list(NIVELES_AGUA)}")
+    return parametros
+
+
+def _precargar_datos():
+    # Cada proceso del pool parsea los datos de referencia una sola vez al arrancar
+    from agro.data import cargar_cultivos, cargar_terreno, obtener_cubo_demanda
+
+    cargar_cultivos(copiar=False)
+    cargar_terreno(copiar=False)
+    obtener_cubo_demanda()
+    # La vista previa multicultivo resuelve la relajación con scipy: importarlo cuesta más que resolverla
+    import scipy.optimize  # noqa: F401
+
+
+# Se ejecuta en el pool: resuelvo y devuelvo ya el JSON codificado para no mover DataFrames entre procesos.
+# Con las métricas activas devuelvo también lo medido en este proceso para agregarlo en el principal.
+def ejecutar_pipeline(ruta, parametros):
+    with tramo(f"pipeline_{ruta}"):
+        if ruta == "sensibilidad":
+            salida = {"curva": curva_sensibilidad(**parametros)}
+        else:
+            salida = PIPELINES[ruta](**parametros)
+        cuerpo = json.dumps(serializar(salida), ensure_ascii=False).encode("utf-8")
+    return cuerpo, extraer_metricas() if metricas_activas() else None
+
+
+def obtener_pool():
+    if "pool" not in _pool:
+        procesos = int(os.environ.get("AGROSMART_PROCESOS", 0)) or os.cpu_count() or 1
+        _pool["pool"] = ProcessPoolExecutor(max_workers=procesos, initializer=_precargar_datos)
+        _pool["procesos"] = procesos
+    return _pool["pool"]
+
+
+def cerrar_pool():
+    pool = _pool.pop("pool", None)
+    _pool.pop("procesos", None)
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+async def _leer_cuerpo(receive):
+    partes = []
+    while True:
+        mensaje = await receive()
+        partes.append(mensaje.get("body", b""))
+        if not mensaje.get("more_body"):
+            return b"".join(partes)
+
+
+async def _responder(send, codigo, cuerpo, tipo=b"application/json; charset=utf-8"):
+    if not isinstance(cuerpo, bytes):
+        cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": codigo,
+        "headers": [(b"content-type", tipo), (b"content-length", str(len(cuerpo)).encode())],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            obtener_pool()
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            cerrar_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    metodo, ruta = scope["method"], scope["path"].rstrip("/")
+    try:
+        if metodo == "GET" and ruta == "/salud":
+            await _responder(send, 200, {"estado": "ok", "procesos": _pool.get("procesos", 0)})
+        elif metodo == "GET" and ruta == "/v1/provincias":
+            from agro.data import obtener_mapas_provincias
+
+            provincias, _, zonas = obtener_mapas_provincias()
+            await _responder(send, 200, {"provincias": list(provincias), "zonas_climaticas": zonas})
+        elif metodo == "GET" and ruta == "/metricas":
+            if not metricas_activas():
+                raise ErrorPeticion("Métricas desactivadas: arranca el servicio con AGROSMART_METRICAS=1", 404)
+            await _responder(send, 200, texto_prometheus().encode("utf-8"), b"text/plain; version=0.0.4; charset=utf-8")
+        elif ruta.startswith("/v1/") and ruta[4:] in PARAMETROS:
+            if metodo != "POST":
+                raise ErrorPeticion("Método no permitido", 405)
+            try:
+                cuerpo = json.loads(await _leer_cuerpo(receive) or b"{}")
+            except ValueError:
+                raise ErrorPeticion("El cuerpo no es JSON válido")
+            parametros = validar_parametros(ruta[4:], cuerpo)
+            bucle = asyncio.get_running_loop()
+            inicio = time.perf_counter()
+            resultado, metricas = await bucle.run_in_executor(obtener_pool(), ejecutar_pipeline, ruta[4:], parametros)
+            # Tiempo total de la petición en este proceso, incluida la espera en la cola del pool
+            observar(f"api_{ruta[4:]}", time.perf_counter() - inicio)
+            if metricas is not None:
+                REGISTRO.combinar(metricas)
+            await _responder(send, 200, resultado)
+        else:
+            raise ErrorPeticion(f"Ruta no encontrada: {ruta}", 404)
+    except ErrorPeticion as e:
+        await _responder(send, e.codigo, {"error": str(e)})
+    except ValueError as e:
+        # Errores de parámetros detectados por los motores (p. ej. un backend de solver desconocido)
+        await _responder(send, 400, {"error": str(e)})
+    except Exception as e:
+        await _responder(send, 500, {"error": f"Error interno: {e}"})
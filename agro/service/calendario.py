@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Calendario de siembra y cosecha
+# -------------------------------
+# Construyo las fechas de inicio y fin de cada ciclo con operaciones vectorizadas sobre columnas completas
+# (to_datetime a partir de año/mes/día y to_timedelta para la duración), sin apply fila a fila.
+# Lo usan las dos vistas: multicultivo (mes de inicio + duración en días) y monocultivo (fechas
+# "dd/mm" del catálogo). Todas las fechas se sitúan en AÑO_BASE; un ciclo que cruza el fin de año
+# termina en el año siguiente. Los textos de fecha se repiten mucho (vienen del catálogo), así que
+# solo se interpretan sus valores únicos.
+AÑO_BASE = 2025
+COLUMNAS_CALENDARIO = ["Cultivo", "Inicio", "Fin"]
+
+
+# Separo día y mes de textos "dd/mm" o "dd-mm"; lo que no tenga ese formato queda como NaN
+def _dia_mes(textos):
+    partes = textos.astype(str).str.extract(r"^\s*(\d{1,2})\s*[/-]\s*(\d{1,2})\s*$")
+    return partes[0].astype(float), partes[1].astype(float)
+
+
+# Fechas a partir de componentes; las combinaciones imposibles (31/02, mes 13...) dan NaT
+def _fechas(año, mes, dia):
+    componentes = pd.DataFrame({"year": año, "month": mes, "day": dia})
+    return pd.to_datetime(componentes, errors="coerce")
+
+
+def fechas_desde_mes(meses, año_base=AÑO_BASE):
+    meses = pd.to_numeric(pd.Series(meses), errors="coerce")
+    return _fechas(año_base, meses, 1).set_axis(meses.index)
+
+
+def fechas_desde_texto(textos, año_base=AÑO_BASE):
+    textos = pd.Series(textos)
+    codigos, unicos = pd.factorize(textos.astype("object"))
+    dia, mes = _dia_mes(pd.Series(unicos, dtype="object"))
+    # El código -1 (valor nulo) apunta a la posición extra que añado con NaT
+    fechas = np.append(_fechas(año_base, mes, dia).to_numpy(), np.datetime64("NaT"))
+    return pd.Series(fechas[codigos], index=textos.index)
+
+
+# Calendario de los ciclos: `inicio` son meses (1-12) o fechas "dd/mm"; el fin llega como fecha "dd/mm"
+# (`fin`) o como duración del ciclo en días (`duracion_dias`). Devuelvo una fila por entrada, alineada con
+# `cultivos` y con NaT donde no se pudo estimar la fecha, para que quien llama decida qué descartar.
+def construir_calendario(cultivos, inicio, fin=None, duracion_dias=None, año_base=AÑO_BASE):
+    if (fin is None) == (duracion_dias is None):
+        raise ValueError("Indica el fin del ciclo con `fin` o con `duracion_dias`, pero no ambos")
+
+    cultivos = pd.Series(cultivos)
+    inicio = pd.Series(inicio).set_axis(cultivos.index)
+    if pd.api.types.is_numeric_dtype(inicio):
+        fecha_inicio = fechas_desde_mes(inicio, año_base)
+    else:
+        fecha_inicio = fechas_desde_texto(inicio, año_base)
+
+    if duracion_dias is not None:
+        duracion = pd.to_numeric(pd.Series(duracion_dias).set_axis(cultivos.index), errors="coerce")
+        fecha_fin = fecha_inicio + pd.to_timedelta(duracion, unit="D")
+    else:
+        # Si la cosecha cae antes que la siembra dentro del año, el ciclo termina el año siguiente
+        fin = pd.Series(fin).set_axis(cultivos.index)
+        fecha_fin = fechas_desde_texto(fin, año_base)
+        cruza = (fecha_fin < fecha_inicio).to_numpy()
+        if cruza.any():
+            fecha_fin[cruza] = fechas_desde_texto(fin[cruza], año_base + 1).to_numpy()
+
+    return pd.DataFrame({"Cultivo": cultivos, "Inicio": fecha_inicio, "Fin": fecha_fin})
@@ -0,0 +1,77 @@
+import os
+import json
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from agro.service.pipeline import PIPELINES, curva_sensibilidad, deserializar
+from app.metricas_module import tramo
+
+# -------------------------------
+# Cliente de los pipelines de recomendación
+# -------------------------------
+# Es la única puerta que usa la interfaz. Si AGROSMART_API_URL apunta a un servicio (python -m agro.service),
+# las peticiones van por HTTP y la resolución ocurre en sus procesos; si no, ejecuto el pipeline en este
+# mismo proceso. En ambos casos la respuesta tiene la misma forma: diccionario con DataFrames.
+TIMEOUT_S = 120
+# Hilos para las recomendaciones en segundo plano (p. ej. el MILP exacto mientras se muestra la vista previa).
+# CBC corre en un subproceso y HiGHS suelta el GIL, así que la interfaz sigue respondiendo.
+HILOS_SEGUNDO_PLANO = int(os.environ.get("AGROSMART_HILOS_SEGUNDO_PLANO", 2))
+
+_hilos = {}
+_lock_hilos = threading.Lock()
+
+
+class ErrorServicio(Exception):
+    pass
+
+
+def url_servicio():
+    return (os.environ.get("AGROSMART_API_URL") or "").rstrip("/") or None
+
+
+def _peticion(url, ruta, parametros):
+    peticion = urllib.request.Request(
+        f"{url}/v1/{ruta}",
+        data=json.dumps(parametros).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(peticion, timeout=TIMEOUT_S) as respuesta:
+            return deserializar(json.loads(respuesta.read()))
+    except urllib.error.HTTPError as e:
+        try:
+            detalle = json.loads(e.read()).get("error", e.reason)
+        except ValueError:
+            detalle = e.reason
+        raise ErrorServicio(f"El servicio respondió {e.code}: {detalle}") from e
+    except urllib.error.URLError as e:
+        raise ErrorServicio(f"No se pudo contactar con el servicio en {url}: {e.reason}") from e
+
+
+def recomendar(motor, **parametros):
+    url = url_servicio()
+    if url is None:
+        with tramo(f"pipeline_{motor}"):
+            return PIPELINES[motor](**parametros)
+    # El modo debug solo tiene sentido en local: los mensajes técnicos se pintan en la propia app
+    parametros.pop("debug", None)
+    return _peticion(url, motor, parametros)
+
+
+# Lanza recomendar() en un hilo y devuelve el Future; el resultado queda además en la caché de resultados
+def recomendar_en_segundo_plano(motor, **parametros):
+    with _lock_hilos:
+        if "pool" not in _hilos:
+            _hilos["pool"] = ThreadPoolExecutor(max_workers=HILOS_SEGUNDO_PLANO, thread_name_prefix="agrosmart")
+    return _hilos["pool"].submit(recomendar, motor, **parametros)
+
+
+def sensibilidad(**parametros):
+    url = url_servicio()
+    if url is None:
+        with tramo("pipeline_sensibilidad"):
+            return curva_sensibilidad(**parametros)
+    return _peticion(url, "sensibilidad", parametros)["curva"]
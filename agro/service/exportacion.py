@@ -0,0 +1,158 @@
+import io
+import os
+import hashlib
+import zipfile
+import pandas as pd
+
+from app.cache_module import CacheResultados, huella_dataframe
+
+# -------------------------------
+# Exportación de resultados (XLSX, CSV y Parquet)
+# -------------------------------
+# Los archivos de descarga ya no se generan en cada rerun: se piden al pulsar el botón y se guardan en una
+# caché LRU por huella del resultado y formato, así que volver a descargar el mismo resultado no repite el
+# trabajo. Para las exportaciones grandes (lote, carteras de miles de fincas) EscritorExcelIncremental
+# escribe el libro fila a fila con el modo `constant_memory` de xlsxwriter: solo la fila en curso vive en
+# memoria, por grande que sea la cartera.
+FORMATOS = {
+    "xlsx": {"extension": "xlsx", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    "csv": {"extension": "csv", "mime": "text/csv"},
+    "parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+MIME_ZIP = "application/zip"
+FILAS_MAX_HOJA = 1_048_576  # límite de filas de una hoja de Excel (incluida la cabecera)
+UMBRAL_FILAS_STREAMING = 50_000  # a partir de aquí el XLSX en memoria se escribe en modo constant_memory
+FILAS_BLOQUE = 10_000  # filas que se convierten de una vez al escribir en modo constant_memory
+FORMATO_FECHA = "yyyy-mm-dd hh:mm:ss"
+
+CACHE_EXPORTACIONES = CacheResultados(tamano_max=int(os.environ.get("AGROSMART_CACHE_EXPORTACIONES", 32)))
+
+
+# Escritor XLSX incremental: cada bloque de filas se añade al final de su hoja y, si se llega al límite de
+# filas de Excel, continúa en una hoja nueva. En modo constant_memory las filas deben escribirse en orden y
+# una hoja no se puede retomar una vez empezada la siguiente. `destino` puede ser una ruta o un objeto binario.
+class EscritorExcelIncremental:
+    def __init__(self, destino, nombre_hoja="Resultados"):
+        import xlsxwriter
+
+        self._libro = xlsxwriter.Workbook(destino, {
+            "constant_memory": True,
+            "default_date_format": FORMATO_FECHA,
+            "nan_inf_to_errors": True,
+            "remove_timezone": True,
+        })
+        self._formato_cabecera = self._libro.add_format({"bold": True, "border": 1})
+        self.nombre_hoja = nombre_hoja
+        self._hoja = None
+        self._columnas = None
+        self._fila = 0
+        self._partes = 0
+        self.filas_escritas = 0
+
+    def _nueva_hoja(self, nombre_hoja, columnas):
+        if nombre_hoja != self.nombre_hoja or self._hoja is None:
+            self.nombre_hoja, self._partes = nombre_hoja, 0
+        self._partes += 1
+        nombre = nombre_hoja if self._partes == 1 else f"{nombre_hoja}_{self._partes}"
+        self._hoja = self._libro.add_worksheet(nombre[:31])
+        self._columnas = columnas
+        self._hoja.write_row(0, 0, columnas, self._formato_cabecera)
+        self._fila = 1
+
+    def escribir(self, df, nombre_hoja=None):
+        nombre_hoja = nombre_hoja or self.nombre_hoja
+        if self._hoja is None or nombre_hoja != self.nombre_hoja:
+            self._nueva_hoja(nombre_hoja, [str(c) for c in df.columns])
+        # Convierto por bloques para no duplicar en memoria el DataFrame entero como objetos;
+        # los nulos (NaN, NaT, None) se escriben como celdas vacías
+        for inicio in range(0, len(df), FILAS_BLOQUE):
+            bloque = df.iloc[inicio:inicio + FILAS_BLOQUE]
+            for fila in bloque.astype(object).where(bloque.notna(), None).itertuples(index=False, name=None):
+                if self._fila >= FILAS_MAX_HOJA:
+                    self._nueva_hoja(nombre_hoja, self._columnas)
+                self._hoja.write_row(self._fila, 0, fila)
+                self._fila += 1
+        self.filas_escritas += len(df)
+
+    def cerrar(self):
+        # Un libro sin datos sigue siendo un XLSX válido con una hoja vacía
+        if self._hoja is None:
+            self._libro.add_worksheet(self.nombre_hoja[:31])
+        self._libro.close()
+
+
+def _xlsx(hojas):
+    salida = io.BytesIO()
+    if sum(len(df) for df in hojas.values()) < UMBRAL_FILAS_STREAMING:
+        with pd.ExcelWriter(salida, engine="xlsxwriter") as writer:
+            for nombre, df in hojas.items():
+                df.to_excel(writer, index=False, sheet_name=nombre)
+        return salida.getvalue()
+
+    # Resultado grande: hoja a hoja y fila a fila en modo constant_memory
+    escritor = EscritorExcelIncremental(salida)
+    for nombre, df in hojas.items():
+        escritor.escribir(df, nombre)
+    escritor.cerrar()
+    return salida.getvalue()
+
+
+def _csv(df):
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def _parquet(df):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("La exportación a Parquet necesita pyarrow (pip install pyarrow)") from None
+    salida = io.BytesIO()
+    df.to_parquet(salida, index=False)
+    return salida.getvalue()
+
+
+def _zip(contenidos, extension):
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, datos in contenidos.items():
+            archivo.writestr(f"{nombre}.{extension}", datos)
+    return salida.getvalue()
+
+
+def generar_exportacion(hojas, formato="xlsx"):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    if formato == "xlsx":
+        return _xlsx(hojas)
+    convertir = _csv if formato == "csv" else _parquet
+    # CSV y Parquet guardan una sola tabla por archivo: con varias hojas entrego un ZIP con un archivo por hoja
+    if len(hojas) == 1:
+        return convertir(next(iter(hojas.values())))
+    return _zip({nombre: convertir(df) for nombre, df in hojas.items()}, FORMATOS[formato]["extension"])
+
+
+# Huella del resultado a exportar: nombres de las hojas más la huella de cada DataFrame
+def huella_exportacion(hojas, formato):
+    h = hashlib.sha256(formato.encode())
+    for nombre, df in hojas.items():
+        h.update(str(nombre).encode())
+        h.update(huella_dataframe(df).encode())
+    return h.hexdigest()
+
+
+# Bytes del archivo de exportación, desde la caché si ese mismo resultado ya se exportó en ese formato
+def exportar(hojas, formato="xlsx", cache=None):
+    cache = CACHE_EXPORTACIONES if cache is None else cache
+    clave = huella_exportacion(hojas, formato)
+    encontrado, datos = cache.obtener(clave)
+    if not encontrado:
+        datos = generar_exportacion(hojas, formato)
+        cache.guardar(clave, datos)
+    return datos
+
+
+# Nombre de archivo y tipo MIME de una exportación (ZIP si CSV/Parquet llevan varias hojas)
+def descripcion_archivo(prefijo, hojas, formato):
+    if formato != "xlsx" and len(hojas) > 1:
+        return f"{prefijo}.zip", MIME_ZIP
+    return f"{prefijo}.{FORMATOS[formato]['extension']}", FORMATOS[formato]["mime"]
@@ -0,0 +1,338 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from agro.data import (
+    cargar_cultivos, cargar_terreno, obtener_cubo_demanda, obtener_mapas_provincias, obtener_ventanas_siembra,
+    obtener_tabla_costes, obtener_catalogo_recursos, obtener_historial_cultivos, familias_por_cultivo,
+    obtener_distribuciones_mercado, obtener_matriz_compatibilidad, USOS_APTITUD, normalizar_texto
+)
+from agro.service.calendario import construir_calendario, COLUMNAS_CALENDARIO
+from agro.service.exportacion import exportar
+from app.metricas_module import tramo
+
+# -------------------------------
+# Pipelines de recomendación sin interfaz
+# -------------------------------
+# Aquí vive todo lo que antes se calculaba dentro del script de Streamlit: conversión de fechas,
+# calendario, plantas estimadas, el resumen por cultivo y la exportación a Excel. Cada pipeline recibe
+# solo los parámetros del usuario, carga los datos de referencia de la caché compartida y devuelve un
+# diccionario con DataFrames listo para pintar (Streamlit) o para serializar a JSON (API HTTP).
+ZONA_POR_DEFECTO = "mediterraneo"
+TABLAS = {
+    "resultados", "calendario", "superficie_por_cultivo", "resumen", "curva", "plan", "resumen_anual", "riesgo", "frontera",
+    "podados",
+}
+ANIOS_PLAN = (2, 5)
+USOS_SUELO = (*USOS_APTITUD, "ninguno")
+# Procesos para las cadenas de la frontera de Pareto (dentro del servicio cada petición ya corre en su proceso)
+PROCESOS_FRONTERA = int(os.environ.get("AGROSMART_PROCESOS_FRONTERA", 1))
+COLUMNAS_FECHA = {"Inicio", "Fin"}
+
+
+# Provincia equivalente y zona climática de la provincia elegida (mismo criterio que el formulario)
+def resolver_provincia(provincia):
+    _, provincia_equivalencias, provincia_zonaclimatica = obtener_mapas_provincias()
+    return provincia_equivalencias.get(provincia), provincia_zonaclimatica.get(provincia, ZONA_POR_DEFECTO)
+
+
+# Capacidades mensuales de recursos pedidas por el usuario: litros de agua al mes y, si se limita la maquinaria,
+# las horas del catálogo de recursos. Sin ninguna de las dos el modelo no lleva restricciones de recursos.
+def capacidades_recursos(agua_mensual_l=None, limitar_maquinaria=False):
+    from app.multicultivo_module import RECURSO_AGUA, RECURSO_MAQUINARIA
+
+    capacidades = {}
+    if agua_mensual_l is not None:
+        capacidades[RECURSO_AGUA] = float(agua_mensual_l)
+    if limitar_maquinaria:
+        capacidades[RECURSO_MAQUINARIA] = obtener_catalogo_recursos().horas_maquinaria_mes()
+    return capacidades or None
+
+
+# Aptitud de cada cultivo para el suelo (textura y pH) y el clima de la provincia (o de su equivalente si no
+# hay datos de clima de la del usuario). Con uso_suelo="ninguno" los motores no la tienen en cuenta.
+def aptitud_suelo(tipo_suelo, ph_suelo, provincia, provincia_equiv, uso_suelo):
+    if uso_suelo not in USOS_SUELO:
+        raise ValueError(f"'uso_suelo' debe ser uno de {list(USOS_SUELO)}")
+    if uso_suelo == "ninguno":
+        return None
+    return obtener_matriz_compatibilidad().aptitud(tipo_suelo, ph_suelo, (provincia, provincia_equiv))
+
+
+# Tablas del resultado multicultivo para la interfaz: calendario, plantas estimadas, superficie y resumen por cultivo.
+# El motor ya devuelve un ResultadoMulticultivo con todo calculado; una tabla de filas (Cultivo, Mes, Cantidad_kg,
+# Beneficio_€, Superficie_ha) se convierte antes.
+def preparar_resultado_multicultivo(resultado, cultivos_df):
+    from app.multicultivo_module import ResultadoMulticultivo
+
+    if not isinstance(resultado, ResultadoMulticultivo):
+        resultado = ResultadoMulticultivo.desde_tabla(resultado)
+    if not resultado.completo:
+        resultado.completar(cultivos_df)
+    return resultado.tablas()
+
+
+# Completo las propuestas de monocultivo con plantas estimadas y el calendario de siembra y cosecha.
+# Si se indica la provincia equivalente, las fechas salen de su ventana en el calendario por provincia
+# (inicio de siembra y fin de cosecha); los cultivos sin ventana usan las fechas generales del catálogo.
+def preparar_resultado_monocultivo(df_monocultivo, cultivos_df, provincia_equiv=None, ventanas=None):
+    df_monocultivo = df_monocultivo.copy()
+    avisos = []
+
+    # Normalizo los nombres para evitar errores por diferencias de tildes o mayúsculas/minúsculas
+    nombres = normalizar_texto(cultivos_df["Nombre_cultivo"])
+    df_monocultivo["Cultivo"] = normalizar_texto(df_monocultivo["Cultivo"])
+
+    if "Unidades_m2" in cultivos_df.columns:
+        unidades = dict(zip(nombres, cultivos_df["Unidades_m2"]))
+        df_monocultivo["Unidades_m2"] = df_monocultivo["Cultivo"].map(unidades)
+        df_monocultivo["Plantas estimadas"] = (df_monocultivo["Superficie (ha)"] * 10000 * df_monocultivo["Unidades_m2"]).astype(int)
+    else:
+        avisos.append("⚠️ No se encontró la columna 'Unidades_m2'. No se puede calcular plantas estimadas.")
+        df_monocultivo["Plantas estimadas"] = 0
+
+    # Calendario a partir de las fechas de siembra y cosecha del catálogo
+    usados = nombres.isin(df_monocultivo["Cultivo"].unique()).to_numpy()
+    siembra = cultivos_df["Fecha_siembra"][usados].to_numpy(dtype=object, copy=True)
+    cosecha = cultivos_df["Fecha_cosecha"][usados].to_numpy(dtype=object, copy=True)
+    if ventanas is not None and provincia_equiv:
+        for i, cultivo in enumerate(cultivos_df["Nombre_cultivo"][usados]):
+            ventana = ventanas.ventana(cultivo, provincia_equiv)
+            if ventana is not None:
+                siembra[i], cosecha[i] = ventana["siembra"][0], ventana["cosecha"][1]
+    calendario = construir_calendario(nombres[usados], siembra, fin=cosecha).dropna().reset_index(drop=True)
+
+    return {"resultados": df_monocultivo, "calendario": calendario, "avisos": avisos}
+
+
+# Gap relativo entre un plan y una referencia mejor (la cota de la relajación o el óptimo exacto)
+def gap_relativo(beneficio, referencia):
+    if referencia is None or abs(referencia) < 1e-9:
+        return None
+    return round(max(referencia - beneficio, 0.0) / abs(referencia), 6)
+
+
+def recomendar_multicultivo(superficie_ha, acceso_agua, provincia, tipo_suelo="franco", ph_suelo=None, uso_suelo="filtro",
+                            modo_flexible=False, restriccion_mensual=False, presupuesto_agua_l=None, agua_mensual_l=None,
+                            limitar_maquinaria=False, n_escenarios=0, escenarios_saa=0, semilla=0, solver=None, vista_previa=False,
+                            debug=False):
+    from app.multicultivo_module import ejecutar_modelo_multicultivo
+    from app.escenarios_module import evaluar_plan_multicultivo
+
+    with tramo("carga_datos"):
+        provincia_equiv, zona_climatica = resolver_provincia(provincia)
+        cultivos_df = cargar_cultivos(copiar=False)
+        costes = obtener_tabla_costes()
+        cubo, terreno_df, ventanas = obtener_cubo_demanda(), cargar_terreno(copiar=False), obtener_ventanas_siembra()
+        capacidades = capacidades_recursos(agua_mensual_l, limitar_maquinaria)
+        distribuciones = obtener_distribuciones_mercado() if escenarios_saa else None
+        aptitud = aptitud_suelo(tipo_suelo, ph_suelo, provincia, provincia_equiv, uso_suelo)
+    resultado, estado, beneficio = ejecutar_modelo_multicultivo(
+        cultivos_df, cubo, terreno_df,
+        superficie_ha, tipo_suelo, acceso_agua,
+        provincia_equiv, zona_climatica,
+        modo_flexible,
+        debug=debug,
+        solver=solver,
+        restriccion_mensual=restriccion_mensual,
+        ventanas=ventanas,
+        costes=costes,
+        presupuesto_agua_l=presupuesto_agua_l,
+        capacidades_recursos=capacidades,
+        escenarios_saa=escenarios_saa,
+        distribuciones=distribuciones,
+        semilla=semilla,
+        aptitud=aptitud,
+        uso_aptitud=uso_suelo,
+        vista_previa=vista_previa
+    )
+
+    salida = {"estado": estado, "beneficio_total": float(beneficio or 0.0), "zona_climatica": zona_climatica}
+    # Cultivos que el presolve quitó antes de construir el modelo, con el motivo y el cultivo que los domina
+    if resultado.podados is not None:
+        salida["podados"] = resultado.podados
+    # La vista previa (relajación lineal + redondeo) lleva la cota superior del óptimo y su gap respecto a ella
+    if vista_previa:
+        salida["cota_superior"] = resultado.cota_superior
+        salida["gap_cota"] = gap_relativo(salida["beneficio_total"], resultado.cota_superior)
+    # Bandas de riesgo del plan en n_escenarios de precio y rendimiento (P10/P50/P90)
+    if n_escenarios:
+        with tramo("escenarios"):
+            salida["riesgo"] = evaluar_plan_multicultivo(
+                resultado.tabla(), obtener_distribuciones_mercado(), cubo.por_producto()["demanda_total_kg"].to_dict(),
+                costes, provincia_equiv, n_escenarios=n_escenarios, semilla=semilla
+            )
+    if not len(resultado):
+        vacio = pd.DataFrame()
+        salida.update({"resultados": vacio, "calendario": vacio, "superficie_por_cultivo": vacio, "resumen": vacio})
+    else:
+        with tramo("preparacion_resultado"):
+            salida.update(preparar_resultado_multicultivo(resultado, cultivos_df))
+    return salida
+
+
+def recomendar_monocultivo(superficie_ha, provincia=None, tipo_suelo=None, ph_suelo=None, uso_suelo="filtro",
+                           n_escenarios=0, semilla=0):
+    from app.monocultivo_module import generar_propuestas_monocultivo
+    from app.escenarios_module import evaluar_propuestas_monocultivo
+
+    with tramo("carga_datos"):
+        provincia_equiv = resolver_provincia(provincia)[0] if provincia else None
+        cultivos_df = cargar_cultivos(copiar=False)
+        cubo, terreno_df, costes = obtener_cubo_demanda(), cargar_terreno(copiar=False), obtener_tabla_costes()
+        aptitud = aptitud_suelo(tipo_suelo, ph_suelo, provincia, provincia_equiv, uso_suelo)
+    with tramo("propuestas"):
+        df_monocultivo = generar_propuestas_monocultivo(
+            cultivos_df, cubo, terreno_df, superficie_ha,
+            provincia_equiv=provincia_equiv, costes=costes, aptitud=aptitud, uso_aptitud=uso_suelo
+        )
+
+    if df_monocultivo is None or df_monocultivo.empty:
+        return {"estado": "Sin solución", "resultados": pd.DataFrame(), "calendario": pd.DataFrame(), "avisos": []}
+    salida = {"estado": "Optimal"}
+    if n_escenarios:
+        with tramo("escenarios"):
+            salida["riesgo"] = evaluar_propuestas_monocultivo(
+                df_monocultivo, obtener_distribuciones_mercado(), costes, provincia_equiv,
+                n_escenarios=n_escenarios, semilla=semilla
+            )
+    with tramo("preparacion_resultado"):
+        salida.update(preparar_resultado_monocultivo(df_monocultivo, cultivos_df, provincia_equiv, obtener_ventanas_siembra()))
+    return salida
+
+
+# Curva de beneficio frente a superficie reutilizando un único modelo multicultivo persistente
+def curva_sensibilidad(superficie_ha, acceso_agua, provincia, tipo_suelo=None, ph_suelo=None, uso_suelo="filtro",
+                       modo_flexible=False, restriccion_mensual=False, presupuesto_agua_l=None, agua_mensual_l=None,
+                       limitar_maquinaria=False, puntos=12, solver=None):
+    from app.multicultivo_module import ModeloMulticultivo, barrido_superficie
+
+    provincia_equiv, zona_climatica = resolver_provincia(provincia)
+    modelo_multi = ModeloMulticultivo.desde_datos(
+        cargar_cultivos(copiar=False), obtener_cubo_demanda(), superficie_ha, acceso_agua, zona_climatica, modo_flexible,
+        restriccion_mensual=restriccion_mensual, provincia_equiv=provincia_equiv, ventanas=obtener_ventanas_siembra(),
+        costes=obtener_tabla_costes(), presupuesto_agua_l=presupuesto_agua_l,
+        capacidades_recursos=capacidades_recursos(agua_mensual_l, limitar_maquinaria),
+        aptitud=aptitud_suelo(tipo_suelo, ph_suelo, provincia, provincia_equiv, uso_suelo), uso_aptitud=uso_suelo
+    )
+    if modelo_multi is None:
+        return pd.DataFrame(columns=["Superficie_ha", "Beneficio_€", "Estado"])
+    superficies = np.round(np.linspace(0.1, max(2 * superficie_ha, 1.0), puntos), 2)
+    return barrido_superficie(modelo_multi, superficies, solver=solver)
+
+
+# Plan plurianual (2-5 campañas) con rotación de familias. Si se indica id_terreno, la última campaña de su
+# historial es el estado inicial (y su suelo y pH, si no se indican otros); con penalizacion_ha la repetición de
+# familia se penaliza en lugar de prohibirse.
+def recomendar_plan_rotacion(superficie_ha, acceso_agua, provincia, anios=3, id_terreno=None, penalizacion_ha=None,
+                             tipo_suelo=None, ph_suelo=None, uso_suelo="filtro", modo_flexible=False,
+                             restriccion_mensual=False, presupuesto_agua_l=None, agua_mensual_l=None,
+                             limitar_maquinaria=False, solver=None):
+    from app.multicultivo_module import ModeloMulticultivo, planificar_rotacion
+
+    if not ANIOS_PLAN[0] <= anios <= ANIOS_PLAN[1]:
+        raise ValueError(f"El plan plurianual admite entre {ANIOS_PLAN[0]} y {ANIOS_PLAN[1]} años")
+    provincia_equiv, zona_climatica = resolver_provincia(provincia)
+    terreno = obtener_matriz_compatibilidad().perfil_terreno(id_terreno) if id_terreno is not None else None
+    # Un terreno desconocido planificaría en silencio con el historial vacío
+    if id_terreno is not None and terreno is None:
+        raise ValueError(f"Terreno desconocido: {id_terreno}")
+    if terreno is not None:
+        tipo_suelo = tipo_suelo or terreno["tipo_suelo"]
+        ph_suelo = terreno["ph_suelo"] if ph_suelo is None else ph_suelo
+    modelo_multi = ModeloMulticultivo.desde_datos(
+        cargar_cultivos(copiar=False), obtener_cubo_demanda(), superficie_ha, acceso_agua, zona_climatica, modo_flexible,
+        restriccion_mensual=restriccion_mensual, provincia_equiv=provincia_equiv, ventanas=obtener_ventanas_siembra(),
+        costes=obtener_tabla_costes(), presupuesto_agua_l=presupuesto_agua_l,
+        capacidades_recursos=capacidades_recursos(agua_mensual_l, limitar_maquinaria),
+        aptitud=aptitud_suelo(tipo_suelo, ph_suelo, provincia, provincia_equiv, uso_suelo), uso_aptitud=uso_suelo
+    )
+    salida = {"estado": "Sin solución", "beneficio_total": 0.0, "zona_climatica": zona_climatica,
+              "ultima_campana": None, "plan": pd.DataFrame(), "resumen_anual": pd.DataFrame()}
+    if modelo_multi is None:
+        return salida
+
+    ultima_campana, ocupacion_inicial = None, {}
+    if id_terreno is not None:
+        ultima_campana, ocupacion_inicial = obtener_historial_cultivos().ultima_campana(id_terreno, superficie_ha)
+    anio_inicial = ultima_campana + 1 if ultima_campana is not None else 1
+    plan, resumen_anual = planificar_rotacion(
+        modelo_multi, familias_por_cultivo(modelo_multi.productos), anios, ocupacion_inicial,
+        penalizacion_ha=penalizacion_ha, solver=solver, anio_inicial=anio_inicial
+    )
+    estados = set(resumen_anual["Estado"])
+    salida.update({
+        "estado": estados.pop() if len(estados) == 1 else "Mixto",
+        "beneficio_total": round(float(resumen_anual["Beneficio_€"].sum() - resumen_anual["Penalizacion_€"].sum()), 2),
+        "ultima_campana": ultima_campana,
+        "plan": plan,
+        "resumen_anual": resumen_anual,
+    })
+    return salida
+
+
+# Frontera de Pareto beneficio / agua / diversidad del multicultivo (mismos parámetros que recomendar_multicultivo).
+# "frontera" tiene todos los puntos resueltos (columna Eficiente para los no dominados) y "referencia" el óptimo sin límites.
+def recomendar_frontera(superficie_ha, acceso_agua, provincia, tipo_suelo="franco", ph_suelo=None, uso_suelo="filtro",
+                        modo_flexible=False, restriccion_mensual=False, presupuesto_agua_l=None, agua_mensual_l=None,
+                        limitar_maquinaria=False, puntos_agua=None, niveles_diversidad=None, solver=None):
+    from app.multicultivo_module import ejecutar_frontera_pareto, PUNTOS_AGUA, NIVELES_DIVERSIDAD
+
+    provincia_equiv, zona_climatica = resolver_provincia(provincia)
+    frontera = ejecutar_frontera_pareto(
+        cargar_cultivos(copiar=False), obtener_cubo_demanda(), superficie_ha, acceso_agua, provincia_equiv, zona_climatica,
+        modo_flexible=modo_flexible, restriccion_mensual=restriccion_mensual, ventanas=obtener_ventanas_siembra(),
+        costes=obtener_tabla_costes(), presupuesto_agua_l=presupuesto_agua_l,
+        capacidades_recursos=capacidades_recursos(agua_mensual_l, limitar_maquinaria),
+        aptitud=aptitud_suelo(tipo_suelo, ph_suelo, provincia, provincia_equiv, uso_suelo), uso_aptitud=uso_suelo,
+        puntos_agua=puntos_agua or PUNTOS_AGUA, niveles_diversidad=niveles_diversidad or NIVELES_DIVERSIDAD,
+        procesos=PROCESOS_FRONTERA, solver=solver
+    )
+    referencia = {
+        clave: (None if pd.isna(valor) else valor.item() if isinstance(valor, np.generic) else valor)
+        for clave, valor in frontera.referencia.items()
+    }
+    return {
+        "estado": referencia.get("Estado", "Sin solución"),
+        "zona_climatica": zona_climatica,
+        "referencia": referencia,
+        "frontera": frontera.puntos,
+    }
+
+
+# Excel con una hoja por tabla (desde la caché de exportaciones si ese resultado ya se exportó)
+def exportar_excel(hojas):
+    return exportar(hojas, "xlsx")
+
+
+# Paso los DataFrames a listas de registros JSON (fechas en ISO 8601, NaN como null)
+def serializar(salida):
+    return {
+        clave: json.loads(valor.to_json(orient="records", date_format="iso", force_ascii=False))
+        if isinstance(valor, pd.DataFrame) else valor
+        for clave, valor in salida.items()
+    }
+
+
+# Operación inversa para los clientes: reconstruyo las tablas y las columnas de fechas
+def deserializar(salida):
+    resultado = {}
+    for clave, valor in salida.items():
+        if clave in TABLAS:
+            valor = pd.DataFrame.from_records(valor)
+            # Una lista vacía no lleva columnas: el calendario las necesita para formatear las fechas
+            if clave == "calendario" and valor.empty:
+                valor = pd.DataFrame(columns=COLUMNAS_CALENDARIO)
+            for columna in COLUMNAS_FECHA.intersection(valor.columns):
+                valor[columna] = pd.to_datetime(valor[columna]).dt.tz_localize(None)
+        resultado[clave] = valor
+    return resultado
+
+
+PIPELINES = {
+    "monocultivo": recomendar_monocultivo,
+    "multicultivo": recomendar_multicultivo,
+    "plurianual": recomendar_plan_rotacion,
+    "pareto": recomendar_frontera,
+}
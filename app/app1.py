@@ -1,13 +1,10 @@
 import streamlit as st
-import pandas as pd
-import base64
-import numpy as np
-import io
-from datetime import datetime, timedelta
-from pulp import LpProblem, LpMaximize, LpVariable, lpSum, LpStatus, value, LpBinary, PULP_CBC_CMD
-import streamlit.components.v1 as components
-import plotly.express as px
-import plotly.graph_objects as go
+from datetime import datetime
+from app.assets_module import imagen_base64
+from app.metricas_module import REGISTRO, metricas_activas, tramo
+
+# Las dependencias pesadas (pandas, numpy, plotly, PuLP a través de los módulos de modelos) no se importan aquí:
+# solo las carga la página del formulario, que es la única que las usa. Así Inicio y Acerca de arrancan rápido.
 
 # -------------------------------
 # Configuración general de la página
@@ -61,12 +58,11 @@ st.markdown(custom_styles, unsafe_allow_html=True)
 # Función para mostrar el logo en el sidebar
 # -------------------------------
 # Uso esta función para mostrar un logo codificado en base64, para que el sidebar tenga identidad visual consistente
+# (la codificación se hace una sola vez por proceso en imagen_base64)
 def mostrar_logo_sidebar(ruta):
-    with open(ruta, "rb") as f:
-        imagen_base64 = base64.b64encode(f.read()).decode()
     logo_html = f"""
     <div class='sidebar-logo'>
-        <img src="data:image/png;base64,{imagen_base64}" 
+        <img src="data:image/png;base64,{imagen_base64(ruta)}" 
              alt="Logo AgroSmart"
              style="max-width: 180px; height: auto;">
     </div>
@@ -75,24 +71,6 @@ def mostrar_logo_sidebar(ruta):
 
 mostrar_logo_sidebar("images/solo_logo1.png")
 
-# -------------------------------
-# Cargar equivalencias de provincias y zonas climáticas
-# -------------------------------
-# Intento cargar un archivo CSV para mapear provincias a zonas climáticas equivalentes.
-# Esto me permite ajustar recomendaciones según condiciones regionales reales.
-try:
-    equivalencias = pd.read_csv("agro/data/equivalencias_provincias_clima.csv")
-    equivalencias.columns = equivalencias.columns.str.strip()
-    provincias_disponibles = sorted(equivalencias["Provincia_usuario"].dropna().unique().tolist())
-    provincia_equivalencias = dict(zip(equivalencias["Provincia_usuario"].str.strip(), equivalencias["Provincia_equivalente"].str.strip()))
-    provincia_zonaclimatica = dict(zip(equivalencias["Provincia_usuario"].str.strip(), equivalencias["Zona_climatica"].str.strip().str.lower()))
-except Exception as e:
-    # En caso de fallo, asigno valores por defecto para evitar que la app falle
-    provincias_disponibles = ["Navarra", "Murcia", "Lleida"]
-    provincia_equivalencias = {prov: prov for prov in provincias_disponibles}
-    provincia_zonaclimatica = {prov: "mediterraneo" for prov in provincias_disponibles}
-    st.warning(f"⚠️ No se pudo cargar el archivo de equivalencias. Usando valores por defecto. Detalle: {e}")
-
 # -------------------------------
 # Menú lateral para navegación
 # -------------------------------
@@ -103,8 +81,7 @@ menu = st.sidebar.radio("Navegacion", ["Inicio", "Acerca de", "Formulario Agrico
 # Mostrar logo principal centrado
 # -------------------------------
 # Aquí muestro el logo grande en la parte superior central de la app para dar identidad visual
-with open("images/logo_transp_verde.png", "rb") as f:
-    logo_base64 = base64.b64encode(f.read()).decode()
+logo_base64 = imagen_base64("images/logo_transp_verde.png")
 
 st.markdown(f"""
     <div style='
@@ -130,9 +107,7 @@ if menu == "Inicio":
 
     # Función para mostrar la imagen portada con marco verde y sombra elegante
     def mostrar_imagen_con_marco_verde(ruta_imagen, caption=""):
-        with open(ruta_imagen, "rb") as f:
-            img_bytes = f.read()
-            encoded = base64.b64encode(img_bytes).decode()
+        encoded = imagen_base64(ruta_imagen)
 
         st.markdown(f"""
         <div style="padding: 1rem; background-color: #AABFA4; border-radius: 16px;
@@ -186,6 +161,90 @@ elif menu == "Acerca de":
 
 # ===============================  # =============================== 
 if menu == "Formulario Agricola Usuario":
+    # Cargo aquí las dependencias pesadas, solo cuando se abre la página que ejecuta los modelos
+    import pandas as pd
+    import plotly.express as px
+    from agro.data import obtener_mapas_provincias
+    # La app es un cliente ligero: toda la lógica de recomendación vive en agro.service
+    # (en este proceso o, si se define AGROSMART_API_URL, en el servicio HTTP)
+    from agro.service import (
+        recomendar, recomendar_en_segundo_plano, sensibilidad, exportar, descripcion_archivo, huella_exportacion, FORMATOS,
+        ErrorServicio
+    )
+    from app.escenarios_module import N_ESCENARIOS, N_ESCENARIOS_SAA
+
+    # Descarga bajo demanda: el archivo solo se genera al pulsar "Preparar descarga" (y sale de la caché de
+    # exportaciones si ese resultado ya se exportó). Lo guardo en la sesión junto a la huella del resultado
+    # para que el botón de descarga siga disponible en los reruns mientras el resultado no cambie.
+    def boton_descarga(hojas, prefijo, etiqueta, clave):
+        columna_formato, columna_boton = st.columns([1, 2])
+        formato = columna_formato.selectbox("Formato", list(FORMATOS), key=f"formato_{clave}")
+        huella = huella_exportacion(hojas, formato)
+        preparado = st.session_state.get(f"descarga_{clave}")
+        if columna_boton.button(f"{etiqueta} ({formato.upper()})", key=f"preparar_{clave}"):
+            nombre_archivo, mime = descripcion_archivo(f"{prefijo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}", hojas, formato)
+            try:
+                preparado = {"huella": huella, "datos": exportar(hojas, formato), "nombre": nombre_archivo, "mime": mime}
+            except ImportError as e:
+                # Falta la dependencia opcional del formato (p. ej. pyarrow para Parquet)
+                st.error(f"❌ {e}")
+                return
+            st.session_state[f"descarga_{clave}"] = preparado
+        if preparado is not None and preparado["huella"] == huella:
+            st.download_button(
+                label=f"📥 Descargar {preparado['nombre']}",
+                data=preparado["datos"],
+                file_name=preparado["nombre"],
+                mime=preparado["mime"],
+                key=f"descargar_{clave}"
+            )
+
+    # Vista previa con el plan exacto en segundo plano: pido la vista previa (relajación lineal + redondeo, unos
+    # milisegundos) y lanzo el MILP exacto en un hilo. Mientras no termina devuelvo la vista previa; al terminar,
+    # el resultado exacto. Guardo el trabajo en la sesión con la clave de los parámetros: si cambian, empieza otro.
+    def recomendar_con_vista_previa(parametros):
+        clave = repr(sorted(parametros.items()))
+        trabajo = st.session_state.get("multicultivo_exacto")
+        if trabajo is None or trabajo["clave"] != clave:
+            previa = recomendar("multicultivo", vista_previa=True, **parametros)
+            # Los mensajes de depuración solo se pueden pintar desde el hilo de la sesión
+            futuro = recomendar_en_segundo_plano("multicultivo", **{**parametros, "debug": False})
+            trabajo = {"clave": clave, "previa": previa, "futuro": futuro}
+            st.session_state["multicultivo_exacto"] = trabajo
+        if not trabajo["futuro"].done():
+            return trabajo["previa"], trabajo
+        return trabajo["futuro"].result(), trabajo
+
+    # Mientras se muestra la vista previa, este fragmento comprueba cada medio segundo si el MILP exacto ya ha
+    # terminado y, cuando termina, vuelve a ejecutar la página para pintarlo
+    fragmento = getattr(st, "fragment", None) or st.experimental_fragment
+
+    @fragmento(run_every=0.5)
+    def esperar_plan_exacto():
+        trabajo = st.session_state.get("multicultivo_exacto")
+        if trabajo is not None and trabajo["futuro"].done():
+            st.rerun()
+
+    # Cada gráfico pasa por aquí para medir su serialización en el tramo "graficos" (con las métricas activas)
+    def mostrar_grafico(fig, **opciones):
+        with tramo("graficos"):
+            st.plotly_chart(fig, **opciones)
+
+    # -------------------------------
+    # Cargar equivalencias de provincias y zonas climáticas
+    # -------------------------------
+    # Intento cargar un archivo CSV para mapear provincias a zonas climáticas equivalentes.
+    # Esto me permite ajustar recomendaciones según condiciones regionales reales.
+    # La lectura pasa por la capa de datos compartida, así que el CSV solo se parsea una vez por proceso.
+    try:
+        provincias_disponibles, provincia_equivalencias, provincia_zonaclimatica = obtener_mapas_provincias()
+    except Exception as e:
+        # En caso de fallo, asigno valores por defecto para evitar que la app falle
+        provincias_disponibles = ["Navarra", "Murcia", "Lleida"]
+        provincia_equivalencias = {prov: prov for prov in provincias_disponibles}
+        provincia_zonaclimatica = {prov: "mediterraneo" for prov in provincias_disponibles}
+        st.warning(f"⚠️ No se pudo cargar el archivo de equivalencias. Usando valores por defecto. Detalle: {e}")
+
     st.subheader("Formulario del Usuario Agrícola")
     st.markdown("Introduce los siguientes datos para generar recomendaciones:")
 
@@ -203,15 +262,51 @@ if menu == "Formulario Agricola Usuario":
     # Condiciones de agua
     with st.expander("🚰 Condiciones de agua", expanded=True):
         acceso_agua = st.selectbox("Acceso a agua", ["bajo", "medio", "alto"])
+        # Presupuesto de agua opcional para el multicultivo (0 = sin límite); el modelo trabaja en litros
+        presupuesto_agua_m3 = st.number_input(
+            "Presupuesto anual de agua (m³, 0 = sin límite)",
+            min_value=0.0,
+            step=100.0,
+            value=0.0
+        )
+        presupuesto_agua_l = presupuesto_agua_m3 * 1000 if presupuesto_agua_m3 > 0 else None
+        # Tope de agua de cada mes (multicultivo): el consumo de cada cultivo se reparte entre los meses de su ciclo
+        agua_mensual_m3 = st.number_input(
+            "Agua disponible cada mes (m³, 0 = sin límite)",
+            min_value=0.0,
+            step=10.0,
+            value=0.0
+        )
+        agua_mensual_l = agua_mensual_m3 * 1000 if agua_mensual_m3 > 0 else None
 
     # Ubicación y tipo de suelo
     with st.expander("📍 Ubicación y suelo", expanded=True):
         provincia = st.selectbox("Provincia", provincias_disponibles)
-        provincia_equiv = provincia_equivalencias.get(provincia)
-        tipo_suelo = st.selectbox("Tipo de suelo", ["franco", "arcilloso", "arenoso", "franco-arcilloso", "franco-arenoso"])
+        tipo_suelo = st.selectbox("Tipo de suelo", ["franco", "arcilloso", "arenoso", "franco-arcilloso", "franco-arenoso", "limoso"])
+        ph_suelo = st.number_input("pH del suelo (0 si no lo conoces)", min_value=0.0, max_value=14.0, step=0.1, value=0.0) or None
+        # Los cultivos poco aptos para el suelo y el clima de la provincia se descartan o rinden menos
+        usos_suelo = {
+            "Descartar cultivos poco aptos": "filtro",
+            "Reducir el rendimiento de los poco aptos": "ponderar",
+            "No tener en cuenta el suelo": "ninguno",
+        }
+        uso_suelo = usos_suelo[st.selectbox("Aptitud del suelo y el clima", list(usos_suelo))]
 
     # Opción para permitir recomendaciones fuera de zona climática
     modo_flexible = st.checkbox("¿Permitir recomendaciones fuera de tu zona climática?", value=False)
+
+    # Opción para limitar la producción de cada mes de cosecha a la demanda registrada en ese mes (multicultivo)
+    restriccion_mensual = st.checkbox("¿Ajustar la producción a la demanda de cada mes de cosecha?", value=False)
+
+    # Opción para no superar cada mes las horas de la maquinaria del catálogo de recursos (multicultivo)
+    limitar_maquinaria = st.checkbox("¿Limitar la siembra y la cosecha a las horas de maquinaria disponibles?", value=False)
+
+    # Opción para elegir el plan que maximiza el beneficio medio en escenarios de precio y rendimiento (multicultivo)
+    optimizar_escenarios = st.checkbox("¿Optimizar el beneficio medio frente a la variación de precios y rendimientos? (más lento)", value=False)
+    escenarios_saa = N_ESCENARIOS_SAA if optimizar_escenarios else 0
+
+    # Opción para ver al instante un plan aproximado mientras se calcula el óptimo (multicultivo, sin escenarios)
+    vista_previa = st.checkbox("¿Mostrar al instante un plan aproximado mientras se calcula el exacto?", value=True)
     zona_climatica = provincia_zonaclimatica.get(provincia, "mediterraneo")
 
     # Botón para generar recomendaciones
@@ -232,23 +327,20 @@ if menu == "Formulario Agricola Usuario":
             <h4 style='color: #4E5B48;'>🌿 Parámetros del usuario</h4>
             <ul style='list-style-type: none; padding-left: 0; font-size: 1.1em;'>
                 <li><strong>Provincia:</strong> {provincia}</li>
-                <li><strong>Tipo de suelo:</strong> {tipo_suelo}</li>
+                <li><strong>Tipo de suelo:</strong> {tipo_suelo}{f' (pH {ph_suelo:.1f})' if ph_suelo else ''}</li>
                 <li><strong>Superficie:</strong> {superficie_ha} ha</li>
                 <li><strong>Opción de cultivo:</strong> {cultivo_unico}</li>
                 <li><strong>Zona climática:</strong> {zona_climatica}</li>
                 <li><strong>Filtro climático flexible:</strong> {'Sí' if modo_flexible else 'No'}</li>
+                <li><strong>Demanda mensual:</strong> {'Sí' if restriccion_mensual else 'No'}</li>
+                <li><strong>Presupuesto de agua:</strong> {f'{presupuesto_agua_m3:,.0f} m³' if presupuesto_agua_l else 'Sin límite'}</li>
+                <li><strong>Agua por mes:</strong> {f'{agua_mensual_m3:,.0f} m³' if agua_mensual_l else 'Sin límite'}</li>
+                <li><strong>Límite de maquinaria:</strong> {'Sí' if limitar_maquinaria else 'No'}</li>
+                <li><strong>Optimización en escenarios:</strong> {'Sí' if optimizar_escenarios else 'No'}</li>
             </ul>
         </div>
         """, unsafe_allow_html=True)
 
-        # Cargo los datasets base
-        cultivos_df = pd.read_csv("agro/data/cultivos_hortalizas_final.csv")
-        demanda_df = pd.read_csv("agro/data/demanda_clientes.csv")
-        terreno_df = pd.read_csv("agro/data/terreno_suelo_final.csv")
-
-        # Calculo rendimiento por metro cuadrado para cálculos posteriores
-        cultivos_df["Rendimiento_kg_m2"] = cultivos_df["Rendimiento_promedio (kg/ha)"].fillna(0) / 10000
-
         # Flag para modo debug (mensajes técnicos)
         modo_debug = False
 
@@ -256,18 +348,45 @@ if menu == "Formulario Agricola Usuario":
   # ===============================  # ===============================  # ===============================  # ===============================
         
         if cultivo_unico == "Multicultivo":
-            # Importo la función principal que ejecuta el modelo de optimización para multicultivo
-            from app.multicultivo_module import ejecutar_modelo_multicultivo
+            from app.cache_module import estadisticas_cache
             
-            # Ejecuto el modelo pasando todos los datos relevantes y condiciones del usuario
-            # El modelo me devuelve un DataFrame con resultados, el estado de la optimización y el beneficio total
-            df_resultados, estado, beneficio = ejecutar_modelo_multicultivo(
-                cultivos_df, demanda_df, terreno_df,
-                superficie_ha, tipo_suelo, acceso_agua,
-                provincia_equiv, zona_climatica,
-                modo_flexible,
+            # Pido la recomendación multicultivo con las condiciones del usuario. El pipeline me devuelve
+            # los resultados ya completados (calendario, plantas, resumen), el estado de la optimización y el beneficio total
+            parametros_multi = dict(
+                superficie_ha=superficie_ha, acceso_agua=acceso_agua, provincia=provincia,
+                tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo, modo_flexible=modo_flexible,
+                restriccion_mensual=restriccion_mensual, presupuesto_agua_l=presupuesto_agua_l,
+                agua_mensual_l=agua_mensual_l, limitar_maquinaria=limitar_maquinaria, escenarios_saa=escenarios_saa,
                 debug=modo_debug  # Pasa flag para activar mensajes técnicos en modo debug
             )
+            # La vista previa no existe para el modelo de escenarios: ahí pido directamente el plan exacto
+            con_vista_previa = vista_previa and not escenarios_saa
+            try:
+                if con_vista_previa:
+                    salida, trabajo_exacto = recomendar_con_vista_previa(parametros_multi)
+                else:
+                    salida = recomendar("multicultivo", **parametros_multi)
+            except ErrorServicio as e:
+                st.error(f"❌ {e}")
+                st.stop()
+            df_resultados, estado, beneficio = salida["resultados"], salida["estado"], salida["beneficio_total"]
+
+            # Indico qué plan se está mostrando y la distancia entre la vista previa y el óptimo
+            if con_vista_previa and estado == "Optimal":
+                previa = trabajo_exacto["previa"]
+                if salida is previa:
+                    st.info(
+                        f"⚡ Vista previa (relajación lineal + redondeo): € {beneficio:,.2f}, como mucho un "
+                        f"{(previa['gap_cota'] or 0):.2%} por debajo del óptimo (cota € {previa['cota_superior']:,.2f}). "
+                        "Calculando el plan exacto…"
+                    )
+                    esperar_plan_exacto()
+                else:
+                    diferencia = max(beneficio - previa["beneficio_total"], 0.0)
+                    st.success(
+                        f"✅ Plan exacto (MILP): € {beneficio:,.2f}. La vista previa quedó a € {diferencia:,.2f} "
+                        f"({diferencia / beneficio if beneficio else 0.0:.2%}) del óptimo."
+                    )
             
             # Verifico si obtuve resultados válidos; si no, aviso al usuario que no hay cultivos que cumplan las condiciones
             if df_resultados is None or df_resultados.empty:
@@ -280,36 +399,12 @@ if menu == "Formulario Agricola Usuario":
                     st.markdown(f"💧 Nivel de agua del usuario: {acceso_agua}")
                     st.markdown(f"📌 Estado del modelo: {estado}")
                     st.markdown(f"💰 Beneficio total anual optimizado: € {beneficio:,.2f}")
+                    st.markdown(f"🗃️ Caché de resultados: {estadisticas_cache()}")
                 
                 # Preparación para mostrar el calendario anual de siembra y cosecha
                 st.markdown("### 🗓️ Calendario estimado anual de siembra y cosecha")
                 
-                # Normalizo nombres de cultivos en ambos DataFrames para asegurar coincidencias
-                cultivos_df["Nombre_cultivo"] = cultivos_df["Nombre_cultivo"].str.strip().str.lower()
-                df_resultados["Cultivo"] = df_resultados["Cultivo"].str.strip().str.lower()
-                
-                # Obtengo la duración en días de cada cultivo desde cultivos_df y la asigno a df_resultados
-                df_duracion = cultivos_df.set_index("Nombre_cultivo")["Duración_cultivo_días"].to_dict()
-                df_resultados["Duracion_dias"] = df_resultados["Cultivo"].map(df_duracion)
-                
-                # Función para estimar fecha de inicio a partir del mes (usando año fijo 2025)
-                def estimar_inicio(mes):
-                    try:
-                        return datetime(2025, int(mes), 1)
-                    except:
-                        return pd.NaT
-                
-                # Calculo fechas de inicio y fin del ciclo para cada cultivo y mes
-                df_resultados["Inicio"] = df_resultados["Mes"].apply(estimar_inicio)
-                df_resultados["Fin"] = df_resultados.apply(
-                    lambda row: row["Inicio"] + timedelta(days=int(row["Duracion_dias"])) if pd.notnull(row["Inicio"]) else pd.NaT,
-                    axis=1
-                )
-                
-                # Preparo el DataFrame para mostrar calendario, ordenando y limpiando datos
-                calendario_multi = df_resultados.dropna(subset=["Inicio", "Fin"])[["Cultivo", "Inicio", "Fin"]].copy()
-                calendario_multi["Cultivo"] = calendario_multi["Cultivo"].str.capitalize()
-                calendario_multi = calendario_multi.sort_values("Inicio")
+                calendario_multi = salida["calendario"]
                 
                 # Si hay datos para mostrar, genero el gráfico timeline con Plotly
                 if not calendario_multi.empty:
@@ -323,7 +418,7 @@ if menu == "Formulario Agricola Usuario":
                     )
                     fig2.update_yaxes(autorange="reversed")
                     fig2.update_layout(height=420, margin=dict(l=0, r=0, t=50, b=0))
-                    st.plotly_chart(fig2, use_container_width=True)
+                    mostrar_grafico(fig2, use_container_width=True)
                     
                     # También muestro la tabla con fechas en formato legible (dd/mm)
                     calendario_mostrar = calendario_multi.copy()
@@ -351,8 +446,7 @@ if menu == "Formulario Agricola Usuario":
                 
                 # Visualización del uso del terreno con un treemap para entender la distribución por cultivo
                 st.markdown("### 🌾 Visualización de uso del terreno por cultivo")
-                superficie_por_cultivo = df_resultados.groupby("Cultivo")["Superficie_ha"].sum().reset_index()
-                superficie_por_cultivo["Cultivo"] = superficie_por_cultivo["Cultivo"].str.capitalize()
+                superficie_por_cultivo = salida["superficie_por_cultivo"]
                 
                 fig_treemap = px.treemap(
                     superficie_por_cultivo,
@@ -364,21 +458,10 @@ if menu == "Formulario Agricola Usuario":
                 )
                 fig_treemap.update_traces(textinfo="label+value+percent entry")
                 fig_treemap.update_layout(margin=dict(t=50, l=10, r=10, b=10))
-                st.plotly_chart(fig_treemap, use_container_width=True, key="grafico_treemap")
-                
-                # Calculo estimado del número de plantas por cultivo para dimensionar recursos
-                unidades_dict = cultivos_df.set_index("Nombre_cultivo")["Unidades_m2"].to_dict()
-                df_resultados["Unidades_m2"] = df_resultados["Cultivo"].map(unidades_dict)
-                df_resultados["Plantas estimadas"] = (df_resultados["Superficie_ha"] * 10000 * df_resultados["Unidades_m2"]).fillna(0).astype(int)
+                mostrar_grafico(fig_treemap, use_container_width=True, key="grafico_treemap")
                 
-                # Agrupo datos para crear un resumen con producción, beneficio, superficie, duración y plantas estimadas
-                resumen = df_resultados.groupby("Cultivo").agg(
-                    Total_kg=("Cantidad_kg", "sum"),
-                    Total_beneficio=("Beneficio_€", "sum"),
-                    Total_superficie_ha=("Superficie_ha", "sum"),
-                    Duracion_dias=("Duracion_dias", "mean"),
-                    Plantas_estimadas=("Plantas estimadas", "sum")
-                ).reset_index()
+                # Resumen con producción, beneficio, superficie, duración y plantas estimadas por cultivo
+                resumen = salida["resumen"]
                 
                 # Presento recomendaciones visuales para cada cultivo en forma de tarjetas
                 st.markdown("### 🪴 Resultados personalizados por cultivo")
@@ -470,19 +553,10 @@ if menu == "Formulario Agricola Usuario":
                     title="Representación por cultivo"
                 )
                 fig_resumen.update_layout(xaxis_title="Cultivo", yaxis_title="Valor", height=420)
-                st.plotly_chart(fig_resumen, use_container_width=True)
+                mostrar_grafico(fig_resumen, use_container_width=True)
                 
-                # Preparo y ofrezco descarga del resultado completo en un archivo Excel con timestamp
-                output = io.BytesIO()
-                nombre_archivo = f"recomendacion_multicultivo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                    df_resultados.to_excel(writer, index=False, sheet_name="Multicultivo")
-                st.download_button(
-                    label="🗓️ Descargar resultados en Excel",
-                    data=output.getvalue(),
-                    file_name=nombre_archivo,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                # Ofrezco la descarga del resultado completo (Excel, CSV o Parquet) con timestamp, generada al pulsar
+                boton_descarga({"Multicultivo": df_resultados}, "recomendacion_multicultivo", "🗓️ Preparar descarga", "multicultivo")
                 
                 # Finalmente, muestro un recuadro con el beneficio total optimizado para que el usuario lo tenga presente
                 st.markdown(f"""
@@ -500,18 +574,129 @@ if menu == "Formulario Agricola Usuario":
                 </div>
                 """, unsafe_allow_html=True)
 
+                # Bandas de riesgo opcionales: el plan elegido evaluado en miles de escenarios de precio y rendimiento
+                if st.checkbox("📊 Ver bandas de riesgo (precio y rendimiento)"):
+                    try:
+                        riesgo = recomendar(
+                            "multicultivo",
+                            superficie_ha=superficie_ha, acceso_agua=acceso_agua, provincia=provincia,
+                            tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo, modo_flexible=modo_flexible,
+                            restriccion_mensual=restriccion_mensual, presupuesto_agua_l=presupuesto_agua_l,
+                            agua_mensual_l=agua_mensual_l, limitar_maquinaria=limitar_maquinaria,
+                            escenarios_saa=escenarios_saa, n_escenarios=N_ESCENARIOS
+                        )["riesgo"].iloc[0]
+                    except ErrorServicio as e:
+                        st.error(f"❌ {e}")
+                        st.stop()
+                    columna_p10, columna_p50, columna_p90, columna_perdida = st.columns(4)
+                    columna_p10.metric("P10 (año malo)", f"€ {riesgo['P10_€']:,.0f}")
+                    columna_p50.metric("P50 (año típico)", f"€ {riesgo['P50_€']:,.0f}")
+                    columna_p90.metric("P90 (año bueno)", f"€ {riesgo['P90_€']:,.0f}")
+                    columna_perdida.metric("Probabilidad de pérdida", f"{riesgo['Prob_perdida']:.1%}")
+                    st.caption(f"Beneficio medio en {riesgo['Escenarios']:,} escenarios: € {riesgo['Beneficio_medio_€']:,.2f}")
+
+                # Análisis de sensibilidad opcional: curva de beneficio frente a superficie con el modelo persistente
+                if st.checkbox("📈 Ver sensibilidad del beneficio a la superficie"):
+                    curva = sensibilidad(
+                        superficie_ha=superficie_ha, acceso_agua=acceso_agua, provincia=provincia,
+                        tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo,
+                        modo_flexible=modo_flexible, restriccion_mensual=restriccion_mensual,
+                        presupuesto_agua_l=presupuesto_agua_l, agua_mensual_l=agua_mensual_l,
+                        limitar_maquinaria=limitar_maquinaria
+                    )
+                    if not curva.empty:
+                        fig_sensibilidad = px.line(
+                            curva, x="Superficie_ha", y="Beneficio_€", markers=True,
+                            title="Beneficio anual optimizado según la superficie disponible"
+                        )
+                        fig_sensibilidad.add_vline(x=superficie_ha, line_dash="dash", line_color="#37572F")
+                        fig_sensibilidad.update_layout(xaxis_title="Superficie (ha)", yaxis_title="Beneficio (€)", height=420)
+                        mostrar_grafico(fig_sensibilidad, use_container_width=True)
+
+                # Compromiso opcional entre beneficio, agua y número de cultivos (frontera de Pareto)
+                if st.checkbox("⚖️ Ver compromiso entre beneficio, agua y diversidad"):
+                    try:
+                        salida_pareto = recomendar(
+                            "pareto",
+                            superficie_ha=superficie_ha, acceso_agua=acceso_agua, provincia=provincia,
+                            tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo, modo_flexible=modo_flexible,
+                            restriccion_mensual=restriccion_mensual, presupuesto_agua_l=presupuesto_agua_l,
+                            agua_mensual_l=agua_mensual_l, limitar_maquinaria=limitar_maquinaria
+                        )
+                    except ErrorServicio as e:
+                        st.error(f"❌ {e}")
+                        st.stop()
+                    frontera = salida_pareto["frontera"]
+                    frontera = frontera[frontera["Eficiente"]].copy() if not frontera.empty else frontera
+                    if frontera.empty:
+                        st.warning("⚠️ No se pudo calcular la frontera con las condiciones actuales.")
+                    else:
+                        frontera["Agua_m3"] = frontera["Agua_l"] / 1000
+                        frontera["Cultivos"] = frontera["Cultivos"].astype(int).astype(str)
+                        fig_pareto = px.scatter(
+                            frontera.sort_values("Agua_m3"), x="Agua_m3", y="Beneficio_€", color="Cultivos", hover_data=["Plan"],
+                            title="Beneficio frente a agua utilizada (cada color es un número de cultivos)"
+                        )
+                        fig_pareto.update_traces(marker_size=11)
+                        fig_pareto.update_layout(xaxis_title="Agua utilizada al año (m³)", yaxis_title="Beneficio (€)", height=420)
+                        mostrar_grafico(fig_pareto, use_container_width=True)
+                        st.caption("Solo se muestran las combinaciones no dominadas: ninguna otra da más beneficio con menos agua y más cultivos.")
+
+                # Plan plurianual opcional: varias campañas seguidas sin repetir familia botánica en el mismo terreno,
+                # partiendo de la última campaña registrada en el historial del terreno elegido
+                if st.checkbox("🔄 Ver plan plurianual con rotación de familias"):
+                    from agro.data import obtener_historial_cultivos
+
+                    columna_anios, columna_terreno, columna_penalizacion = st.columns(3)
+                    anios_plan = columna_anios.slider("Años del plan", min_value=2, max_value=5, value=3)
+                    terreno_plan = columna_terreno.selectbox(
+                        "Terreno (historial)", ["Sin historial", *obtener_historial_cultivos().terrenos]
+                    )
+                    penalizacion_ha = columna_penalizacion.number_input(
+                        "Penalización por repetir familia (€/ha, 0 = prohibido)", min_value=0.0, step=100.0, value=0.0
+                    )
+                    try:
+                        salida_plan = recomendar(
+                            "plurianual",
+                            superficie_ha=superficie_ha, acceso_agua=acceso_agua, provincia=provincia, anios=anios_plan,
+                            id_terreno=None if terreno_plan == "Sin historial" else int(terreno_plan),
+                            penalizacion_ha=penalizacion_ha or None,
+                            tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo,
+                            modo_flexible=modo_flexible, restriccion_mensual=restriccion_mensual,
+                            presupuesto_agua_l=presupuesto_agua_l, agua_mensual_l=agua_mensual_l,
+                            limitar_maquinaria=limitar_maquinaria
+                        )
+                    except ErrorServicio as e:
+                        st.error(f"❌ {e}")
+                        st.stop()
+                    if salida_plan["ultima_campana"] is not None:
+                        st.caption(f"Estado inicial: campaña {salida_plan['ultima_campana']} del terreno {terreno_plan}.")
+                    st.dataframe(salida_plan["resumen_anual"], use_container_width=True)
+                    if not salida_plan["plan"].empty:
+                        superficie_familia = salida_plan["plan"].groupby(["Año", "Familia"], as_index=False)["Superficie_ha"].sum()
+                        superficie_familia["Año"] = superficie_familia["Año"].astype(str)
+                        fig_plan = px.bar(
+                            superficie_familia, x="Año", y="Superficie_ha", color="Familia",
+                            title="Superficie por familia botánica en cada campaña"
+                        )
+                        fig_plan.update_layout(xaxis_title="Campaña", yaxis_title="Superficie (ha)", height=420)
+                        mostrar_grafico(fig_plan, use_container_width=True)
+
 
 
  # =============================== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== ===== =====                
 
         elif cultivo_unico == "Monocultivo":
-            # Importo la función principal que genera las propuestas de cultivo para monocultivo
-            from app.monocultivo_module import generar_propuestas_monocultivo
-            
-            # Ejecuto la función con los datos de cultivos, demanda, terreno y superficie del usuario
-            df_monocultivo = generar_propuestas_monocultivo(
-                cultivos_df, demanda_df, terreno_df, superficie_ha
-            )
+            # Pido las propuestas de monocultivo para la superficie del usuario (ya con plantas estimadas y calendario)
+            try:
+                salida = recomendar(
+                    "monocultivo", superficie_ha=superficie_ha, provincia=provincia,
+                    tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo
+                )
+            except ErrorServicio as e:
+                st.error(f"❌ {e}")
+                st.stop()
+            df_monocultivo = salida["resultados"]
             
             # Muestro un título para la sección de propuestas de monocultivo más rentables
             st.markdown("## 🌾 Propuestas de monocultivo más rentables")
@@ -520,76 +705,14 @@ if menu == "Formulario Agricola Usuario":
             if df_monocultivo is None or df_monocultivo.empty:
                 st.warning("⚠️ No se encontraron cultivos válidos para monocultivo con las condiciones actuales.")
             else:
-                # Normalizo los nombres de cultivos para evitar errores por diferencias de tildes o mayúsculas/minúsculas
-                import unicodedata
-                def quitar_tildes(texto):
-                    if isinstance(texto, str):
-                        # Utilizo unicodedata para eliminar tildes y otros acentos
-                        return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-                    return texto
-                
-                cultivos_df["Nombre_cultivo"] = cultivos_df["Nombre_cultivo"].str.strip().str.lower().apply(quitar_tildes)
-                df_monocultivo["Cultivo"] = df_monocultivo["Cultivo"].str.strip().str.lower().apply(quitar_tildes)
-                
-                # Compruebo si el DataFrame tiene la columna de duración del ciclo y, si no, la agrego
-                if "Duración del ciclo (días)" not in df_monocultivo.columns:
-                    if "Duración_cultivo_días" in cultivos_df.columns:
-                        duraciones = cultivos_df.set_index("Nombre_cultivo")["Duración_cultivo_días"].to_dict()
-                        df_monocultivo["Duración del ciclo (días)"] = df_monocultivo["Cultivo"].map(duraciones)
-                    else:
-                        # Si no encuentro la columna, asigno 90 días como valor por defecto y aviso
-                        st.warning("⚠️ No se encontró la columna 'Duración_cultivo_días'. Se usará 90 días por defecto.")
-                        df_monocultivo["Duración del ciclo (días)"] = 90
-                    
-                    # Calculo métricas derivadas útiles para análisis y visualización
-                    df_monocultivo["Ciclos por año"] = (365 / df_monocultivo["Duración del ciclo (días)"]).apply(np.floor).astype(int)
-                    df_monocultivo["Producción total anual (kg)"] = df_monocultivo["Producción (kg)"] * df_monocultivo["Ciclos por año"]
-                    df_monocultivo["Beneficio total anual (€)"] = df_monocultivo["Beneficio estimado (€)"] * df_monocultivo["Ciclos por año"]
-                    df_monocultivo["Producción mensual promedio (kg)"] = df_monocultivo["Producción total anual (kg)"] / 12
-                    df_monocultivo["Beneficio mensual promedio (€)"] = df_monocultivo["Beneficio total anual (€)"] / 12
-                
-                # Calculo el número estimado de plantas a partir de las unidades por metro cuadrado y superficie
-                if "Unidades_m2" in cultivos_df.columns:
-                    unidades_dict = cultivos_df.set_index("Nombre_cultivo")["Unidades_m2"].to_dict()
-                    df_monocultivo["Unidades_m2"] = df_monocultivo["Cultivo"].map(unidades_dict)
-                    df_monocultivo["Plantas estimadas"] = (df_monocultivo["Superficie (ha)"] * 10000 * df_monocultivo["Unidades_m2"]).astype(int)
-                else:
-                    # Si no encuentro la columna necesaria, aviso y asigno cero a plantas estimadas
-                    st.warning("⚠️ No se encontró la columna 'Unidades_m2'. No se puede calcular plantas estimadas.")
-                    df_monocultivo["Plantas estimadas"] = 0
+                for aviso in salida["avisos"]:
+                    st.warning(aviso)
                 
                 # =======================
                 # Construcción del calendario visual para monocultivo
                 # =======================
                 st.markdown("### 📅 Fechas de siembra y cosecha")
-                
-                # Función auxiliar para convertir fechas en texto a objetos datetime con año base fijo
-                def convertir_fecha(fecha_texto, año_base=2025):
-                    try:
-                        if isinstance(fecha_texto, str):
-                            fecha_texto = fecha_texto.strip().replace("/", "-")
-                            dia, mes = map(int, fecha_texto.split("-"))
-                            return datetime(año_base, mes, dia)
-                    except:
-                        return pd.NaT
-                    return pd.NaT
-                
-                # Normalizo nombres para asegurar coincidencias en ambas tablas
-                cultivos_df["Nombre_cultivo"] = cultivos_df["Nombre_cultivo"].str.strip().str.lower()
-                df_monocultivo["Cultivo"] = df_monocultivo["Cultivo"].str.strip().str.lower()
-                
-                # Convierto las columnas de fechas de siembra y cosecha a datetime para visualización
-                cultivos_df["Fecha_siembra"] = cultivos_df["Fecha_siembra"].astype(str).str.strip()
-                cultivos_df["Fecha_cosecha"] = cultivos_df["Fecha_cosecha"].astype(str).str.strip()
-                cultivos_df["Fecha_siembra_dt"] = cultivos_df["Fecha_siembra"].apply(convertir_fecha)
-                cultivos_df["Fecha_cosecha_dt"] = cultivos_df["Fecha_cosecha"].apply(convertir_fecha)
-                
-                # Filtro cultivos usados en la propuesta para construir calendario personalizado
-                cultivos_usados = df_monocultivo["Cultivo"].unique()
-                df_calendario = cultivos_df[cultivos_df["Nombre_cultivo"].isin(cultivos_usados)].copy()
-                df_calendario = df_calendario[["Nombre_cultivo", "Fecha_siembra_dt", "Fecha_cosecha_dt"]]
-                df_calendario.columns = ["Cultivo", "Inicio", "Fin"]
-                df_calendario = df_calendario.dropna()
+                df_calendario = salida["calendario"]
                 
                 # Formateo fechas para mostrar tabla legible con estilos CSS
                 df_mostrar = df_calendario.copy()
@@ -623,22 +746,24 @@ if menu == "Formulario Agricola Usuario":
                     )
                     fig.update_yaxes(autorange="reversed")
                     fig.update_layout(height=420, margin=dict(l=0, r=0, t=50, b=0))
-                    st.plotly_chart(fig, use_container_width=True)
+                    mostrar_grafico(fig, use_container_width=True)
                 else:
                     st.warning("⚠️ No se encontraron cultivos con fechas válidas para mostrar el calendario.")
                 
-                # Preparación y descarga del archivo Excel con los resultados del monocultivo
-                output_mono = io.BytesIO()
-                nombre_archivo_mono = f"recomendacion_monocultivo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                with pd.ExcelWriter(output_mono, engine="xlsxwriter") as writer:
-                    df_monocultivo.to_excel(writer, index=False, sheet_name="Monocultivo")
-                
-                st.download_button(
-                    label="📥 Descargar resultados en Excel",
-                    data=output_mono.getvalue(),
-                    file_name=nombre_archivo_mono,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                # Descarga de los resultados del monocultivo (Excel, CSV o Parquet), generada al pulsar
+                boton_descarga({"Monocultivo": df_monocultivo}, "recomendacion_monocultivo", "📥 Preparar descarga", "monocultivo")
+
+                # Bandas de riesgo opcionales de cada propuesta en miles de escenarios de precio y rendimiento
+                if st.checkbox("📊 Ver bandas de riesgo por propuesta (precio y rendimiento)"):
+                    try:
+                        riesgo = recomendar(
+                            "monocultivo", superficie_ha=superficie_ha, provincia=provincia,
+                            tipo_suelo=tipo_suelo, ph_suelo=ph_suelo, uso_suelo=uso_suelo, n_escenarios=N_ESCENARIOS
+                        )["riesgo"]
+                    except ErrorServicio as e:
+                        st.error(f"❌ {e}")
+                        st.stop()
+                    st.dataframe(riesgo, use_container_width=True)
                 
                 # =======================
                 # Recomendaciones visuales por cultivo (tarjetas con detalles)
@@ -753,4 +878,32 @@ if menu == "Formulario Agricola Usuario":
                 )
                 
                 # Finalmente muestro el gráfico en Streamlit
-                st.plotly_chart(fig_resumen_mono, use_container_width=True)
+                mostrar_grafico(fig_resumen_mono, use_container_width=True)
+
+
+# -------------------------------
+# Panel de desarrollo con las métricas del pipeline
+# -------------------------------
+# Solo aparece con AGROSMART_METRICAS=1: tiempos agregados por etapa, la traza de la última recomendación y
+# las estadísticas de la última resolución. Si la app usa el servicio HTTP (AGROSMART_API_URL), aquí solo
+# se ven las etapas de este proceso (p. ej. los gráficos); las del servicio están en su GET /metricas.
+if metricas_activas():
+    with st.sidebar.expander("🛠️ Métricas (desarrollo)"):
+        resumen_tramos = REGISTRO.resumen()
+        if resumen_tramos:
+            st.markdown("**Tiempo por etapa**")
+            st.dataframe(resumen_tramos, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Todavía no hay etapas medidas.")
+        # Trazas de la más reciente a la más antigua, empezando por la última recomendación
+        raices = list(reversed(REGISTRO.trazas))
+        if raices:
+            pipelines = [i for i, raiz in enumerate(raices) if raiz.startswith("pipeline_")]
+            raiz = st.selectbox("Última traza de", raices, index=pipelines[0] if pipelines else 0, key="traza_metricas")
+            st.dataframe(REGISTRO.trazas[raiz], hide_index=True, use_container_width=True)
+        if REGISTRO.ultima_resolucion is not None:
+            st.markdown("**Última resolución**")
+            st.json(REGISTRO.ultima_resolucion)
+        if st.button("Reiniciar métricas", key="reiniciar_metricas"):
+            REGISTRO.reiniciar()
+            st.rerun()
@@ -0,0 +1,13 @@
+import base64
+from functools import lru_cache
+
+# -------------------------------
+# Recursos estáticos de la interfaz
+# -------------------------------
+# Las imágenes de la app (logos y portada) no cambian entre reruns, así que las leo y codifico
+# en base64 una sola vez por proceso. La caché vive en este módulo, no en el script de Streamlit,
+# para que sobreviva a cada rerun y la compartan todas las sesiones.
+@lru_cache(maxsize=None)
+def imagen_base64(ruta):
+    with open(ruta, "rb") as f:
+        return base64.b64encode(f.read()).decode()
@@ -0,0 +1,273 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+from agro.data import (
+    cargar_cultivos, cargar_terreno, obtener_cubo_demanda, obtener_ventanas_siembra, obtener_tabla_costes,
+    cargar_equivalencias, normalizar_texto, obtener_matriz_compatibilidad, USOS_APTITUD
+)
+from agro.service.exportacion import EscritorExcelIncremental
+
+# -------------------------------
+# Modo lote / cartera: recomendaciones para muchas fincas en una sola llamada
+# -------------------------------
+# Pensado para cooperativas con cientos de parcelas. Recibo una tabla de perfiles de finca,
+# reparto el trabajo en un pool de procesos y voy escribiendo los resultados por finca a CSV, Parquet o XLSX
+# a medida que llegan, sin acumular toda la cartera en memoria.
+#
+# Cada proceso del pool parsea los datos de referencia una sola vez (inicializador) y recibe las fincas
+# agrupadas por (agua, zona climática, provincia equivalente, modo flexible, aptitud): dentro de un grupo el modelo
+# multicultivo tiene exactamente la misma estructura y solo cambia la superficie, así que se reutiliza como plantilla.
+# Como en el formulario y en el servicio, la aptitud de suelo, pH y clima de cada finca (MatrizCompatibilidad) filtra
+# o pondera los cultivos según `uso_suelo`.
+COLUMNAS_PERFIL = ["id_finca", "superficie_ha", "tipo_suelo", "ph_suelo", "acceso_agua", "provincia", "modo_flexible"]
+MOTORES = ("monocultivo", "multicultivo")
+USOS_SUELO = (*USOS_APTITUD, "ninguno")
+TAMANO_LOTE = 25
+FORMATOS_SALIDA = ("csv", "parquet", "xlsx")
+
+_datos_worker = {}
+
+
+# Construyo la tabla de perfiles a partir de terreno_suelo_final.csv (una finca por fila)
+def perfiles_desde_terreno(terreno_df=None, acceso_agua="medio", modo_flexible=False):
+    terreno_df = cargar_terreno() if terreno_df is None else terreno_df
+    return pd.DataFrame({
+        "id_finca": terreno_df["ID_terreno"].to_numpy(),
+        "superficie_ha": terreno_df["Superficie_ha"].to_numpy(),
+        "tipo_suelo": terreno_df["Tipo_suelo"].str.lower().to_numpy(),
+        "ph_suelo": terreno_df["pH_suelo"].to_numpy(),
+        "acceso_agua": acceso_agua,
+        "provincia": terreno_df["Ubicación"].to_numpy(),
+        "modo_flexible": modo_flexible,
+    })
+
+
+# Completo cada perfil con su provincia equivalente y zona climática (mismo criterio que el formulario) y con la
+# clave de su aptitud: huella de la matriz de compatibilidad y posición de la finca en cada eje (textura, pH, clima).
+# Dos fincas con la misma clave tienen la misma aptitud y pueden compartir plantilla.
+def preparar_perfiles(perfiles, uso_suelo="filtro"):
+    faltan = [c for c in ("superficie_ha", "provincia") if c not in perfiles.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas obligatorias en los perfiles: {faltan}")
+
+    perfiles = perfiles.copy()
+    if "id_finca" not in perfiles.columns:
+        perfiles["id_finca"] = range(1, len(perfiles) + 1)
+    perfiles["tipo_suelo"] = perfiles.get("tipo_suelo", "franco")
+    perfiles["ph_suelo"] = perfiles.get("ph_suelo", np.nan)
+    perfiles["acceso_agua"] = perfiles.get("acceso_agua", "medio")
+    perfiles["modo_flexible"] = perfiles.get("modo_flexible", False)
+    perfiles["acceso_agua"] = perfiles["acceso_agua"].fillna("medio").str.strip().str.lower()
+    perfiles["modo_flexible"] = perfiles["modo_flexible"].fillna(False).astype(bool)
+
+    equivalencias = cargar_equivalencias(copiar=False).drop_duplicates("Clave_provincia").set_index("Clave_provincia")
+    clave = normalizar_texto(perfiles["provincia"].astype(str))
+    perfiles["provincia_equiv"] = clave.map(equivalencias["Provincia_equivalente"]).fillna(perfiles["provincia"]).to_numpy()
+    perfiles["zona_climatica"] = clave.map(equivalencias["Zona_climatica"].str.lower()).fillna("mediterraneo").to_numpy()
+
+    if uso_suelo == "ninguno":
+        perfiles["clave_aptitud"] = ""
+    else:
+        matriz = obtener_matriz_compatibilidad()
+        perfiles["clave_aptitud"] = [
+            f"{matriz.huella()}:{matriz.indice_textura(t)}:{matriz.indice_ph(ph)}:{matriz.indice_clima(p, pe)}"
+            for t, ph, p, pe in zip(perfiles["tipo_suelo"], perfiles["ph_suelo"], perfiles["provincia"], perfiles["provincia_equiv"])
+        ]
+    return perfiles
+
+
+def _inicializar_worker():
+    # Parseo los datos de referencia una vez por proceso y los reutilizo para todas sus fincas
+    _datos_worker["cultivos"] = cargar_cultivos()
+    _datos_worker["demanda"] = obtener_cubo_demanda()
+    _datos_worker["terreno"] = cargar_terreno()
+    _datos_worker["ventanas"] = obtener_ventanas_siembra()
+    _datos_worker["costes"] = obtener_tabla_costes()
+    _datos_worker["compatibilidad"] = obtener_matriz_compatibilidad()
+
+
+def _resolver_lote(fincas, motores, solver, uso_suelo="filtro"):
+    from app.monocultivo_module import generar_propuestas_monocultivo
+    from app.multicultivo_module import ModeloMulticultivo
+
+    if not _datos_worker:
+        _inicializar_worker()
+    cultivos_df, demanda, terreno_df = _datos_worker["cultivos"], _datos_worker["demanda"], _datos_worker["terreno"]
+
+    # Todas las fincas del lote comparten agua, zona, provincia equivalente (ventanas de siembra), modo flexible y
+    # aptitud: construyo el modelo una vez y para cada finca solo actualizo la superficie antes de volver a resolver
+    primera = fincas[0]
+    aptitud = None
+    if uso_suelo != "ninguno":
+        aptitud = _datos_worker["compatibilidad"].aptitud(
+            primera["tipo_suelo"], primera["ph_suelo"], (primera["provincia"], primera["provincia_equiv"])
+        )
+    plantilla = None
+    if "multicultivo" in motores:
+        plantilla = ModeloMulticultivo.desde_datos(
+            cultivos_df, demanda, primera["superficie_ha"],
+            primera["acceso_agua"], primera["zona_climatica"], primera["modo_flexible"],
+            provincia_equiv=primera["provincia_equiv"], ventanas=_datos_worker["ventanas"], costes=_datos_worker["costes"],
+            aptitud=aptitud, uso_aptitud=uso_suelo
+        )
+
+    salida = []
+    for finca in fincas:
+        for motor in motores:
+            inicio = time.perf_counter()
+            if motor == "multicultivo":
+                if plantilla is None:
+                    df, estado, beneficio = pd.DataFrame(), "Sin solución", 0.0
+                else:
+                    plantilla.actualizar_superficie(finca["superficie_ha"])
+                    estado, beneficio = plantilla.resolver(solver)
+                    df = plantilla.resultado()
+            else:
+                df = generar_propuestas_monocultivo(
+                    cultivos_df, demanda, terreno_df, finca["superficie_ha"],
+                    provincia_equiv=finca["provincia_equiv"], costes=_datos_worker["costes"],
+                    aptitud=aptitud, uso_aptitud=uso_suelo
+                )
+                estado = "Optimal" if not df.empty else "Sin solución"
+                beneficio = float(df["Beneficio total anual (€)"].max()) if not df.empty else 0.0
+
+            df = df.copy()
+            df.insert(0, "id_finca", finca["id_finca"])
+            salida.append({
+                "id_finca": finca["id_finca"],
+                "motor": motor,
+                "estado": estado,
+                "beneficio_€": beneficio,
+                "filas": len(df),
+                "tiempo_s": time.perf_counter() - inicio,
+                "resultado": df,
+            })
+    return salida
+
+
+# Escritor incremental: cada tabla se va añadiendo al archivo según llegan los lotes
+class EscritorResultados:
+    def __init__(self, ruta, formato):
+        self.ruta = ruta
+        self.formato = formato
+        self._escritor_parquet = None
+        self._escritor_excel = None
+        self._cabecera_escrita = False
+
+    def escribir(self, df):
+        if df.empty:
+            return
+        if self.formato == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._escritor_parquet is None:
+                tabla = pa.Table.from_pandas(df, preserve_index=False)
+                self._escritor_parquet = pq.ParquetWriter(self.ruta, tabla.schema)
+            else:
+                tabla = pa.Table.from_pandas(df, schema=self._escritor_parquet.schema, preserve_index=False)
+            self._escritor_parquet.write_table(tabla)
+        elif self.formato == "xlsx":
+            # Libro en modo constant_memory: cada lote se vuelca fila a fila sin retener la cartera en memoria
+            if self._escritor_excel is None:
+                self._escritor_excel = EscritorExcelIncremental(self.ruta, "Resultados")
+            self._escritor_excel.escribir(df)
+        else:
+            df.to_csv(self.ruta, mode="a" if self._cabecera_escrita else "w", header=not self._cabecera_escrita, index=False)
+            self._cabecera_escrita = True
+
+    def cerrar(self):
+        if self._escritor_parquet is not None:
+            self._escritor_parquet.close()
+        if self._escritor_excel is not None:
+            self._escritor_excel.cerrar()
+
+
+# Agrupo las fincas que comparten estructura de modelo y parto cada grupo en lotes de tamaño fijo
+def _lotes_por_plantilla(perfiles, tamano_lote):
+    for _, grupo in perfiles.groupby(["acceso_agua", "zona_climatica", "provincia_equiv", "modo_flexible", "clave_aptitud"], sort=False):
+        fincas = grupo[COLUMNAS_PERFIL + ["provincia_equiv", "zona_climatica"]].to_dict("records")
+        for i in range(0, len(fincas), tamano_lote):
+            yield fincas[i:i + tamano_lote]
+
+
+# Ejecuto los motores para toda la cartera. Devuelvo el resumen por finca y las métricas de rendimiento.
+def ejecutar_lote(perfiles, salida, formato="csv", motores=MOTORES, procesos=None, tamano_lote=TAMANO_LOTE, solver=None,
+                  uso_suelo="filtro"):
+    if formato not in FORMATOS_SALIDA:
+        raise ValueError(f"Formato no soportado: {formato}")
+    if uso_suelo not in USOS_SUELO:
+        raise ValueError(f"'uso_suelo' debe ser uno de {list(USOS_SUELO)}")
+    # Compruebo pyarrow antes de lanzar el pool: sin él la cartera se resolvería entera para fallar al escribir
+    if formato == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("La salida en Parquet necesita pyarrow (pip install pyarrow)") from None
+    motores = tuple(motores)
+    perfiles = preparar_perfiles(perfiles, uso_suelo)
+
+    escritores = {motor: EscritorResultados(f"{salida}_{motor}.{formato}", formato) for motor in motores}
+    resumen = []
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker) as pool:
+            futuros = [pool.submit(_resolver_lote, lote, motores, solver, uso_suelo) for lote in _lotes_por_plantilla(perfiles, tamano_lote)]
+            for futuro in as_completed(futuros):
+                for registro in futuro.result():
+                    escritores[registro["motor"]].escribir(registro.pop("resultado"))
+                    resumen.append(registro)
+    finally:
+        for escritor in escritores.values():
+            escritor.cerrar()
+    duracion = time.perf_counter() - inicio
+
+    resumen_df = pd.DataFrame(resumen)
+    resumen_df.to_csv(f"{salida}_resumen.csv", index=False)
+    metricas = {
+        "fincas": len(perfiles),
+        "resoluciones": len(resumen_df),
+        "duracion_s": duracion,
+        "fincas_por_segundo": len(perfiles) / duracion if duracion else 0.0,
+    }
+    return resumen_df, metricas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recomendaciones AgroSmart en lote para una cartera de fincas")
+    parser.add_argument("perfiles", nargs="?", help="CSV con perfiles de finca (por defecto, terreno_suelo_final.csv)")
+    parser.add_argument("--salida", default="resultados_lote", help="Prefijo de los archivos de salida")
+    parser.add_argument("--formato", choices=FORMATOS_SALIDA, default="csv")
+    parser.add_argument("--motor", choices=["ambos", *MOTORES], default="ambos")
+    parser.add_argument("--agua", default="medio", help="Acceso a agua cuando el perfil no lo indica")
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--solver", default=None, help="Backend de resolución (cbc, highs)")
+    parser.add_argument("--uso-suelo", choices=USOS_SUELO, default="filtro", help="Uso de la aptitud de suelo, pH y clima")
+    args = parser.parse_args(argv)
+
+    if args.perfiles:
+        perfiles = pd.read_csv(args.perfiles)
+        if "acceso_agua" not in perfiles.columns:
+            perfiles["acceso_agua"] = args.agua
+    else:
+        perfiles = perfiles_desde_terreno(acceso_agua=args.agua)
+
+    motores = MOTORES if args.motor == "ambos" else (args.motor,)
+    _, metricas = ejecutar_lote(
+        perfiles, args.salida, formato=args.formato, motores=motores,
+        procesos=args.procesos, tamano_lote=args.tamano_lote, solver=args.solver, uso_suelo=args.uso_suelo
+    )
+    print(
+        f"{metricas['fincas']} fincas ({metricas['resoluciones']} resoluciones) en {metricas['duracion_s']:.2f} s "
+        f"-> {metricas['fincas_por_segundo']:.1f} fincas/s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
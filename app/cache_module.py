@@ -0,0 +1,259 @@
+import os
+import json
+import pickle
+import hashlib
+import inspect
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Caché de resultados de los motores de recomendación
+# -------------------------------
+# Los modelos son deterministas: con las mismas entradas (superficie, agua, zona, modo flexible...)
+# y los mismos datos, la respuesta es idéntica. Guardo aquí los resultados con una clave canónica
+# para no volver a resolver en cada rerun de Streamlit. La caché es LRU en memoria y, si se configura
+# un directorio (AGROSMART_CACHE_DIR), tiene una segunda capa en disco que sobrevive a reinicios.
+# La capa de disco tiene un tope de tamaño (AGROSMART_CACHE_DISCO_MB): al superarlo borro las entradas usadas
+# hace más tiempo. Las claves llevan la versión del formato y una huella del código de los motores, así que
+# tras cambiar el código no se sirven resultados calculados con el anterior.
+TAMANO_POR_DEFECTO = 128
+TAMANO_DISCO_MB_POR_DEFECTO = 512
+# Subo este número si cambia la forma de los resultados guardados sin cambiar el código de app/ ni agro/
+VERSION_FORMATO = 1
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CacheResultados:
+    def __init__(self, tamano_max=TAMANO_POR_DEFECTO, directorio=None, tamano_disco_mb=TAMANO_DISCO_MB_POR_DEFECTO):
+        self.tamano_max = tamano_max
+        self.directorio = directorio
+        self.tamano_disco = tamano_disco_mb * 1024 * 1024
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _ruta_disco(self, clave):
+        return os.path.join(self.directorio, f"{clave}.pkl")
+
+    def _borrar_disco(self, ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return True, self._entradas[clave]
+
+        # Si no está en memoria, lo busco en la capa de disco y lo promociono a memoria
+        if self.directorio:
+            ruta = self._ruta_disco(clave)
+            if os.path.exists(ruta):
+                try:
+                    with open(ruta, "rb") as f:
+                        valor = pickle.load(f)
+                except Exception:
+                    # Archivo corrupto o escrito por otra versión del código (una clase que ya no existe da
+                    # AttributeError o ModuleNotFoundError): cuenta como fallo y lo borro para no volver a leerlo
+                    self._borrar_disco(ruta)
+                else:
+                    # Marco la entrada como usada para que el recorte de disco borre antes las demás
+                    try:
+                        os.utime(ruta)
+                    except OSError:
+                        pass
+                    with self._lock:
+                        self.aciertos_disco += 1
+                    self._guardar_memoria(clave, valor)
+                    return True, valor
+
+        with self._lock:
+            self.fallos += 1
+        return False, None
+
+    def _guardar_memoria(self, clave, valor):
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.tamano_max:
+                self._entradas.popitem(last=False)
+
+    def guardar(self, clave, valor):
+        self._guardar_memoria(clave, valor)
+        if self.directorio:
+            # Escribo en un temporal y lo renombro para que otro proceso nunca lea un archivo a medias
+            fd, ruta_tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(ruta_tmp, self._ruta_disco(clave))
+            self._recortar_disco()
+
+    # Borro las entradas de disco usadas hace más tiempo hasta quedar por debajo del tope. Otro proceso puede
+    # borrar un archivo entre el listado y el stat, así que ignoro los que ya no están.
+    def _recortar_disco(self):
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".pkl"):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            entradas.append((estado.st_mtime, estado.st_size, ruta))
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.tamano_disco:
+                break
+            self._borrar_disco(ruta)
+            total -= tamano
+
+    def limpiar(self, disco=False):
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = self.aciertos_disco = self.fallos = 0
+        if disco and self.directorio:
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith(".pkl"):
+                    os.remove(os.path.join(self.directorio, nombre))
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.aciertos_disco + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_acierto": (self.aciertos + self.aciertos_disco) / total if total else 0.0,
+                "entradas": len(self._entradas),
+                "tamano_max": self.tamano_max,
+            }
+
+
+# Huella del contenido de un DataFrame: hash vectorizado de filas, columnas y tipos
+def huella_dataframe(df):
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(json.dumps([str(t) for t in df.dtypes]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True, categorize=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+# Normalizo cada parámetro para que entradas equivalentes (1.5 y 1.50, una tupla y una lista) den la misma clave.
+# Los textos van tal cual: los motores comparan algunos con mayúsculas y espacios (p. ej. la zona climática), así
+# que "Medio" y "medio " pueden dar resultados distintos y no deben compartir entrada.
+def _normalizar_parametro(valor):
+    if isinstance(valor, pd.DataFrame):
+        return {"df": huella_dataframe(valor)}
+    if hasattr(valor, "huella"):
+        return {"huella": valor.huella()}
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        return round(float(valor), 6)
+    if valor is None:
+        return None
+    if isinstance(valor, dict):
+        return {str(k): _normalizar_parametro(v) for k, v in sorted(valor.items(), key=lambda item: str(item[0]))}
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [_normalizar_parametro(v) for v in valor]
+    # repr() de un objeto cualquiera lleva su dirección de memoria: la clave nunca acertaría o, peor, acertaría
+    # con otro objeto que reutilice la dirección. Los objetos de datos tienen que dar su huella().
+    raise TypeError(f"No sé construir la clave de caché para un parámetro de tipo {type(valor).__name__}; "
+                    "define huella() en su clase")
+
+
+# Huella del código de los paquetes app y agro (una vez por proceso): cualquier cambio en los motores o en
+# la carga de datos cambia todas las claves
+@lru_cache(maxsize=1)
+def huella_codigo():
+    h = hashlib.sha256()
+    for paquete in ("app", "agro"):
+        for carpeta, subcarpetas, archivos in os.walk(os.path.join(RAIZ, paquete)):
+            subcarpetas[:] = sorted(d for d in subcarpetas if d != "__pycache__")
+            for archivo in sorted(archivos):
+                if archivo.endswith(".py"):
+                    ruta = os.path.join(carpeta, archivo)
+                    h.update(os.path.relpath(ruta, RAIZ).encode())
+                    with open(ruta, "rb") as f:
+                        h.update(f.read())
+    return h.hexdigest()
+
+
+def version_cache():
+    return [VERSION_FORMATO, huella_codigo()]
+
+
+def clave_canonica(nombre, parametros):
+    normalizados = {k: _normalizar_parametro(v) for k, v in sorted(parametros.items())}
+    texto = json.dumps([version_cache(), nombre, normalizados], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+# Copio los DataFrames del resultado para que quien llama pueda modificarlos sin tocar la caché
+def _copiar_resultado(valor):
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy()
+    if isinstance(valor, tuple):
+        return tuple(_copiar_resultado(v) for v in valor)
+    # Objetos de resultado propios (p. ej. FronteraPareto) que saben copiarse
+    if hasattr(valor, "copiar"):
+        return valor.copiar()
+    return valor
+
+
+CACHE_RESULTADOS = CacheResultados(
+    tamano_max=int(os.environ.get("AGROSMART_CACHE_TAMANO", TAMANO_POR_DEFECTO)),
+    directorio=os.environ.get("AGROSMART_CACHE_DIR") or None,
+    tamano_disco_mb=float(os.environ.get("AGROSMART_CACHE_DISCO_MB", TAMANO_DISCO_MB_POR_DEFECTO)),
+)
+
+
+# Decorador que pone la caché delante de un motor. Los parámetros de `ignorar` no forman parte
+# de la clave (p. ej. `debug`); si `debug` está activo se salta la caché para ver los mensajes técnicos.
+def memoizar(cache=None, ignorar=("debug",)):
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+        nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            cache_activa = cache if cache is not None else CACHE_RESULTADOS
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            if argumentos.arguments.get("debug"):
+                return funcion(*args, **kwargs)
+
+            parametros = {k: v for k, v in argumentos.arguments.items() if k not in ignorar}
+            # Con solver=None el backend sale de AGROSMART_SOLVER: lo resuelvo para que forme parte de la clave
+            if "solver" in parametros:
+                from app.solver_module import nombre_backend
+
+                parametros["solver"] = nombre_backend(parametros["solver"])
+            clave = clave_canonica(nombre, parametros)
+            encontrado, valor = cache_activa.obtener(clave)
+            if not encontrado:
+                valor = funcion(*args, **kwargs)
+                cache_activa.guardar(clave, _copiar_resultado(valor))
+            return _copiar_resultado(valor)
+
+        envoltura.sin_cache = funcion
+        return envoltura
+    return decorador
+
+
+def estadisticas_cache():
+    return CACHE_RESULTADOS.estadisticas()
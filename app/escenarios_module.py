@@ -0,0 +1,137 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pulp import LpVariable, LpAffineExpression
+
+from agro.data import COSTE_GENERICO
+
+# -------------------------------
+# Escenarios de precio y rendimiento (Monte Carlo)
+# -------------------------------
+# Los beneficios de los motores son estimaciones puntuales (precio medio, rendimiento promedio). Aquí evalúo
+# un plan ya elegido en miles de escenarios muestreados de DistribucionesMercado y devuelvo bandas de riesgo
+# (P10/P50/P90, media y probabilidad de pérdida). La evaluación es vectorizada con numpy (escenarios x
+# productos); para tandas muy grandes reparto bloques de escenarios entre procesos. Cada bloque tiene su
+# propia semilla derivada de la semilla global, así que el resultado no depende del número de procesos.
+# Como alternativa, resolver_media_muestral() optimiza el beneficio medio sobre una muestra de escenarios.
+N_ESCENARIOS = 10_000
+ESCENARIOS_POR_BLOQUE = 2_500
+PERCENTILES = (10, 50, 90)
+N_ESCENARIOS_SAA = 200
+
+
+# Beneficio de cada escenario para un plan de kg por producto (a rendimiento promedio). La producción real es
+# kg * factor de rendimiento; lo vendido no supera la demanda (si se indica) y el coste se paga por kg producido.
+def beneficio_escenarios(kg, precios, factores_rendimiento, coste_kg, demanda_kg=None):
+    produccion = factores_rendimiento * kg[None, :]
+    vendido = produccion if demanda_kg is None else np.minimum(produccion, demanda_kg[None, :])
+    return np.nansum(vendido * precios, axis=1) - produccion @ coste_kg
+
+
+def _evaluar_bloque(distribuciones, productos, kg, coste_kg, demanda_kg, precio_referencia, n, semilla):
+    precios, factores = distribuciones.muestrear(productos, n, np.random.default_rng(semilla), precio_referencia)
+    return beneficio_escenarios(kg, precios, factores, coste_kg, demanda_kg)
+
+
+# Beneficios de n escenarios, en bloques de tamaño fijo con semillas hijas de `semilla` (reparto entre procesos opcional)
+def simular_beneficios(distribuciones, productos, kg, coste_kg, demanda_kg=None, precio_referencia=None,
+                       n_escenarios=N_ESCENARIOS, semilla=0, procesos=1):
+    tamanos = [min(ESCENARIOS_POR_BLOQUE, n_escenarios - i) for i in range(0, n_escenarios, ESCENARIOS_POR_BLOQUE)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    argumentos = [(distribuciones, list(productos), kg, coste_kg, demanda_kg, precio_referencia, n, s) for n, s in zip(tamanos, semillas)]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(tamanos) <= 1:
+        bloques = [_evaluar_bloque(*a) for a in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tamanos))) as pool:
+            bloques = list(pool.map(_evaluar_bloque, *zip(*argumentos)))
+    return np.concatenate(bloques) if bloques else np.array([])
+
+
+def resumir_beneficios(beneficios):
+    p10, p50, p90 = np.percentile(beneficios, PERCENTILES) if len(beneficios) else (0.0, 0.0, 0.0)
+    return {
+        "Escenarios": int(len(beneficios)),
+        "Beneficio_medio_€": round(float(np.mean(beneficios)), 2) if len(beneficios) else 0.0,
+        "P10_€": round(float(p10), 2),
+        "P50_€": round(float(p50), 2),
+        "P90_€": round(float(p90), 2),
+        "Prob_perdida": round(float(np.mean(beneficios < 0)), 4) if len(beneficios) else 0.0,
+    }
+
+
+def _coste_kg(productos, costes, provincia_equiv):
+    if costes is None:
+        return np.full(len(productos), COSTE_GENERICO)
+    return np.asarray(costes.coste_kg(productos, provincia_equiv), dtype=float)
+
+
+# Bandas de riesgo de un plan multicultivo (resultado del modelo: una fila por cultivo y mes de inicio)
+def evaluar_plan_multicultivo(df_resultados, distribuciones, demandas=None, costes=None, provincia_equiv=None,
+                              precio_referencia=None, n_escenarios=N_ESCENARIOS, semilla=0, procesos=1):
+    if df_resultados is None or df_resultados.empty:
+        return pd.DataFrame([resumir_beneficios(np.array([]))])
+    kg_por_cultivo = df_resultados.groupby("Cultivo", sort=False)["Cantidad_kg"].sum()
+    productos = kg_por_cultivo.index.tolist()
+    demanda_kg = None if demandas is None else np.array([demandas.get(p, np.inf) for p in productos], dtype=float)
+    beneficios = simular_beneficios(
+        distribuciones, productos, kg_por_cultivo.to_numpy(dtype=float), _coste_kg(productos, costes, provincia_equiv),
+        demanda_kg, precio_referencia, n_escenarios, semilla, procesos
+    )
+    return pd.DataFrame([resumir_beneficios(beneficios)])
+
+
+# Bandas de riesgo de cada propuesta de monocultivo (cada fila es un plan alternativo de un solo cultivo)
+def evaluar_propuestas_monocultivo(df_monocultivo, distribuciones, costes=None, provincia_equiv=None,
+                                   n_escenarios=N_ESCENARIOS, semilla=0, procesos=1):
+    filas = []
+    propuestas = zip(
+        df_monocultivo["Cultivo"], df_monocultivo["Producción total anual (kg)"], df_monocultivo["Precio estimado €/kg"]
+    )
+    for i, (cultivo, kg, precio) in enumerate(propuestas):
+        beneficios = simular_beneficios(
+            distribuciones, [cultivo], np.array([kg], dtype=float), _coste_kg([cultivo], costes, provincia_equiv), None,
+            {cultivo: float(precio)}, n_escenarios, semilla + i, procesos
+        )
+        filas.append({"Cultivo": cultivo, **resumir_beneficios(beneficios)})
+    return pd.DataFrame(filas)
+
+
+# Modelo de media muestral (SAA): sustituyo el objetivo del modelo multicultivo por el beneficio medio sobre
+# n escenarios. Por escenario s y cultivo p, vendido[s, p] <= demanda[p] y vendido[s, p] <= factor[s, p] * kg[p],
+# y el coste se paga por la producción. Las variables de plan (x, z) son las mismas en todos los escenarios.
+def anadir_objetivo_media_muestral(modelo_multi, distribuciones, coste_kg, demandas, n_escenarios=N_ESCENARIOS_SAA,
+                                   semilla=0, precio_referencia=None):
+    productos = modelo_multi.productos
+    precios, factores = distribuciones.muestrear(productos, n_escenarios, np.random.default_rng(semilla), precio_referencia)
+    precios = np.where(np.isnan(precios), 0.0, precios)
+    x_por_producto = {}
+    for p, m in modelo_multi.pares:
+        x_por_producto.setdefault(p, []).append(modelo_multi.x[p, m])
+
+    terminos_objetivo, media_muestral = [], {}
+    for j, p in enumerate(productos):
+        # Coste medio de la producción de p: coste * factor medio * kg planificados
+        coste_medio = coste_kg.get(p, COSTE_GENERICO) * float(factores[:, j].mean())
+        terminos_objetivo.extend((x, -coste_medio) for x in x_por_producto[p])
+        ventas = []
+        for s in range(n_escenarios):
+            vendido = LpVariable(f"vendido_{j}_{s}", lowBound=0, upBound=demandas.get(p, 0))
+            modelo_multi.modelo += LpAffineExpression(
+                [(vendido, 1)] + [(x, -float(factores[s, j])) for x in x_por_producto[p]]
+            ) <= 0, f"vendido_{j}_{s}"
+            ventas.append((vendido, float(precios[s, j]) / n_escenarios))
+        terminos_objetivo.extend(ventas)
+        media_muestral[p] = (ventas, coste_medio)
+    modelo_multi.modelo.setObjective(LpAffineExpression(terminos_objetivo))
+    # Guardo las ventas y el coste medio para que resultado() dé el beneficio medio de cada fila
+    modelo_multi.media_muestral = media_muestral
+    return modelo_multi
+
+
+def resolver_media_muestral(modelo_multi, distribuciones, coste_kg, demandas, n_escenarios=N_ESCENARIOS_SAA,
+                            semilla=0, solver=None, precio_referencia=None):
+    anadir_objetivo_media_muestral(modelo_multi, distribuciones, coste_kg, demandas, n_escenarios, semilla, precio_referencia)
+    estado, beneficio_medio = modelo_multi.resolver(solver)
+    return modelo_multi.resultado(), estado, beneficio_medio
@@ -0,0 +1,260 @@
+import os
+import time
+import threading
+
+# -------------------------------
+# Trazas por etapas y métricas del pipeline de recomendación
+# -------------------------------
+# Cuando una recomendación va lenta necesito saber en qué etapa se va el tiempo: carga de CSV, filtrado,
+# construcción del modelo PuLP, resolución, extracción de la solución o gráficos de Plotly. Cada etapa se
+# envuelve en un tramo con nombre (`with tramo("resolucion"):`) y el registro del proceso agrega por tramo
+# un histograma de duraciones. Cada resolución guarda además sus estadísticas (backend, estado, variables,
+# restricciones, tiempo y, si el backend lo da, gap MIP). El registro sale en formato de texto de Prometheus
+# (GET /metricas del servicio) y en el panel de desarrollo de la barra lateral de la app.
+# Las métricas se activan con AGROSMART_METRICAS=1. Desactivadas, tramo() devuelve siempre el mismo objeto
+# vacío y no se mide nada.
+PREFIJO = "agrosmart"
+LIMITES_HISTOGRAMA = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+_VALORES_ACTIVAS = ("1", "true", "si", "sí")
+
+_estado = {"activas": os.environ.get("AGROSMART_METRICAS", "").strip().lower() in _VALORES_ACTIVAS}
+_local = threading.local()
+
+
+def metricas_activas():
+    return _estado["activas"]
+
+
+def activar_metricas(activar=True):
+    _estado["activas"] = bool(activar)
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            # tramo -> [cuenta, suma, máximo, errores, cuenta por cubeta del histograma]
+            self.tramos = {}
+            self.resoluciones = {}
+            self.ultima_resolucion = None
+            # tramo raíz -> última traza de ese tramo, de la más antigua a la más reciente
+            self.trazas = {}
+            # proceso -> contadores de su caché de resultados (cada proceso del pool tiene la suya)
+            self.caches = {}
+
+    def observar(self, nombre, segundos, error=False):
+        with self._lock:
+            datos = self.tramos.get(nombre)
+            if datos is None:
+                datos = self.tramos[nombre] = [0, 0.0, 0.0, 0, [0] * len(LIMITES_HISTOGRAMA)]
+            datos[0] += 1
+            datos[1] += segundos
+            datos[2] = max(datos[2], segundos)
+            datos[3] += int(error)
+            for i, limite in enumerate(LIMITES_HISTOGRAMA):
+                if segundos <= limite:
+                    datos[4][i] += 1
+
+    def registrar_resolucion(self, estadisticas):
+        clave = (estadisticas["backend"], estadisticas["estado"])
+        with self._lock:
+            self.resoluciones[clave] = self.resoluciones.get(clave, 0) + 1
+            self.ultima_resolucion = estadisticas
+
+    def guardar_traza(self, raiz, traza):
+        with self._lock:
+            self.trazas.pop(raiz, None)
+            self.trazas[raiz] = traza
+
+    # Copia del registro y reinicio: así un proceso del pool entrega lo que ha medido desde la última petición
+    def extraer(self):
+        with self._lock:
+            instantanea = {
+                "tramos": {nombre: [*datos[:4], list(datos[4])] for nombre, datos in self.tramos.items()},
+                "resoluciones": [[*clave, cuenta] for clave, cuenta in self.resoluciones.items()],
+                "ultima_resolucion": self.ultima_resolucion,
+                "trazas": self.trazas,
+                "caches": self.caches,
+            }
+        self.reiniciar()
+        return instantanea
+
+    def combinar(self, instantanea):
+        with self._lock:
+            for nombre, (cuenta, suma, maximo, errores, cubetas) in instantanea["tramos"].items():
+                datos = self.tramos.get(nombre)
+                if datos is None:
+                    datos = self.tramos[nombre] = [0, 0.0, 0.0, 0, [0] * len(LIMITES_HISTOGRAMA)]
+                datos[0] += cuenta
+                datos[1] += suma
+                datos[2] = max(datos[2], maximo)
+                datos[3] += errores
+                datos[4] = [a + b for a, b in zip(datos[4], cubetas)]
+            for backend, estado, cuenta in instantanea["resoluciones"]:
+                self.resoluciones[backend, estado] = self.resoluciones.get((backend, estado), 0) + cuenta
+            if instantanea["ultima_resolucion"] is not None:
+                self.ultima_resolucion = instantanea["ultima_resolucion"]
+            for raiz, traza in instantanea["trazas"].items():
+                self.trazas.pop(raiz, None)
+                self.trazas[raiz] = traza
+            self.caches.update(instantanea["caches"])
+
+    def guardar_cache(self, proceso, estadisticas):
+        with self._lock:
+            self.caches[proceso] = estadisticas
+
+    # Una fila por tramo para el panel de desarrollo
+    def resumen(self):
+        with self._lock:
+            return [
+                {
+                    "Tramo": nombre,
+                    "Llamadas": cuenta,
+                    "Total_ms": round(suma * 1000, 2),
+                    "Media_ms": round(suma / cuenta * 1000, 2) if cuenta else 0.0,
+                    "Max_ms": round(maximo * 1000, 2),
+                    "Errores": errores,
+                }
+                for nombre, (cuenta, suma, maximo, errores, _) in sorted(self.tramos.items())
+            ]
+
+    def texto_prometheus(self):
+        with self._lock:
+            tramos = {nombre: (datos[:4], list(datos[4])) for nombre, datos in sorted(self.tramos.items())}
+            resoluciones = sorted(self.resoluciones.items())
+            ultima = self.ultima_resolucion
+            caches = list(self.caches.values())
+
+        lineas = [
+            f"# HELP {PREFIJO}_tramo_segundos Duración de cada etapa del pipeline de recomendación",
+            f"# TYPE {PREFIJO}_tramo_segundos histogram",
+        ]
+        for nombre, ((cuenta, suma, _, _), cubetas) in tramos.items():
+            for limite, acumulado in zip(LIMITES_HISTOGRAMA, cubetas):
+                lineas.append(f'{PREFIJO}_tramo_segundos_bucket{{tramo="{nombre}",le="{limite}"}} {acumulado}')
+            lineas.append(f'{PREFIJO}_tramo_segundos_bucket{{tramo="{nombre}",le="+Inf"}} {cuenta}')
+            lineas.append(f'{PREFIJO}_tramo_segundos_sum{{tramo="{nombre}"}} {suma:.6f}')
+            lineas.append(f'{PREFIJO}_tramo_segundos_count{{tramo="{nombre}"}} {cuenta}')
+        lineas += [
+            f"# HELP {PREFIJO}_tramo_errores_total Etapas terminadas con excepción",
+            f"# TYPE {PREFIJO}_tramo_errores_total counter",
+        ]
+        lineas += [f'{PREFIJO}_tramo_errores_total{{tramo="{nombre}"}} {errores}' for nombre, ((_, _, _, errores), _) in tramos.items()]
+        lineas += [
+            f"# HELP {PREFIJO}_resoluciones_total Resoluciones por backend y estado",
+            f"# TYPE {PREFIJO}_resoluciones_total counter",
+        ]
+        lineas += [
+            f'{PREFIJO}_resoluciones_total{{backend="{backend}",estado="{estado}"}} {cuenta}'
+            for (backend, estado), cuenta in resoluciones
+        ]
+        if ultima is not None:
+            for campo, ayuda in (
+                ("variables", "Variables del último modelo resuelto"),
+                ("restricciones", "Restricciones del último modelo resuelto"),
+                ("segundos", "Tiempo de pared de la última resolución"),
+                ("gap", "Gap MIP relativo de la última resolución"),
+            ):
+                if ultima.get(campo) is None:
+                    continue
+                lineas += [
+                    f"# HELP {PREFIJO}_solver_{campo} {ayuda}",
+                    f"# TYPE {PREFIJO}_solver_{campo} gauge",
+                    f'{PREFIJO}_solver_{campo}{{backend="{ultima["backend"]}"}} {ultima[campo]}',
+                ]
+        # Contadores de la caché de resultados, sumados entre procesos
+        for campo, tipo in (("aciertos", "counter"), ("aciertos_disco", "counter"), ("fallos", "counter"), ("entradas", "gauge")):
+            nombre = f"{PREFIJO}_cache_{campo}" + ("_total" if tipo == "counter" else "")
+            lineas += [f"# TYPE {nombre} {tipo}", f"{nombre} {sum(cache[campo] for cache in caches)}"]
+        return "\n".join(lineas) + "\n"
+
+
+REGISTRO = RegistroMetricas()
+
+
+class _TramoNulo:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+_TRAMO_NULO = _TramoNulo()
+
+
+# Tramo medido. Los tramos anidados del mismo hilo forman la traza de la petición: al cerrarse el tramo
+# raíz la guardo en el registro (la última de cada tramo raíz) con el nivel de anidamiento y el desfase de
+# cada tramo respecto al inicio.
+class Tramo:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        pila = getattr(_local, "pila", None)
+        if pila is None:
+            pila = _local.pila = []
+        if not pila:
+            _local.traza = []
+        pila.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza_excepcion):
+        segundos = time.perf_counter() - self.inicio
+        pila = _local.pila
+        pila.pop()
+        REGISTRO.observar(self.nombre, segundos, error=tipo is not None)
+        _local.traza.append((self.inicio, len(pila), self.nombre, segundos))
+        if not pila:
+            raiz = self.inicio
+            REGISTRO.guardar_traza(self.nombre, [
+                {"Tramo": "  " * nivel + nombre, "Desde_ms": round((inicio - raiz) * 1000, 2), "Duracion_ms": round(s * 1000, 2)}
+                for inicio, nivel, nombre, s in sorted(_local.traza)
+            ])
+        return False
+
+
+def tramo(nombre):
+    return Tramo(nombre) if _estado["activas"] else _TRAMO_NULO
+
+
+# Duración medida fuera de un tramo (p. ej. en código asíncrono, donde la pila por hilo no sirve)
+def observar(nombre, segundos, error=False):
+    if _estado["activas"]:
+        REGISTRO.observar(nombre, segundos, error)
+
+
+def registrar_resolucion(backend, estado, variables, restricciones, segundos, gap=None):
+    if _estado["activas"]:
+        REGISTRO.registrar_resolucion({
+            "backend": backend,
+            "estado": estado,
+            "variables": variables,
+            "restricciones": restricciones,
+            "segundos": round(segundos, 6),
+            "gap": gap,
+        })
+
+
+# La caché de resultados lleva sus contadores siempre; los copio al registro solo al publicar o al extraer
+def _guardar_cache_local():
+    from app.cache_module import estadisticas_cache
+
+    REGISTRO.guardar_cache(os.getpid(), estadisticas_cache())
+
+
+# Lo medido en este proceso desde la última extracción, para agregarlo en otro (ver RegistroMetricas.combinar)
+def extraer_metricas():
+    _guardar_cache_local()
+    return REGISTRO.extraer()
+
+
+def texto_prometheus():
+    _guardar_cache_local()
+    return REGISTRO.texto_prometheus()
@@ -1,53 +1,89 @@
 import pandas as pd
 import numpy as np
+from agro.data import como_cubo, COSTE_GENERICO, filtrar_aptitud
+from app.cache_module import memoizar
 
-def generar_propuestas_monocultivo(cultivos_df, demanda_df, terreno_df, superficie_ha):
-    # Calcular el rendimiento en kg/m²
-    cultivos_df["Rendimiento_kg_m2"] = cultivos_df["Rendimiento_promedio (kg/ha)"].fillna(0) / 10000
-
-    # Calcular beneficio por kg
-    coste_generico = 0.30  # €/kg estimado
-    demanda_df["beneficio_kg"] = demanda_df["Precio_kg_€"] - coste_generico
-
-    # Unir cultivos con la demanda
-    resumen = cultivos_df.merge(
-        demanda_df[["Producto", "Precio_kg_€", "beneficio_kg"]],
-        left_on="Nombre_cultivo", right_on="Producto", how="inner"
-    ).drop_duplicates(subset=["Nombre_cultivo"])
-
-    # Duración del cultivo y ciclos por año
-    resumen["Duración del ciclo (días)"] = resumen["Duración_cultivo_días"]
-    resumen["Ciclos por año"] = (365 / resumen["Duración_cultivo_días"]).apply(np.floor).astype(int)
-
-    # Cálculos de producción y beneficio
-    resumen["Producción (kg)"] = resumen["Rendimiento_kg_m2"] * superficie_ha * 10000  # por ciclo
-    resumen["Producción total anual (kg)"] = resumen["Producción (kg)"] * resumen["Ciclos por año"]
-    resumen["Beneficio estimado (€)"] = resumen["Producción (kg)"] * resumen["beneficio_kg"]
-    resumen["Beneficio total anual (€)"] = resumen["Producción total anual (kg)"] * resumen["beneficio_kg"]
-    resumen["Beneficio mensual promedio (€)"] = resumen["Beneficio total anual (€)"] / 12
-    resumen["Producción mensual promedio (kg)"] = resumen["Producción total anual (kg)"] / 12
-    resumen["Superficie (ha)"] = superficie_ha
-
-    # Selección de columnas
-    resumen_final = resumen[[
-        "Nombre_cultivo",
-        "Duración del ciclo (días)",
-        "Ciclos por año",
-        "Producción (kg)",
-        "Producción mensual promedio (kg)",
-        "Producción total anual (kg)",
-        "Precio_kg_€",
-        "Beneficio estimado (€)",
-        "Beneficio mensual promedio (€)",
-        "Beneficio total anual (€)",
-        "Superficie (ha)"
-    ]].rename(columns={
-        "Nombre_cultivo": "Cultivo",
-        "Precio_kg_€": "Precio estimado €/kg"
-    })
+TOP_K = 10
+
+COLUMNAS_SALIDA = [
+    "Cultivo",
+    "Duración del ciclo (días)",
+    "Ciclos por año",
+    "Producción (kg)",
+    "Producción mensual promedio (kg)",
+    "Producción total anual (kg)",
+    "Precio estimado €/kg",
+    "Coste estimado €/kg",
+    "Beneficio estimado (€)",
+    "Beneficio mensual promedio (€)",
+    "Beneficio total anual (€)",
+    "Superficie (ha)",
+]
+
+@memoizar()
+def generar_propuestas_monocultivo(cultivos_df, demanda_df, terreno_df, superficie_ha, provincia_equiv=None, costes=None,
+                                   aptitud=None, uso_aptitud="filtro"):
+    # No modifico los DataFrames de entrada: trabajo solo con arrays NumPy extraídos de ellos
+
+    # Precio por producto desde el cubo de demanda preagregado (acepto también las transacciones en bruto).
+    # Uso el precio de la primera compra de cada producto, el mismo criterio que el antiguo merge + drop_duplicates.
+    precios = como_cubo(demanda_df).por_producto()["precio_primera_compra"]
+
+    # Unir cultivos con la demanda (cruce interno, un único registro por cultivo)
+    nombres = cultivos_df["Nombre_cultivo"]
+    posicion_precio = precios.index.get_indexer(nombres.to_numpy())
+    validos = (posicion_precio >= 0) & ~nombres.duplicated().to_numpy()
+
+    # Aptitud de suelo, pH y clima (0-1 por fila del catálogo): "filtro" descarta los cultivos bajo UMBRAL_APTITUD y
+    # "ponderar" solo los de aptitud 0, escalando el rendimiento del resto
+    factor_aptitud = np.ones(len(nombres))
+    if aptitud is not None:
+        factor_aptitud, aptos = filtrar_aptitud(aptitud, len(nombres), uso_aptitud)
+        validos &= aptos
+    if not validos.any():
+        return pd.DataFrame(columns=COLUMNAS_SALIDA)
 
-    # Ordenar por beneficio total anual
-    resumen_final = resumen_final.sort_values("Beneficio total anual (€)", ascending=False).head(10)
+    nombres = nombres.to_numpy()[validos]
+    precio = precios.to_numpy()[posicion_precio[validos]]
+    rendimiento_kg_m2 = np.nan_to_num(cultivos_df["Rendimiento_promedio (kg/ha)"].to_numpy(dtype=float)[validos]) / 10000
+    if uso_aptitud == "ponderar":
+        rendimiento_kg_m2 = rendimiento_kg_m2 * factor_aptitud[validos]
+    duracion = cultivos_df["Duración_cultivo_días"].to_numpy()[validos]
+
+    # Coste por kg de la tabla de eficiencia productiva para la provincia (o el coste genérico si no se pasa tabla)
+    coste = np.full(len(nombres), COSTE_GENERICO) if costes is None else costes.coste_kg(nombres, provincia_equiv)
+
+    # Calcular beneficio por kg, ciclos por año y beneficio anual (lo único necesario para ordenar)
+    beneficio_kg = precio - coste
+    ciclos = np.floor(365 / duracion).astype(int)
+    produccion = rendimiento_kg_m2 * superficie_ha * 10000  # por ciclo
+    produccion_anual = produccion * ciclos
+    beneficio_anual = produccion_anual * beneficio_kg
+
+    # Selección de los 10 mejores con argpartition y orden final solo sobre esos k
+    if len(beneficio_anual) > TOP_K:
+        candidatos = np.argpartition(-beneficio_anual, TOP_K - 1)[:TOP_K]
+    else:
+        candidatos = np.arange(len(beneficio_anual))
+    orden = candidatos[np.argsort(-beneficio_anual[candidatos], kind="stable")]
+
+    # Solo calculo las columnas derivadas para los cultivos que se devuelven
+    beneficio_anual_top = beneficio_anual[orden]
+    produccion_anual_top = produccion_anual[orden]
+    resumen_final = pd.DataFrame({
+        "Cultivo": nombres[orden],
+        "Duración del ciclo (días)": duracion[orden],
+        "Ciclos por año": ciclos[orden],
+        "Producción (kg)": produccion[orden],
+        "Producción mensual promedio (kg)": produccion_anual_top / 12,
+        "Producción total anual (kg)": produccion_anual_top,
+        "Precio estimado €/kg": precio[orden],
+        "Coste estimado €/kg": coste[orden],
+        "Beneficio estimado (€)": produccion[orden] * beneficio_kg[orden],
+        "Beneficio mensual promedio (€)": beneficio_anual_top / 12,
+        "Beneficio total anual (€)": beneficio_anual_top,
+        "Superficie (ha)": superficie_ha,
+    })
 
     return resumen_final
 
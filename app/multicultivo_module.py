@@ -1,18 +1,128 @@
+import os
 import pandas as pd
 import numpy as np
 import streamlit as st
-from pulp import LpProblem, LpMaximize, LpVariable, lpSum, LpStatus, value, LpBinary, PULP_CBC_CMD
+from functools import lru_cache
+from scipy import sparse
+from pulp import LpProblem, LpMaximize, LpVariable, LpAffineExpression, lpSum, value, LpBinary
+from agro.data import como_cubo, COSTE_GENERICO, horas_maquinaria_kg, filtrar_aptitud
+from app.solver_module import resolver_modelo, resolver_relajacion
+from app.cache_module import memoizar
+from app.metricas_module import tramo
 
-def ejecutar_modelo_multicultivo(
-    cultivos_df, demanda_df, terreno_df,
-    superficie_ha, tipo_suelo, acceso_agua,
-    provincia_equiv, zona_climatica_usuario,
+MESES = list(range(1, 13))
+FRACCION_MINIMA_DIVERSIDAD = 0.02  # parte de la superficie a partir de la cual un cultivo cuenta como distinto
+RECURSO_AGUA = "agua_l"
+RECURSO_MAQUINARIA = "horas_maquinaria"
+GRANULARIDAD_KG = 1.0  # la vista previa planifica en kg enteros
+
+
+# Matriz circulante 12x12 de cobertura para una duración en meses:
+# cobertura[m - 1, m_inicio - 1] es True si un cultivo que empieza en m_inicio ocupa el terreno en el mes m.
+# Como solo depende de la duración, la calculo una vez por duración y la reutilizo para todo el catálogo.
+@lru_cache(maxsize=None)
+def matriz_cobertura(duracion_meses):
+    d = min(max(int(duracion_meses), 1), 12)
+    desfase = (np.arange(12)[:, None] - np.arange(12)[None, :]) % 12
+    cobertura = desfase < d
+    cobertura.flags.writeable = False
+    return cobertura
+
+
+# Pares (mes ocupado, mes de inicio) de la matriz anterior, ya en base 1, listos para generar términos
+@lru_cache(maxsize=None)
+def pares_cobertura(duracion_meses):
+    filas, columnas = np.nonzero(matriz_cobertura(duracion_meses))
+    return tuple(zip((filas + 1).tolist(), (columnas + 1).tolist()))
+
+
+# Genero las 12 restricciones de uso de terreno a partir de las matrices de cobertura.
+# Para cada mes recorro solo los pares (cultivo, mes de inicio) que realmente lo ocupan,
+# de modo que el coste de construcción es lineal en el tamaño del catálogo.
+# En la formulación dispersa no existen todas las x[p, m]: solo uso las que se han creado.
+def construir_restricciones_terreno(modelo, x, productos, duraciones, rendimientos, superficie_total_m2):
+    terminos_por_mes = [[] for _ in MESES]
+    for p in productos:
+        coef = 1 / rendimientos.get(p, 0.0001)
+        for m, m_inicio in pares_cobertura(duraciones.get(p, 1)):
+            variable = x.get((p, m_inicio))
+            if variable is not None:
+                terminos_por_mes[m - 1].append((variable, coef))
+
+    for m, terminos in zip(MESES, terminos_por_mes):
+        modelo += LpAffineExpression(terminos) <= superficie_total_m2, f"rotacion_terreno_mes_{m}"
+
+
+# -------------------------------
+# Restricciones mensuales de recursos en forma de matriz dispersa
+# -------------------------------
+# Cada recurso (litros de agua, horas de maquinaria...) se describe por su consumo por kg en tres momentos
+# del ciclo: el mes de siembra, cada mes ocupado (repartido a partes iguales) y el mes de cosecha.
+# Con eso monto de una vez una matriz dispersa 12 x pares (mes, (cultivo, mes de inicio)) con operaciones
+# de numpy, y cada fila se convierte directamente en una restricción. Añadir un recurso más solo
+# añade una matriz: no hay bucles anidados por cultivo y mes al construir el modelo.
+def matriz_recurso(pares, duraciones, siembra=None, ciclo=None, cosecha=None):
+    siembra, ciclo, cosecha = siembra or {}, ciclo or {}, cosecha or {}
+    productos = [p for p, _ in pares]
+    inicio = np.array([m for _, m in pares], dtype=int) - 1
+    d = np.array([min(max(int(duraciones.get(p, 1)), 1), 12) for p in productos], dtype=int)
+    columnas = np.arange(len(pares))
+
+    filas, cols, coefs = [], [], []
+    if siembra:
+        filas.append(inicio)
+        cols.append(columnas)
+        coefs.append(np.array([siembra.get(p, 0.0) for p in productos], dtype=float))
+    if ciclo:
+        # Un par que dura d meses aporta d entradas: meses inicio, inicio + 1, ..., inicio + d - 1
+        repetidas = np.repeat(columnas, d)
+        desfase = np.arange(len(repetidas)) - np.repeat(np.cumsum(d) - d, d)
+        filas.append((inicio[repetidas] + desfase) % 12)
+        cols.append(repetidas)
+        coefs.append((np.array([ciclo.get(p, 0.0) for p in productos], dtype=float) / d)[repetidas])
+    if cosecha:
+        filas.append((inicio + d - 1) % 12)
+        cols.append(columnas)
+        coefs.append(np.array([cosecha.get(p, 0.0) for p in productos], dtype=float))
+
+    if not filas:
+        return sparse.csr_matrix((len(MESES), len(pares)))
+    # Al pasar a CSR se suman las entradas repetidas (p. ej. siembra y cosecha en el mismo mes)
+    matriz = sparse.coo_matrix(
+        (np.concatenate(coefs), (np.concatenate(filas), np.concatenate(cols))), shape=(len(MESES), len(pares))
+    ).tocsr()
+    matriz.eliminate_zeros()
+    return matriz
+
+
+# Una restricción por mes con las filas de la matriz; los meses sin consumo no generan restricción (None)
+def construir_restricciones_recurso(modelo, variables, matriz, capacidad_mes, nombre):
+    capacidades = np.broadcast_to(np.asarray(capacidad_mes, dtype=float), (len(MESES),))
+    restricciones = []
+    for i, m in enumerate(MESES):
+        inicio, fin = matriz.indptr[i], matriz.indptr[i + 1]
+        if inicio == fin:
+            restricciones.append(None)
+            continue
+        terminos = zip((variables[j] for j in matriz.indices[inicio:fin]), matriz.data[inicio:fin].tolist())
+        modelo += LpAffineExpression(terminos) <= float(capacidades[i]), f"recurso_{nombre}_mes_{m}"
+        restricciones.append(modelo.constraints[f"recurso_{nombre}_mes_{m}"])
+    return restricciones
+
+
+# Filtro el catálogo por agua y clima y preparo los parámetros del modelo (sin modificar los DataFrames de entrada)
+def preparar_datos_multicultivo(
+    cultivos_df, demanda_df,
+    acceso_agua, zona_climatica_usuario,
     modo_flexible=False,
-    debug=False
+    debug=False,
+    restriccion_mensual=False,
+    provincia_equiv=None,
+    ventanas=None,
+    costes=None,
+    aptitud=None,
+    uso_aptitud="filtro"
 ):
-    if debug:
-        st.write("🔍 Iniciando modelo multicultivo...")
-
     agua_map = {"bajo": 1, "medio": 2, "alto": 3}
     nivel_agua_usuario = agua_map.get(acceso_agua.lower(), 2)
 
@@ -20,106 +130,949 @@ def ejecutar_modelo_multicultivo(
         st.write(f"🌦️ Zona climática asignada: {zona_climatica_usuario}")
         st.write(f"💧 Nivel de agua del usuario: {nivel_agua_usuario}")
 
-    cultivos_df["Necesidad_agua_numerica"] = cultivos_df["Necesidad_agua"].str.lower().map(agua_map).fillna(2)
-    cultivos_df["Tipo_suelo_requerido"] = cultivos_df["Tipo_suelo_requerido"].str.lower().str.strip()
-    cultivos_df["Zona_climatica"] = cultivos_df["Zona_climatica"].str.lower().str.strip()
+    # Trabajo con máscaras sobre las filas del catálogo, alineadas con la aptitud de la matriz de compatibilidad
+    necesidad_agua = cultivos_df["Necesidad_agua"].str.lower().map(agua_map).fillna(2)
+    mascara = (necesidad_agua <= nivel_agua_usuario).to_numpy(copy=True)
 
     if modo_flexible:
         if debug:
             st.info("🔁 Modo flexible activado: se permiten cultivos fuera de la zona climática del usuario.")
-        cultivos_filtrados = cultivos_df[
-            (cultivos_df["Necesidad_agua_numerica"] <= nivel_agua_usuario)
-        ]
     else:
-        cultivos_filtrados = cultivos_df[
-            (cultivos_df["Necesidad_agua_numerica"] <= nivel_agua_usuario) &
-            (cultivos_df["Zona_climatica"] == zona_climatica_usuario)
-        ]
+        zona_cultivo = cultivos_df["Zona_climatica"].str.lower().str.strip()
+        mascara &= (zona_cultivo == zona_climatica_usuario).to_numpy()
 
     if debug:
-        st.write(f"✅ Cultivos tras filtrado por agua y clima: {len(cultivos_filtrados)}")
+        st.write(f"✅ Cultivos tras filtrado por agua y clima: {int(mascara.sum())}")
+
+    # Aptitud de suelo, pH y clima (0-1 por fila del catálogo, de la matriz de compatibilidad): con "filtro"
+    # descarto los cultivos por debajo de UMBRAL_APTITUD y con "ponderar" solo los de aptitud 0, y el resto
+    # rinde en proporción
+    factor_aptitud = None
+    if aptitud is not None:
+        factor_aptitud, aptos = filtrar_aptitud(aptitud, len(cultivos_df), uso_aptitud)
+        mascara &= aptos
+        if debug:
+            st.write(f"🧪 Cultivos aptos para el suelo y el clima: {int(mascara.sum())}")
 
-    productos_disponibles = demanda_df["Producto"].unique().tolist()
-    cultivos_validos = cultivos_filtrados[
-        cultivos_filtrados["Nombre_cultivo"].isin(productos_disponibles)
-    ]
-    cultivos_validos = cultivos_validos[
-        cultivos_validos["Rendimiento_promedio (kg/ha)"].fillna(0) > 0
-    ]
+    # Leo la demanda del cubo preagregado: no hay groupby sobre las transacciones en cada petición
+    cubo = como_cubo(demanda_df)
+    productos_disponibles = cubo.productos
+    mascara &= cultivos_df["Nombre_cultivo"].isin(productos_disponibles).to_numpy()
+    mascara &= (cultivos_df["Rendimiento_promedio (kg/ha)"].fillna(0) > 0).to_numpy()
+    cultivos_validos = cultivos_df[mascara]
 
     if debug:
         st.write(f"✅ Cultivos válidos finales: {len(cultivos_validos)}")
 
     if cultivos_validos.empty:
-        if debug:
-            st.warning("⚠️ Ningún cultivo válido después del filtrado.")
-        return pd.DataFrame(), "Sin solución", 0.0
+        return None
 
     productos = cultivos_validos["Nombre_cultivo"].tolist()
-    demanda_resumen = demanda_df.groupby("Producto").agg(
-        demanda_total_kg=("Kg_comprados", "sum"),
-        precio_medio=("Precio_kg_€", "mean")
-    ).reset_index()
-
-    coste_generico = 0.30
-    demanda_resumen["beneficio_kg"] = demanda_resumen["precio_medio"] - coste_generico
-
-    beneficios = dict(zip(demanda_resumen["Producto"], demanda_resumen["beneficio_kg"]))
-    demandas = dict(zip(demanda_resumen["Producto"], demanda_resumen["demanda_total_kg"]))
-    rendimientos = dict(zip(cultivos_validos["Nombre_cultivo"], cultivos_validos["Rendimiento_promedio (kg/ha)"].fillna(0) / 10000))
+    demanda_resumen = cubo.por_producto()
 
     duracion_dias = cultivos_validos.set_index("Nombre_cultivo")["Duración_cultivo_días"]
     duracion_meses = np.ceil(duracion_dias / 30).astype(int)
-    duraciones = duracion_meses.loc[duracion_meses.index.intersection(productos)].to_dict()
 
-    superficie_total_m2 = superficie_ha * 10000
-    meses = list(range(1, 13))
+    # Beneficio por kg: precio medio menos el coste de la tabla de eficiencia para la provincia equivalente
+    # (sin tabla, el coste genérico de siempre). La tabla también da los litros de agua por kg.
+    if costes is None:
+        beneficios = (demanda_resumen["precio_medio"] - COSTE_GENERICO).to_dict()
+    else:
+        precio_medio = demanda_resumen["precio_medio"].reindex(productos).to_numpy()
+        beneficios = dict(zip(productos, (precio_medio - costes.coste_kg(productos, provincia_equiv)).tolist()))
 
-    modelo = LpProblem("Optimizacion_Multicultivo_Filtrado", LpMaximize)
-    x = {(p, m): LpVariable(f"x_{p}_{m}", lowBound=0) for p in productos for m in meses}
-    z = {p: LpVariable(f"z_{p}", cat=LpBinary) for p in productos}
+    rendimiento_m2 = cultivos_validos["Rendimiento_promedio (kg/ha)"].fillna(0) / 10000
+    if factor_aptitud is not None and uso_aptitud == "ponderar":
+        rendimiento_m2 = rendimiento_m2 * factor_aptitud[mascara]
 
-    modelo += lpSum(x[p, m] * beneficios.get(p, 0) for p in productos for m in meses)
+    datos = {
+        "productos": productos,
+        "beneficios": beneficios,
+        "demandas": demanda_resumen["demanda_total_kg"].to_dict(),
+        "rendimientos": dict(zip(cultivos_validos["Nombre_cultivo"], rendimiento_m2)),
+        "duraciones": duracion_meses.loc[duracion_meses.index.intersection(productos)].to_dict(),
+    }
+    if costes is not None:
+        datos["consumo_agua"] = dict(zip(productos, costes.agua_l_kg(productos, provincia_equiv).tolist()))
+        # Consumo de recursos por kg para las restricciones mensuales: el agua se reparte entre los meses
+        # del ciclo y las horas de maquinaria se concentran en el mes de siembra y en el de cosecha
+        horas_siembra, horas_cosecha = horas_maquinaria_kg(costes, productos, provincia_equiv)
+        datos["consumos_recursos"] = {
+            RECURSO_AGUA: {"ciclo": datos["consumo_agua"]},
+            RECURSO_MAQUINARIA: {
+                "siembra": dict(zip(productos, horas_siembra.tolist())),
+                "cosecha": dict(zip(productos, horas_cosecha.tolist())),
+            },
+        }
 
-    for p in productos:
-        modelo += lpSum(x[p, m] for m in meses) <= demandas.get(p, 0) * z[p]
-
-    # RESTRICCIÓN: uso de terreno teniendo en cuenta duración del cultivo
-    for m in meses:
-        uso_terreno_mes = []
-        for p in productos:
-            d = duraciones.get(p, 1)
-            rendimiento = rendimientos.get(p, 0.0001)
-
-            for m_inicio in meses:
-                meses_ocupados = [(m_inicio + offset - 1) % 12 + 1 for offset in range(d)]
-                if m in meses_ocupados:
-                    if (p, m_inicio) in x:
-                        uso = x[p, m_inicio] * (1 / rendimiento)
-                        uso_terreno_mes.append(uso)
-
-        modelo += lpSum(uso_terreno_mes) <= superficie_total_m2, f"rotacion_terreno_mes_{m}"
-
-    solver = PULP_CBC_CMD(msg=False)
-    modelo.solve(solver)
-    estado = LpStatus[modelo.status]
-    beneficio_total = round(value(modelo.objective), 2) if modelo.objective is not None else 0.0
+    # Ventanas de siembra de la provincia equivalente: solo se podrá sembrar en esos meses
+    if ventanas is not None and provincia_equiv:
+        datos["meses_inicio"] = ventanas.meses_por_cultivo(productos, provincia_equiv)
+        if debug:
+            st.write(f"🗓️ Cultivos con ventana de siembra en {provincia_equiv}: {len(datos['meses_inicio'])}")
+
+    if restriccion_mensual:
+        mensual = demanda_por_mes_cosecha(productos, datos["duraciones"], cubo.mensual())
+        if "meses_inicio" in datos:
+            mensual["meses_inicio"] = combinar_meses_inicio(datos["meses_inicio"], mensual["meses_inicio"])
+        datos.update(mensual)
+    return datos
+
+
+# Intersección de dos conjuntos de meses de inicio por cultivo; si un cultivo no aparece en uno de ellos,
+# ese no le pone límite (equivale a los 12 meses)
+def combinar_meses_inicio(meses_a, meses_b):
+    combinados = {}
+    for p in meses_a.keys() | meses_b.keys():
+        if p in meses_a and p in meses_b:
+            permitidos = set(meses_b[p])
+            combinados[p] = [m for m in meses_a[p] if m in permitidos]
+        else:
+            combinados[p] = meses_a.get(p, meses_b.get(p))
+    return combinados
+
+
+# Demanda mensual aplicada al mes de cosecha de cada siembra: lo que se siembra en m con una duración de d meses
+# se cosecha en el último mes ocupado, (m + d - 2) % 12 + 1, y no puede superar la demanda de ese mes.
+# Devuelvo solo los pares (cultivo, mes de inicio) con demanda > 0, que son los únicos factibles.
+def demanda_por_mes_cosecha(productos, duraciones, demanda_mensual):
+    kg_mensual = demanda_mensual.reindex(index=productos, columns=MESES, fill_value=0.0).to_numpy(dtype=float)
+    d = np.array([duraciones.get(p, 1) for p in productos])
+    meses = np.array(MESES)
+    mes_cosecha = (meses[None, :] + d[:, None] - 2) % 12 + 1
+    cotas = np.take_along_axis(kg_mensual, mes_cosecha - 1, axis=1)
+
+    meses_inicio, cotas_mensuales = {}, {}
+    for i, p in enumerate(productos):
+        factibles = np.nonzero(cotas[i] > 0)[0]
+        meses_inicio[p] = (factibles + 1).tolist()
+        cotas_mensuales.update({(p, int(j) + 1): float(cotas[i, j]) for j in factibles})
+    return {"meses_inicio": meses_inicio, "cotas_mensuales": cotas_mensuales}
+
+
+# -------------------------------
+# Presolve: poda de cultivos dominados
+# -------------------------------
+# Cada cultivo del catálogo añade hasta 12 variables x[p, m], una binaria y términos en las 12 restricciones de
+# terreno, aunque haya otros que lo hacen mejor en todo. Un cultivo q está dominado por r si r dura lo mismo o
+# menos, puede empezar en todos los meses de q, da al menos el mismo beneficio por m² y ciclo y, si hay
+# presupuesto de agua, no gasta más agua por m². Con eso no basta para quitar q, porque r tiene su propia demanda
+# y puede quedarse corto. Solo podo q cuando los cultivos que lo dominan, vendiendo toda su demanda, ocuparían
+# todos los m²·mes del año (12 · superficie).
+# Demostración: sea una solución óptima con x[q, m] > 0. Si algún r que domina a q tiene demanda libre, paso
+# terreno de la siembra de q en el mes m a r en el mismo mes. r ocupa un subconjunto de los meses de q (empieza
+# igual y dura menos), así que ninguna restricción de terreno empeora, el agua no sube y el beneficio no baja.
+# Si todos los r están en su demanda, ocupan al menos 12 · superficie m²·mes, es decir, todo el terreno todos
+# los meses, y x[q, m] tiene que ser 0. Repitiendo, hay una solución óptima sin q.
+# Los cultivos sin beneficio por kg o sin demanda tampoco producen nunca en un óptimo.
+# Barrido vectorizado: ordeno de mejor a peor (beneficio por m² descendente, duración, agua) y, para cada
+# cultivo, sumo la ocupación de los anteriores compatibles con una suma acumulada por clave (duración, meses de
+# inicio, agua). Contar todos los anteriores y no solo los que se quedan da lo mismo: si un anterior compatible
+# se podó, los que lo dominan también dominan a q y ya cubren el terreno.
+# No vale con cotas mensuales de demanda (restriccion_mensual), restricciones de recursos por mes, escenarios,
+# diversidad ni rotación, porque dependen de qué cultivos hay o de en qué mes se cosecha.
+CLASES_AGUA_PODA = 16  # clases de agua por m² para comparar sin recorrer pares de cultivos
+COLUMNAS_PODA = ["Cultivo", "Motivo", "Dominado_por", "Beneficio_m2_€", "Duracion_meses", "Cobertura_dominadores"]
+
+
+def _mascara_meses(meses):
+    return sum(1 << (m - 1) for m in meses)
+
+
+# Devuelvo los datos del modelo solo con los cultivos que no se pueden podar y una fila por cultivo podado
+def podar_dominados(datos, superficie_ha, presupuesto_agua_l=None):
+    productos = list(dict.fromkeys(datos["productos"]))
+    if datos.get("cotas_mensuales") or not productos:
+        return datos, pd.DataFrame(columns=COLUMNAS_PODA)
+    meses_inicio = datos.get("meses_inicio") or {}
+    rendimiento = np.array([datos["rendimientos"].get(p, 0.0001) for p in productos], dtype=float)
+    duracion = np.clip(np.array([datos["duraciones"].get(p, 1) for p in productos], dtype=np.int64), 1, 12)
+    beneficio_m2 = np.array([datos["beneficios"].get(p, 0.0) for p in productos], dtype=float) * rendimiento
+    demanda = np.array([datos["demandas"].get(p, 0) for p in productos], dtype=float)
+    mascara = np.array([_mascara_meses(meses_inicio.get(p, MESES)) for p in productos], dtype=np.int64)
+    sin_beneficio = (beneficio_m2 <= 0) | (demanda <= 0) | (mascara == 0) | np.isnan(beneficio_m2)
+    # m²·mes que ocuparía cada cultivo vendiendo toda su demanda (los que no producen no cuentan)
+    ocupacion = np.where(sin_beneficio, 0.0, demanda * duracion / rendimiento)
+
+    # Clases de agua por m²: redondeo hacia arriba la del dominador y hacia abajo la del dominado, así que
+    # clase(r) <= clase(q) garantiza agua(r) <= agua(q)
+    clase_dominador = clase_dominado = np.zeros(len(productos), dtype=np.int64)
+    agua_m2 = np.zeros(len(productos))
+    if presupuesto_agua_l is not None and datos.get("consumo_agua"):
+        agua_m2 = np.array([datos["consumo_agua"].get(p, 0.0) for p in productos], dtype=float) * rendimiento
+        limites = np.unique(np.quantile(agua_m2, np.linspace(0, 1, CLASES_AGUA_PODA + 1)))
+        clase_dominador = np.searchsorted(limites, agua_m2, side="left")
+        clase_dominado = np.searchsorted(limites, agua_m2, side="right") - 1
+
+    orden = np.lexsort((np.arange(len(productos)), agua_m2, duracion, -np.nan_to_num(beneficio_m2, nan=-np.inf)))
+    posicion = np.empty(len(productos), dtype=np.int64)
+    posicion[orden] = np.arange(len(productos))
+
+    # Claves de dominador y de dominado, y compatibilidad entre ellas (dura menos o igual, empieza en
+    # los mismos meses o más y gasta menos o igual agua)
+    claves_r, clave_r = np.unique(np.stack([duracion, mascara, clase_dominador], axis=1), axis=0, return_inverse=True)
+    claves_q, clave_q = np.unique(np.stack([duracion, mascara, clase_dominado], axis=1), axis=0, return_inverse=True)
+    clave_r, clave_q = clave_r.ravel(), clave_q.ravel()
+    compatible = (
+        (claves_r[None, :, 0] <= claves_q[:, None, 0])
+        & ((claves_q[:, None, 1] & ~claves_r[None, :, 1]) == 0)
+        & (claves_r[None, :, 2] <= claves_q[:, None, 2])
+    )
+
+    # Para cada cultivo, ocupación de los anteriores compatibles y primer anterior compatible (el que lo domina)
+    cobertura = np.zeros(len(productos))
+    primero = np.full(len(productos), len(productos), dtype=np.int64)
+    for k in range(len(claves_r)):
+        miembros = np.flatnonzero(clave_r == k)
+        miembros = miembros[np.argsort(posicion[miembros])]
+        acumulada = np.concatenate([[0.0], np.cumsum(ocupacion[miembros])])
+        afectados = np.flatnonzero(compatible[clave_q, k])
+        anteriores = np.searchsorted(posicion[miembros], posicion[afectados], side="left")
+        cobertura[afectados] += acumulada[anteriores]
+        con_anterior = afectados[anteriores > 0]
+        primero[con_anterior] = np.minimum(primero[con_anterior], posicion[miembros[0]])
+
+    umbral = 12 * superficie_ha * 10000
+    dominado = ~sin_beneficio & (cobertura >= umbral)
+    podar = sin_beneficio | dominado
+    # Si no queda ninguno, el modelo original ya daba beneficio 0: lo dejo tal cual
+    if podar.all() or not podar.any():
+        return datos, pd.DataFrame(columns=COLUMNAS_PODA)
+
+    indices = np.flatnonzero(podar)
+    registro = pd.DataFrame({
+        "Cultivo": [productos[i] for i in indices],
+        "Motivo": np.where(dominado[indices], "dominado", "sin beneficio"),
+        "Dominado_por": [productos[orden[primero[i]]] if dominado[i] else None for i in indices],
+        "Beneficio_m2_€": beneficio_m2[indices].round(4),
+        "Duracion_meses": duracion[indices],
+        "Cobertura_dominadores": np.where(dominado[indices], cobertura[indices] / umbral, np.nan).round(3),
+    }, columns=COLUMNAS_PODA)
+    return {**datos, "productos": [p for p, quitar in zip(productos, podar) if not quitar]}, registro
+
+
+# -------------------------------
+# Resultado compacto del modelo multicultivo
+# -------------------------------
+# Guardo la solución como vectores NumPy alineados, solo para los pares con producción: posición del cultivo
+# en `productos`, mes de inicio, kg, beneficio y superficie. completar() calcula de una vez todo lo que pinta
+# la interfaz (duración, fechas, plantas estimadas, superficie y resumen por cultivo), con una sola consulta
+# al catálogo por cultivo y sumas por índice en lugar de map y groupby por fila. El resultado que guarda la
+# caché ya lleva esas tablas, así que en cada rerun solo se copian.
+COLUMNAS_RESULTADO = ["Cultivo", "Mes", "Cantidad_kg", "Beneficio_€", "Superficie_ha"]
+
+
+class ResultadoMulticultivo:
+    def __init__(self, productos, indice, meses, cantidad_kg, beneficio, superficie_ha):
+        self.productos = np.asarray(productos, dtype=object)
+        self.indice = np.asarray(indice, dtype=np.intp)
+        self.meses = np.asarray(meses, dtype=np.int64)
+        self.cantidad_kg = np.asarray(cantidad_kg, dtype=float)
+        self.beneficio = np.asarray(beneficio, dtype=float)
+        self.superficie_ha = np.asarray(superficie_ha, dtype=float)
+        # Solo en la vista previa: beneficio de la relajación lineal, que acota el óptimo por arriba
+        self.cota_superior = None
+        # Cultivos que quitó el presolve antes de construir el modelo (ver podar_dominados)
+        self.podados = None
+        self._tablas = None
+
+    # Desde los valores de x de todos los pares del modelo (NaN si no hay solución): me quedo con los que producen
+    @classmethod
+    def desde_solucion(cls, productos, indice_par, mes_par, valores, beneficio_kg, rendimiento_m2):
+        produce = valores > 0
+        indice, cantidad = indice_par[produce], valores[produce]
+        return cls(
+            productos, indice, mes_par[produce], np.round(cantidad, 2),
+            np.round(cantidad * beneficio_kg[indice], 2), np.round(cantidad / rendimiento_m2[indice] / 10000, 4)
+        )
+
+    # Desde una tabla con COLUMNAS_RESULTADO (p. ej. un resultado guardado en la caché de disco por una versión anterior)
+    @classmethod
+    def desde_tabla(cls, df):
+        if df is None or df.empty:
+            return cls([], [], [], [], [], [])
+        indice, productos = pd.factorize(df["Cultivo"])
+        return cls(productos, indice, df["Mes"], df["Cantidad_kg"], df["Beneficio_€"], df["Superficie_ha"])
+
+    def __len__(self):
+        return len(self.cantidad_kg)
+
+    @property
+    def completo(self):
+        return self._tablas is not None
+
+    # Una fila por par (cultivo, mes de inicio) con producción
+    def tabla(self):
+        return pd.DataFrame({
+            "Cultivo": self.productos[self.indice],
+            "Mes": self.meses,
+            "Cantidad_kg": self.cantidad_kg,
+            "Beneficio_€": self.beneficio,
+            "Superficie_ha": self.superficie_ha,
+        }, columns=COLUMNAS_RESULTADO)
+
+    def completar(self, cultivos_df):
+        from agro.service.calendario import construir_calendario
+
+        # Duración y plantas por m² de cada cultivo del resultado (último registro de cada nombre del catálogo)
+        claves = pd.Series(self.productos).astype(str).str.strip().str.lower()
+        catalogo = cultivos_df.set_index(cultivos_df["Nombre_cultivo"].str.strip().str.lower())
+        catalogo = catalogo[~catalogo.index.duplicated(keep="last")]
+        duracion = catalogo["Duración_cultivo_días"].reindex(claves).to_numpy()
+        unidades = catalogo["Unidades_m2"].reindex(claves).to_numpy()
+
+        resultados = self.tabla()
+        resultados["Cultivo"] = claves.to_numpy()[self.indice]
+        resultados["Duracion_dias"] = duracion[self.indice]
+        fechas = construir_calendario(resultados["Cultivo"], resultados["Mes"], duracion_dias=resultados["Duracion_dias"])
+        resultados["Inicio"] = fechas["Inicio"]
+        resultados["Fin"] = fechas["Fin"]
+        resultados["Unidades_m2"] = unidades[self.indice]
+        plantas = np.nan_to_num(self.superficie_ha * 10000 * resultados["Unidades_m2"].to_numpy(dtype=float)).astype(int)
+        resultados["Plantas estimadas"] = plantas
+
+        calendario = fechas.dropna(subset=["Inicio", "Fin"])
+        calendario["Cultivo"] = calendario["Cultivo"].str.capitalize()
+        calendario = calendario.sort_values("Inicio")
+
+        # Totales por cultivo: sumas por índice de cultivo, en orden alfabético de nombre
+        presentes = np.unique(self.indice)
+        orden = presentes[np.argsort(claves.to_numpy()[presentes], kind="stable")]
+        suma = lambda valores: np.bincount(self.indice, weights=valores, minlength=len(self.productos))[orden]
+        nombres = claves.iloc[orden].reset_index(drop=True)
+        superficie = suma(self.superficie_ha)
+        self._tablas = {
+            "resultados": resultados,
+            "calendario": calendario,
+            "superficie_por_cultivo": pd.DataFrame({"Cultivo": nombres.str.capitalize(), "Superficie_ha": superficie}),
+            "resumen": pd.DataFrame({
+                "Cultivo": nombres,
+                "Total_kg": suma(self.cantidad_kg),
+                "Total_beneficio": suma(self.beneficio),
+                "Total_superficie_ha": superficie,
+                "Duracion_dias": duracion[orden].astype(float),
+                "Plantas_estimadas": suma(plantas).astype(np.int64),
+            }),
+        }
+        return self
+
+    # Tablas para la interfaz (copias: el resultado puede estar en la caché)
+    def tablas(self):
+        if self._tablas is None:
+            raise ValueError("El resultado no está completo: llama antes a completar() con el catálogo de cultivos")
+        return {clave: tabla.copy() for clave, tabla in self._tablas.items()}
+
+    # Las tablas solo salen copiadas por tablas(), así que la copia puede compartirlas
+    def copiar(self):
+        nuevo = ResultadoMulticultivo(
+            self.productos.copy(), self.indice.copy(), self.meses.copy(), self.cantidad_kg.copy(),
+            self.beneficio.copy(), self.superficie_ha.copy()
+        )
+        nuevo.cota_superior = self.cota_superior
+        nuevo.podados = None if self.podados is None else self.podados.copy()
+        nuevo._tablas = self._tablas
+        return nuevo
+
+
+# -------------------------------
+# Modelo multicultivo persistente
+# -------------------------------
+# Construyo el modelo una vez y lo mantengo vivo para los "¿y si...?" del agricultor:
+# cambiar la superficie solo toca el lado derecho de las 12 restricciones de terreno y cambiar
+# el conjunto de cultivos activos solo ajusta las cotas de z[p]. Cada nueva resolución parte de la
+# solución anterior (arranque en caliente) en lugar de reconstruir y resolver desde cero.
+class ModeloMulticultivo:
+    # meses_inicio: meses de siembra permitidos por cultivo (formulación dispersa; None = los 12 meses).
+    # cotas_mensuales: kg máximos por (cultivo, mes de inicio), p. ej. la demanda de su mes de cosecha.
+    # consumo_agua: litros por kg de cada cultivo; con presupuesto_agua_l limita el agua total del año.
+    # consumos_recursos: {recurso: {"siembra"/"ciclo"/"cosecha": {cultivo: consumo por kg}}} y
+    # capacidades_recursos: {recurso: capacidad por mes (un valor o 12)}; solo se restringen los recursos con capacidad.
+    def __init__(self, productos, beneficios, demandas, rendimientos, duraciones, superficie_ha,
+                 meses_inicio=None, cotas_mensuales=None, consumo_agua=None, presupuesto_agua_l=None,
+                 consumos_recursos=None, capacidades_recursos=None):
+        meses_inicio = meses_inicio or {}
+        cotas_mensuales = cotas_mensuales or {}
+        self.pares = [(p, m) for p in productos for m in meses_inicio.get(p, MESES)]
+        self.productos = list(dict.fromkeys(p for p, _ in self.pares))
+        # Índices de la solución: posición del cultivo de cada par en `productos` y su mes de inicio
+        posicion = {p: i for i, p in enumerate(self.productos)}
+        self.indice_par = np.array([posicion[p] for p, _ in self.pares], dtype=np.intp)
+        self.mes_par = np.array([m for _, m in self.pares], dtype=np.int64)
+        self.beneficios = beneficios
+        self.demandas = demandas
+        self.rendimientos = rendimientos
+        self.duraciones = duraciones
+        self.consumo_agua = consumo_agua
+        self.superficie_ha = superficie_ha
+        self.resuelto = False
+        self.rotacion = None
+        self.epsilon = None
+        # Con el objetivo de media muestral (anadir_objetivo_media_muestral): ventas por escenario de cada cultivo
+        # y coste medio por kg, para que el beneficio de cada fila sume el beneficio medio del objetivo
+        self.media_muestral = None
+
+        # Solo creo variables para los pares (cultivo, mes de inicio) factibles
+        modelo = LpProblem("Optimizacion_Multicultivo_Filtrado", LpMaximize)
+        x = {(p, m): LpVariable(f"x_{p}_{m}", lowBound=0, upBound=cotas_mensuales.get((p, m))) for p, m in self.pares}
+        z = {p: LpVariable(f"z_{p}", cat=LpBinary) for p in self.productos}
+
+        modelo += LpAffineExpression((x[p, m], beneficios.get(p, 0)) for p, m in self.pares)
+
+        meses_por_producto = {}
+        for p, m in self.pares:
+            meses_por_producto.setdefault(p, []).append(x[p, m])
+        for p in self.productos:
+            modelo += lpSum(meses_por_producto[p]) <= demandas.get(p, 0) * z[p]
+
+        # RESTRICCIÓN: uso de terreno teniendo en cuenta duración del cultivo
+        construir_restricciones_terreno(modelo, x, self.productos, duraciones, rendimientos, superficie_ha * 10000)
+
+        # RESTRICCIÓN opcional: presupuesto anual de agua en litros
+        self.restriccion_agua = None
+        if presupuesto_agua_l is not None:
+            if consumo_agua is None:
+                raise ValueError("El presupuesto de agua necesita el consumo de agua por kg (tabla de costes)")
+            modelo += LpAffineExpression(
+                (x[p, m], consumo_agua.get(p, 0.0)) for p, m in self.pares
+            ) <= presupuesto_agua_l, "presupuesto_agua"
+            self.restriccion_agua = modelo.constraints["presupuesto_agua"]
+
+        # RESTRICCIONES opcionales: capacidad mensual de cada recurso (matriz dispersa por recurso)
+        consumos_recursos = consumos_recursos or {}
+        self.matrices_recursos, self.restricciones_recursos = {}, {}
+        self.variables_x = [x[par] for par in self.pares]
+        if capacidades_recursos:
+            for nombre, capacidad_mes in capacidades_recursos.items():
+                if nombre not in consumos_recursos:
+                    raise ValueError(f"No hay consumos por kg para el recurso '{nombre}' (tabla de costes)")
+                matriz = matriz_recurso(self.pares, duraciones, **consumos_recursos[nombre])
+                self.matrices_recursos[nombre] = matriz
+                self.restricciones_recursos[nombre] = construir_restricciones_recurso(
+                    modelo, self.variables_x, matriz, capacidad_mes, nombre
+                )
+
+        self.modelo, self.x, self.z = modelo, x, z
+        self.restricciones_terreno = [modelo.constraints[f"rotacion_terreno_mes_{m}"] for m in MESES]
+
+    @classmethod
+    def desde_datos(cls, cultivos_df, demanda_df, superficie_ha, acceso_agua, zona_climatica_usuario, modo_flexible=False,
+                    restriccion_mensual=False, provincia_equiv=None, ventanas=None, costes=None, presupuesto_agua_l=None,
+                    capacidades_recursos=None, aptitud=None, uso_aptitud="filtro"):
+        with tramo("filtrado"):
+            datos = preparar_datos_multicultivo(
+                cultivos_df, demanda_df, acceso_agua, zona_climatica_usuario, modo_flexible,
+                restriccion_mensual=restriccion_mensual, provincia_equiv=provincia_equiv, ventanas=ventanas, costes=costes,
+                aptitud=aptitud, uso_aptitud=uso_aptitud
+            )
+        if datos is None:
+            return None
+        with tramo("construccion_modelo"):
+            return cls(superficie_ha=superficie_ha, presupuesto_agua_l=presupuesto_agua_l,
+                       capacidades_recursos=capacidades_recursos, **datos)
+
+    # Solo cambio el lado derecho de las restricciones de terreno; la estructura del modelo no se toca
+    def actualizar_superficie(self, superficie_ha):
+        self.superficie_ha = superficie_ha
+        for restriccion in self.restricciones_terreno:
+            restriccion.constant = -superficie_ha * 10000
+        if self.rotacion is not None:
+            self.actualizar_rotacion(self.rotacion["ocupacion_previa"])
+
+    # RESTRICCIÓN opcional de rotación: una familia no puede volver a ocupar la parte del terreno que ocupó
+    # la campaña anterior. ocupacion[f] (ha) acota por arriba el terreno de la familia f en cada mes y
+    # ocupacion[f] <= superficie - ocupacion_previa[f]. Con penalizacion_ha (€/ha) la repetición se permite
+    # pero resta del objetivo: ocupacion[f] - exceso[f] <= superficie - ocupacion_previa[f].
+    # Al cambiar de campaña solo se actualiza el lado derecho con actualizar_rotacion().
+    def anadir_rotacion(self, familias, ocupacion_previa=None, penalizacion_ha=None):
+        if self.rotacion is not None:
+            raise ValueError("El modelo ya tiene restricciones de rotación")
+        productos_por_familia = {}
+        for p in self.productos:
+            if familias.get(p):
+                productos_por_familia.setdefault(familias[p], []).append(p)
+
+        ocupacion, exceso, restricciones = {}, {}, {}
+        for i, (familia, productos) in enumerate(productos_por_familia.items()):
+            ocupacion[familia] = LpVariable(f"ocupacion_familia_{i}", lowBound=0)
+            terminos_por_mes = [[] for _ in MESES]
+            for p in productos:
+                coef = 1 / self.rendimientos.get(p, 0.0001)
+                for m, m_inicio in pares_cobertura(self.duraciones.get(p, 1)):
+                    variable = self.x.get((p, m_inicio))
+                    if variable is not None:
+                        terminos_por_mes[m - 1].append((variable, coef))
+            for m, terminos in zip(MESES, terminos_por_mes):
+                if terminos:
+                    terminos.append((ocupacion[familia], -10000))
+                    self.modelo += LpAffineExpression(terminos) <= 0, f"ocupacion_familia_{i}_mes_{m}"
+
+            nombre = f"rotacion_familia_{i}"
+            if penalizacion_ha is None:
+                self.modelo += ocupacion[familia] <= self.superficie_ha, nombre
+            else:
+                exceso[familia] = LpVariable(f"exceso_familia_{i}", lowBound=0)
+                self.modelo += ocupacion[familia] - exceso[familia] <= self.superficie_ha, nombre
+            restricciones[familia] = self.modelo.constraints[nombre]
+
+        if exceso:
+            self.modelo.setObjective(self.modelo.objective - penalizacion_ha * lpSum(exceso.values()))
+        self.rotacion = {
+            "familias": {p: familias[p] for ps in productos_por_familia.values() for p in ps},
+            "ocupacion": ocupacion, "exceso": exceso, "restricciones": restricciones,
+            "penalizacion_ha": penalizacion_ha, "ocupacion_previa": {},
+        }
+        self.actualizar_rotacion(ocupacion_previa or {})
+
+    # Nueva campaña: solo cambia la superficie que cada familia ocupó en la anterior
+    def actualizar_rotacion(self, ocupacion_previa):
+        if self.rotacion is None:
+            raise ValueError("El modelo se construyó sin restricciones de rotación")
+        self.rotacion["ocupacion_previa"] = dict(ocupacion_previa)
+        for familia, restriccion in self.rotacion["restricciones"].items():
+            libre = max(self.superficie_ha - ocupacion_previa.get(familia, 0.0), 0.0)
+            restriccion.constant = -libre
+
+    # Parte del objetivo que se pierde por repetir familia (0 si la rotación es estricta)
+    def penalizacion_rotacion(self):
+        if not self.rotacion or not self.rotacion["exceso"]:
+            return 0.0
+        return self.rotacion["penalizacion_ha"] * sum(v.varValue or 0.0 for v in self.rotacion["exceso"].values())
+
+    # Superficie máxima (ha) que ocupa cada familia a lo largo del año en la solución actual
+    def ocupacion_por_familia(self, familias=None):
+        familias = familias or (self.rotacion or {}).get("familias", {})
+        terreno = {}
+        for p, m_inicio in self.pares:
+            cantidad = self.x[p, m_inicio].varValue
+            if familias.get(p) is None or not cantidad or cantidad <= 0:
+                continue
+            uso = np.zeros(len(MESES))
+            uso[[m - 1 for m, inicio in pares_cobertura(self.duraciones.get(p, 1)) if inicio == m_inicio]] = (
+                cantidad / self.rendimientos.get(p, 0.0001) / 10000
+            )
+            terreno[familias[p]] = terreno.get(familias[p], 0.0) + uso
+        return {familia: round(float(uso.max()), 6) for familia, uso in terreno.items()}
+
+    # RESTRICCIONES epsilon para la frontera de Pareto: agua total <= agua_max y número de cultivos >= cultivos_min.
+    # Un cultivo cuenta para la diversidad (cuenta[p] = 1) si produce al menos lo que cabe en fraccion_minima de
+    # la superficie (o toda su demanda, si es menor). Los dos umbrales solo cambian lados derechos
+    # (actualizar_epsilon), así que el barrido reutiliza el mismo modelo con arranque en caliente.
+    def anadir_epsilon(self, fraccion_minima=FRACCION_MINIMA_DIVERSIDAD):
+        if self.epsilon is not None:
+            raise ValueError("El modelo ya tiene restricciones epsilon")
+        if self.consumo_agua is None:
+            raise ValueError("La frontera de Pareto necesita el consumo de agua por kg (tabla de costes)")
+        x_por_producto = {}
+        for p, m in self.pares:
+            x_por_producto.setdefault(p, []).append(self.x[p, m])
+
+        agua_max = sum(self.consumo_agua.get(p, 0.0) * self.demandas.get(p, 0) for p in self.productos)
+        self.modelo += LpAffineExpression(
+            (self.x[p, m], self.consumo_agua.get(p, 0.0)) for p, m in self.pares
+        ) <= agua_max, "epsilon_agua"
+
+        cuenta = {p: LpVariable(f"cuenta_{i}", cat=LpBinary) for i, p in enumerate(self.productos)}
+        minimos = {}
+        for i, p in enumerate(self.productos):
+            minimos[p] = min(self.demandas.get(p, 0), self.rendimientos.get(p, 0.0) * self.superficie_ha * 10000 * fraccion_minima)
+            self.modelo += LpAffineExpression(
+                [(x, 1) for x in x_por_producto[p]] + [(cuenta[p], -minimos[p])]
+            ) >= 0, f"diversidad_cultivo_{i}"
+        self.modelo += lpSum(cuenta.values()) >= 0, "epsilon_diversidad"
+
+        self.epsilon = {
+            "agua": self.modelo.constraints["epsilon_agua"],
+            "diversidad": self.modelo.constraints["epsilon_diversidad"],
+            "agua_max": agua_max,
+            "cuenta": cuenta,
+            "minimos": minimos,
+        }
+
+    # agua_max_l=None deja el agua sin límite y cultivos_min=0 no exige diversidad
+    def actualizar_epsilon(self, agua_max_l=None, cultivos_min=0):
+        if self.epsilon is None:
+            raise ValueError("El modelo se construyó sin restricciones epsilon")
+        self.epsilon["agua"].constant = -(self.epsilon["agua_max"] if agua_max_l is None else agua_max_l)
+        self.epsilon["diversidad"].constant = -cultivos_min
+
+    # Litros de agua y número de cultivos (que cuentan para la diversidad) de la solución actual
+    def agua_utilizada(self):
+        return float(sum(self.consumo_agua.get(p, 0.0) * (self.x[p, m].varValue or 0.0) for p, m in self.pares))
+
+    def cultivos_utilizados(self):
+        minimos = self.epsilon["minimos"] if self.epsilon is not None else {}
+        cantidades = {}
+        for p, m in self.pares:
+            cantidades[p] = cantidades.get(p, 0.0) + (self.x[p, m].varValue or 0.0)
+        return sum(1 for p, kg in cantidades.items() if kg > 0 and kg >= minimos.get(p, 0.0) * (1 - 1e-6))
+
+    # Cambio solo el lado derecho del presupuesto de agua (el modelo debe haberse creado con presupuesto)
+    def actualizar_presupuesto_agua(self, presupuesto_agua_l):
+        if self.restriccion_agua is None:
+            raise ValueError("El modelo se construyó sin presupuesto de agua")
+        self.restriccion_agua.constant = -presupuesto_agua_l
+
+    # Cambio solo el lado derecho de las restricciones mensuales de un recurso (un valor o 12)
+    def actualizar_capacidad_recurso(self, nombre, capacidad_mes):
+        if nombre not in self.restricciones_recursos:
+            raise ValueError(f"El modelo se construyó sin restricción para el recurso '{nombre}'")
+        capacidades = np.broadcast_to(np.asarray(capacidad_mes, dtype=float), (len(MESES),))
+        for restriccion, capacidad in zip(self.restricciones_recursos[nombre], capacidades):
+            if restriccion is not None:
+                restriccion.constant = -float(capacidad)
+
+    # Activo solo los cultivos indicados fijando a 0 la cota superior de z[p] del resto (None = todos)
+    def activar_cultivos(self, productos_activos=None):
+        activos = set(self.productos if productos_activos is None else productos_activos)
+        for p, z_p in self.z.items():
+            z_p.upBound = 1 if p in activos else 0
+
+    def resolver(self, solver=None):
+        estado = resolver_modelo(self.modelo, solver, warm_start=self.resuelto)
+        self.resuelto = True
+        # Sin solución (infactible o no resuelto) las variables quedan sin valor y el objetivo no se puede evaluar
+        objetivo = value(self.modelo.objective) if self.modelo.objective is not None else None
+        beneficio_total = round(objetivo, 2) if objetivo is not None else 0.0
+        return estado, beneficio_total
+
+    # Valores de x de la última resolución en el orden de `pares` (NaN si la variable no tiene valor)
+    def valores(self):
+        return np.array([v.varValue for v in self.variables_x], dtype=float)
+
+    def solucion(self, valores=None):
+        valores = self.valores() if valores is None else valores
+        return ResultadoMulticultivo.desde_solucion(
+            self.productos, self.indice_par, self.mes_par, valores, self.beneficio_kg(valores),
+            np.array([self.rendimientos.get(p, 0.0001) for p in self.productos], dtype=float),
+        )
+
+    # Beneficio por kg de cada cultivo. Con el objetivo de media muestral es el beneficio medio de sus ventas en
+    # los escenarios menos su coste medio, repartido entre los kg planificados (no el margen con precio medio)
+    def beneficio_kg(self, valores):
+        beneficio_kg = np.array([self.beneficios.get(p, 0.0) for p in self.productos], dtype=float)
+        if self.media_muestral is None:
+            return beneficio_kg
+        kg = np.bincount(self.indice_par, weights=np.nan_to_num(valores), minlength=len(self.productos))
+        for i, p in enumerate(self.productos):
+            ventas, coste_medio = self.media_muestral[p]
+            if kg[i] > 0:
+                ingreso = sum((v.varValue or 0.0) * precio for v, precio in ventas)
+                beneficio_kg[i] = ingreso / kg[i] - coste_medio
+        return beneficio_kg
+
+    def resultado(self):
+        return self.solucion().tabla()
+
+    # Vista previa en milisegundos: relajación lineal sin las binarias z[p] (HiGHS en proceso, sin el subproceso
+    # de CBC) y redondeo voraz. Pongo z[p] = 1 en los cultivos que usa la relajación, bajo los kg de cada par a
+    # múltiplos de granularidad_kg y reparto lo que queda libre en cada restricción entre los pares, de más a
+    # menos beneficio por m² y mes de ocupación. El plan es factible para el MILP y el beneficio de la relajación
+    # acota el óptimo por arriba (resultado.cota_superior). No toca los valores de las variables del modelo.
+    def vista_previa(self, granularidad_kg=GRANULARIDAD_KG):
+        estado, cota, valores, (variables, c, A, ub, cota_sup) = resolver_relajacion(self.modelo)
+        if len(variables) != len(self.pares) + len(self.productos):
+            raise ValueError("La vista previa solo admite el modelo base (sin rotación, epsilon ni escenarios)")
+        if valores is None:
+            return self.solucion(np.zeros(len(self.pares))), estado, 0.0
+
+        posicion = {v.name: i for i, v in enumerate(variables)}
+        columnas_x = np.array([posicion[v.name] for v in self.variables_x], dtype=np.intp)
+        columnas_z = np.array([posicion[self.z[p].name] for p in self.productos], dtype=np.intp)
+        solucion = valores.copy()
+        solucion[columnas_z] = np.minimum(np.where(valores[columnas_z] > 0, 1.0, 0.0), cota_sup[columnas_z])
+        solucion[columnas_x] = np.floor(valores[columnas_x] / granularidad_kg + 1e-6) * granularidad_kg
+
+        # Holgura de cada restricción (todas son <= en el modelo base) y margen de cada par: lo que puede crecer
+        # antes de agotar alguna. Cada x aparece al menos en su restricción de demanda, así que ninguna columna
+        # está vacía. Como los márgenes solo bajan durante el reparto, solo recorro los pares con margen.
+        holgura = np.maximum(ub - A @ solucion, 0.0)
+        A = A.tocsc()[:, columnas_x]
+        razones = np.where(A.data > 0, holgura[A.indices] / np.where(A.data > 0, A.data, 1.0), np.inf)
+        margen = np.minimum(np.minimum.reduceat(razones, A.indptr[:-1]), cota_sup[columnas_x] - solucion[columnas_x])
+        puntuacion = np.array([
+            self.beneficios.get(p, 0.0) * self.rendimientos.get(p, 0.0001) / self.duraciones.get(p, 1) for p, _ in self.pares
+        ])
+        candidatos = np.flatnonzero((margen >= granularidad_kg) & (puntuacion > 0))
+        for j in candidatos[np.argsort(-puntuacion[candidatos], kind="stable")]:
+            filas = A.indices[A.indptr[j]:A.indptr[j + 1]]
+            coeficientes = A.data[A.indptr[j]:A.indptr[j + 1]]
+            positivos = coeficientes > 0
+            margen_j = min(cota_sup[columnas_x[j]] - solucion[columnas_x[j]], (holgura[filas[positivos]] / coeficientes[positivos]).min())
+            paso = np.floor(margen_j / granularidad_kg) * granularidad_kg
+            if paso > 0:
+                solucion[columnas_x[j]] += paso
+                holgura[filas] -= coeficientes * paso
+
+        resultado = self.solucion(solucion[columnas_x])
+        resultado.cota_superior = round(cota, 2)
+        return resultado, estado, round(float(c @ solucion), 2)
+
+    # Consumo de cada recurso restringido por mes en la solución actual (producto matriz dispersa x solución)
+    def uso_recursos(self):
+        solucion = np.nan_to_num(self.valores())
+        uso = {nombre: matriz @ solucion for nombre, matriz in self.matrices_recursos.items()}
+        return pd.DataFrame(uso, index=pd.Index(MESES, name="Mes"))
+
+
+# Barrido de sensibilidad: curva de beneficio frente a superficie en una sola llamada.
+# Recorro las superficies de menor a mayor para que cada solución siga siendo factible en el paso siguiente
+# y sirva como punto de partida del arranque en caliente.
+def barrido_superficie(modelo_multi, superficies_ha, solver=None):
     filas = []
-    for p in productos:
-        for m in meses:
-            cantidad = x[p, m].varValue
-            if cantidad is not None and cantidad > 0:
-                rendimiento = rendimientos.get(p, 0.0001)
-                beneficio_unitario = beneficios.get(p, 0.0)
-                superficie_m2 = cantidad / rendimiento
-                filas.append({
-                    "Cultivo": p,
-                    "Mes": m,
-                    "Cantidad_kg": round(cantidad, 2),
-                    "Beneficio_€": round(cantidad * beneficio_unitario, 2),
-                    "Superficie_ha": round(superficie_m2 / 10000, 4)
-                })
-
-    resultado = pd.DataFrame(filas)
+    for superficie_ha in sorted(superficies_ha):
+        modelo_multi.actualizar_superficie(superficie_ha)
+        estado, beneficio = modelo_multi.resolver(solver)
+        filas.append({"Superficie_ha": superficie_ha, "Beneficio_€": beneficio, "Estado": estado})
+    return pd.DataFrame(filas)
+
+
+# Planificación plurianual con horizonte rodante: resuelvo una campaña, la fijo y paso la superficie que
+# ocupó cada familia como estado inicial de la siguiente. Cada campaña reutiliza el mismo modelo persistente
+# (solo cambia el lado derecho de las restricciones de rotación), así que el tiempo crece linealmente con los años.
+def planificar_rotacion(modelo_multi, familias, anios, ocupacion_inicial=None, penalizacion_ha=None, solver=None, anio_inicial=1):
+    modelo_multi.anadir_rotacion(familias, ocupacion_inicial, penalizacion_ha)
+    planes, resumen = [], []
+    for anio in range(anio_inicial, anio_inicial + anios):
+        estado, _ = modelo_multi.resolver(solver)
+        plan = modelo_multi.resultado()
+        if not plan.empty:
+            plan.insert(0, "Año", anio)
+            plan["Familia"] = plan["Cultivo"].map(familias)
+            planes.append(plan)
+        ocupacion = modelo_multi.ocupacion_por_familia()
+        beneficio = round(float(plan["Beneficio_€"].sum()), 2) if not plan.empty else 0.0
+        resumen.append({
+            "Año": anio,
+            "Estado": estado,
+            "Beneficio_€": beneficio,
+            "Penalizacion_€": round(modelo_multi.penalizacion_rotacion(), 2),
+            "Familias": ", ".join(sorted(ocupacion)),
+        })
+        modelo_multi.actualizar_rotacion(ocupacion)
+    plan = pd.concat(planes, ignore_index=True) if planes else pd.DataFrame()
+    return plan, pd.DataFrame(resumen)
+
+
+# -------------------------------
+# Frontera de Pareto: beneficio frente a agua y diversidad
+# -------------------------------
+# Método epsilon-restricción: maximizo el beneficio con agua total <= agua_max y cultivos >= cultivos_min.
+# Parto de la solución sin límites (referencia) y, para cada nivel de diversidad, recorro los niveles de agua
+# de más a menos. Cada nivel de diversidad es una cadena que reutiliza el mismo modelo con arranque en caliente
+# (solo cambian dos lados derechos). Con varios procesos, cada cadena se resuelve en paralelo en su propio modelo.
+PUNTOS_AGUA = 6
+NIVELES_DIVERSIDAD = 3
+FRACCION_AGUA_MINIMA = 0.2  # el barrido de agua llega hasta esta fracción del agua de la referencia
+COLUMNAS_FRONTERA = ["Agua_max_l", "Cultivos_min", "Estado", "Beneficio_€", "Agua_l", "Cultivos", "Plan", "Eficiente"]
+
+
+# Puntos no dominados: nadie tiene más beneficio, menos agua y más cultivos a la vez (mejor en alguno)
+def marcar_eficientes(beneficio, agua, cultivos):
+    beneficio, agua, cultivos = (np.asarray(v, dtype=float) for v in (beneficio, agua, cultivos))
+    igual_o_mejor = (
+        (beneficio[None, :] >= beneficio[:, None] - 1e-6) & (agua[None, :] <= agua[:, None] + 1e-6)
+        & (cultivos[None, :] >= cultivos[:, None])
+    )
+    mejor = (beneficio[None, :] > beneficio[:, None] + 1e-6) | (agua[None, :] < agua[:, None] - 1e-6) | (cultivos[None, :] > cultivos[:, None])
+    return ~(igual_o_mejor & mejor).any(axis=1)
+
+
+class FronteraPareto:
+    # puntos: una fila por punto resuelto (COLUMNAS_FRONTERA); referencia: el óptimo sin límites de agua ni diversidad
+    def __init__(self, puntos, referencia):
+        puntos = puntos.reindex(columns=COLUMNAS_FRONTERA[:-1])
+        puntos["Cultivos"] = puntos["Cultivos"].astype("Int64")
+        optimos = puntos["Estado"] == "Optimal"
+        puntos["Eficiente"] = False
+        if optimos.any():
+            puntos.loc[optimos, "Eficiente"] = marcar_eficientes(
+                puntos.loc[optimos, "Beneficio_€"], puntos.loc[optimos, "Agua_l"], puntos.loc[optimos, "Cultivos"]
+            )
+        self.puntos = puntos.reset_index(drop=True)
+        self.referencia = referencia
+
+    def __len__(self):
+        return len(self.puntos)
+
+    # Solo los puntos no dominados, de menos a más agua
+    def eficientes(self):
+        eficientes = self.puntos[self.puntos["Eficiente"]]
+        return eficientes.sort_values(["Agua_l", "Beneficio_€"]).drop_duplicates(["Beneficio_€", "Agua_l", "Cultivos"])
+
+    def copiar(self):
+        return FronteraPareto(self.puntos.copy(), dict(self.referencia))
+
+
+def _punto_frontera(modelo_multi, agua_max_l, cultivos_min, solver):
+    modelo_multi.actualizar_epsilon(agua_max_l, cultivos_min)
+    estado, beneficio = modelo_multi.resolver(solver)
+    punto = {"Agua_max_l": agua_max_l, "Cultivos_min": cultivos_min, "Estado": estado}
+    if estado == "Optimal":
+        resultado = modelo_multi.resultado()
+        punto.update({
+            "Beneficio_€": beneficio,
+            "Agua_l": round(modelo_multi.agua_utilizada(), 1),
+            "Cultivos": modelo_multi.cultivos_utilizados(),
+            "Plan": ", ".join(resultado["Cultivo"].unique()) if not resultado.empty else "",
+        })
+    return punto
+
+
+# Los niveles de agua van de más a menos: si uno es infactible, los siguientes también y no los resuelvo
+def _resolver_cadena(modelo_multi, cultivos_min, niveles_agua, solver):
+    puntos = []
+    for agua in niveles_agua:
+        if puntos and puntos[-1]["Estado"] == "Infeasible":
+            puntos.append({"Agua_max_l": agua, "Cultivos_min": cultivos_min, "Estado": "Infeasible"})
+        else:
+            puntos.append(_punto_frontera(modelo_multi, agua, cultivos_min, solver))
+    return puntos
+
+
+# Cadena en un proceso del pool: construye su propio modelo con los mismos datos
+def _resolver_cadena_proceso(datos, opciones_modelo, cultivos_min, niveles_agua, solver):
+    modelo_multi = ModeloMulticultivo(**opciones_modelo, **datos)
+    modelo_multi.anadir_epsilon()
+    return _resolver_cadena(modelo_multi, cultivos_min, niveles_agua, solver)
+
+
+# opciones_modelo: superficie_ha y, si se usan, presupuesto_agua_l y capacidades_recursos del ModeloMulticultivo
+def frontera_pareto(datos, opciones_modelo, puntos_agua=PUNTOS_AGUA, niveles_diversidad=NIVELES_DIVERSIDAD,
+                    procesos=1, solver=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    modelo_multi = ModeloMulticultivo(**opciones_modelo, **datos)
+    modelo_multi.anadir_epsilon()
+    referencia = _punto_frontera(modelo_multi, None, 0, solver)
+    if referencia["Estado"] != "Optimal":
+        return FronteraPareto(pd.DataFrame([referencia]), referencia)
+
+    # Niveles de agua desde el consumo de la referencia hasta FRACCION_AGUA_MINIMA de él; niveles de diversidad:
+    # sin exigencia y, si caben más cultivos que en la referencia, hasta todos los candidatos
+    niveles_agua = (referencia["Agua_l"] * np.linspace(1, FRACCION_AGUA_MINIMA, puntos_agua)).round(1).tolist()[1:]
+    n_cultivos = len(modelo_multi.productos)
+    niveles_cultivos = [0]
+    if referencia["Cultivos"] < n_cultivos and niveles_diversidad > 1:
+        niveles_cultivos += np.unique(np.linspace(referencia["Cultivos"] + 1, n_cultivos, niveles_diversidad - 1).round()).astype(int).tolist()
+
+    procesos = min(procesos or os.cpu_count() or 1, len(niveles_cultivos))
+    if procesos <= 1:
+        cadenas = [_resolver_cadena(modelo_multi, k, niveles_agua, solver) for k in niveles_cultivos]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            cadenas = list(pool.map(
+                _resolver_cadena_proceso, *zip(*[(datos, opciones_modelo, k, niveles_agua, solver) for k in niveles_cultivos])
+            ))
+    puntos = pd.DataFrame([referencia] + [punto for cadena in cadenas for punto in cadena])
+    return FronteraPareto(puntos, referencia)
+
+
+@memoizar(ignorar=("debug", "procesos"))
+def ejecutar_frontera_pareto(
+    cultivos_df, demanda_df, superficie_ha, acceso_agua, provincia_equiv, zona_climatica_usuario,
+    modo_flexible=False, restriccion_mensual=False, ventanas=None, costes=None, presupuesto_agua_l=None,
+    capacidades_recursos=None, aptitud=None, uso_aptitud="filtro", puntos_agua=PUNTOS_AGUA,
+    niveles_diversidad=NIVELES_DIVERSIDAD, procesos=1, solver=None
+):
+    with tramo("filtrado"):
+        datos = preparar_datos_multicultivo(
+            cultivos_df, demanda_df, acceso_agua, zona_climatica_usuario, modo_flexible,
+            restriccion_mensual=restriccion_mensual, provincia_equiv=provincia_equiv, ventanas=ventanas, costes=costes,
+            aptitud=aptitud, uso_aptitud=uso_aptitud
+        )
+    if datos is None:
+        return FronteraPareto(pd.DataFrame(), {"Estado": "Sin solución"})
+    opciones_modelo = {
+        "superficie_ha": superficie_ha, "presupuesto_agua_l": presupuesto_agua_l, "capacidades_recursos": capacidades_recursos,
+    }
+    return frontera_pareto(datos, opciones_modelo, puntos_agua, niveles_diversidad, procesos, solver)
+
+
+# Pongo la caché de resultados delante del modelo: mismas entradas y mismos datos, misma respuesta
+@memoizar()
+def ejecutar_modelo_multicultivo(
+    cultivos_df, demanda_df, terreno_df,
+    superficie_ha, tipo_suelo, acceso_agua,
+    provincia_equiv, zona_climatica_usuario,
+    modo_flexible=False,
+    debug=False,
+    solver=None,
+    restriccion_mensual=False,
+    ventanas=None,
+    costes=None,
+    presupuesto_agua_l=None,
+    capacidades_recursos=None,
+    escenarios_saa=0,
+    distribuciones=None,
+    semilla=0,
+    aptitud=None,
+    uso_aptitud="filtro",
+    vista_previa=False,
+    podar=True
+):
+    if debug:
+        st.write("🔍 Iniciando modelo multicultivo...")
+    if vista_previa and escenarios_saa:
+        raise ValueError("La vista previa no admite el modelo de media muestral en escenarios")
+
+    # Con `ventanas` (índice de calendario_cultivos_actualizado.csv) solo se siembra dentro de la ventana de provincia_equiv
+    # y con `costes` (tabla de eficiencia_productiva.csv) el beneficio usa el coste real de cada cultivo en esa provincia
+    # `capacidades_recursos` ({"agua_l": litros/mes, "horas_maquinaria": horas/mes}) añade las restricciones mensuales
+    # `aptitud` (0-1 por fila de cultivos_df para tipo_suelo, pH y clima, ver MatrizCompatibilidad) filtra o pondera los cultivos
+    # Con `vista_previa` devuelvo el plan aproximado de ModeloMulticultivo.vista_previa() (con su cota superior)
+    # Con `podar` quito antes de construir el modelo los cultivos que no pueden estar en el óptimo (podar_dominados)
+    with tramo("filtrado"):
+        datos = preparar_datos_multicultivo(
+            cultivos_df, demanda_df, acceso_agua, zona_climatica_usuario, modo_flexible, debug,
+            restriccion_mensual=restriccion_mensual, provincia_equiv=provincia_equiv, ventanas=ventanas, costes=costes,
+            aptitud=aptitud, uso_aptitud=uso_aptitud
+        )
+    if datos is None:
+        if debug:
+            st.warning("⚠️ Ningún cultivo válido después del filtrado.")
+        return ResultadoMulticultivo.desde_tabla(None).completar(cultivos_df), "Sin solución", 0.0
+
+    # La poda solo es exacta con terreno, demanda y presupuesto de agua (sin recursos mensuales ni escenarios)
+    podados = None
+    if podar and not escenarios_saa and not capacidades_recursos:
+        with tramo("poda"):
+            datos, podados = podar_dominados(datos, superficie_ha, presupuesto_agua_l)
+        if debug:
+            st.write(f"✂️ Cultivos podados antes de construir el modelo: {len(podados)}")
+            if not podados.empty:
+                st.dataframe(podados)
+
+    with tramo("construccion_modelo"):
+        modelo_multi = ModeloMulticultivo(
+            superficie_ha=superficie_ha, presupuesto_agua_l=presupuesto_agua_l, capacidades_recursos=capacidades_recursos, **datos
+        )
+
+        # Con `escenarios_saa` > 0 (y `distribuciones` de precio y rendimiento) maximizo el beneficio medio sobre esa
+        # muestra de escenarios en lugar del beneficio con precio medio y rendimiento promedio
+        if escenarios_saa:
+            from app.escenarios_module import anadir_objetivo_media_muestral
+
+            if distribuciones is None:
+                raise ValueError("El modelo de media muestral necesita las distribuciones de precio y rendimiento")
+            productos = modelo_multi.productos
+            coste = costes.coste_kg(productos, provincia_equiv) if costes is not None else [COSTE_GENERICO] * len(productos)
+            anadir_objetivo_media_muestral(
+                modelo_multi, distribuciones, dict(zip(productos, coste)), datos["demandas"], escenarios_saa, semilla
+            )
+
+    if vista_previa:
+        with tramo("vista_previa"):
+            resultado, estado, beneficio_total = modelo_multi.vista_previa()
+        with tramo("extraccion"):
+            resultado.completar(cultivos_df)
+        resultado.podados = podados
+        return resultado, estado, beneficio_total
+
+    # Resuelvo con el backend configurado (CBC por defecto, HiGHS en proceso como alternativa)
+    estado, beneficio_total = modelo_multi.resolver(solver)
+    # Extraigo la solución como vectores y dejo calculadas las tablas de la interfaz antes de que pase a la caché
+    with tramo("extraccion"):
+        resultado = modelo_multi.solucion().completar(cultivos_df)
+    resultado.podados = podados
 
     return resultado, estado, beneficio_total
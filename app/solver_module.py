@@ -0,0 +1,196 @@
+import os
+import time
+import numpy as np
+from pulp import PULP_CBC_CMD, LpStatus, LpMaximize, LpConstraintLE, LpConstraintGE, LpInteger, LpBinary
+
+from app.metricas_module import metricas_activas, tramo, registrar_resolucion
+
+# -------------------------------
+# Backends de resolución para los modelos PuLP
+# -------------------------------
+# Separo aquí la resolución del modelo para poder elegir el motor sin tocar la formulación.
+# - "cbc": el comportamiento original, CBC como subproceso a través de PuLP (escribe el modelo en disco).
+# - "highs": HiGHS en el mismo proceso mediante scipy.optimize.milp, construyendo las matrices directamente.
+# El backend por defecto se puede fijar con la variable de entorno AGROSMART_SOLVER.
+BACKEND_POR_DEFECTO = "cbc"
+TOLERANCIA = 1e-7
+
+# Códigos de estado de PuLP que asigno tras resolver con un backend propio
+_ESTADO_OPTIMO = 1
+_ESTADO_NO_RESUELTO = 0
+_ESTADO_INFACTIBLE = -1
+_ESTADO_NO_ACOTADO = -2
+
+
+# Con warm_start, CBC recibe como solución inicial los valores de la resolución anterior
+def resolver_cbc(modelo, warm_start=False):
+    modelo.solve(PULP_CBC_CMD(msg=False, warmStart=warm_start))
+    return LpStatus[modelo.status]
+
+
+# Parte estructural de la forma matricial (variables, objetivo y matriz A). La guardo en el propio modelo
+# para que un modelo persistente que solo cambia lados derechos o cotas no vuelva a convertirse entero.
+# La reutilizo mientras el objetivo y las restricciones sean los mismos objetos: setObjective() o sustituir
+# o añadir una restricción la invalidan sola. Quien cambie coeficientes en el sitio (restriccion.addInPlace(...))
+# tiene que llamar a invalidar_estructura().
+def _estructura_matricial(modelo):
+    from scipy.sparse import csr_array
+
+    restricciones = list(modelo.constraints.values())
+    cacheada = getattr(modelo, "_estructura_matricial", None)
+    if cacheada is not None and _misma_estructura(cacheada[0], modelo, restricciones):
+        return cacheada[1]
+
+    variables = modelo.variables()
+    indice = {v.name: i for i, v in enumerate(variables)}
+    n = len(variables)
+
+    c = np.zeros(n)
+    for v, coef in modelo.objective.items():
+        c[indice[v.name]] = coef
+
+    filas, columnas, datos = [], [], []
+    for i, restriccion in enumerate(restricciones):
+        for v, coef in restriccion.items():
+            filas.append(i)
+            columnas.append(indice[v.name])
+            datos.append(coef)
+
+    A = csr_array((datos, (filas, columnas)), shape=(len(restricciones), n))
+    integralidad = np.array([1 if v.cat in (LpInteger, LpBinary) else 0 for v in variables])
+    estructura = (variables, c, A, integralidad)
+    modelo._estructura_matricial = ((modelo.objective, restricciones, n), estructura)
+    return estructura
+
+
+# Comparo por identidad: la igualdad de expresiones de PuLP construye restricciones en lugar de comparar
+def _misma_estructura(firma, modelo, restricciones):
+    objetivo, restricciones_cacheadas, n_variables = firma
+    return (
+        objetivo is modelo.objective
+        and n_variables == modelo.numVariables()
+        and len(restricciones_cacheadas) == len(restricciones)
+        and all(a is b for a, b in zip(restricciones_cacheadas, restricciones))
+    )
+
+
+def invalidar_estructura(modelo):
+    modelo._estructura_matricial = None
+
+
+# Paso el modelo PuLP a forma matricial: c·x sujeto a lb <= A·x <= ub, con cotas e integralidad por variable
+def modelo_a_matrices(modelo):
+    variables, c, A, integralidad = _estructura_matricial(modelo)
+
+    lb, ub = [], []
+    for restriccion in modelo.constraints.values():
+        rhs = -restriccion.constant
+        lb.append(-np.inf if restriccion.sense == LpConstraintLE else rhs)
+        ub.append(np.inf if restriccion.sense == LpConstraintGE else rhs)
+
+    cota_inf = np.array([-np.inf if v.lowBound is None else v.lowBound for v in variables], dtype=float)
+    cota_sup = np.array([np.inf if v.upBound is None else v.upBound for v in variables], dtype=float)
+
+    return variables, c, A, np.array(lb, dtype=float), np.array(ub, dtype=float), cota_inf, cota_sup, integralidad
+
+
+# scipy.optimize.milp no admite solución inicial, así que aquí el arranque en caliente se limita
+# a reutilizar la forma matricial ya construida (ver _estructura_matricial)
+def resolver_highs(modelo, warm_start=False):
+    from scipy.optimize import milp, LinearConstraint, Bounds
+
+    variables, c, A, lb, ub, cota_inf, cota_sup, integralidad = modelo_a_matrices(modelo)
+
+    # scipy minimiza, así que invierto el signo del objetivo si el modelo maximiza
+    signo = -1 if modelo.sense == LpMaximize else 1
+    restricciones = [LinearConstraint(A, lb, ub)] if A.shape[0] else []
+    resultado = milp(
+        signo * c,
+        constraints=restricciones,
+        integrality=integralidad,
+        bounds=Bounds(cota_inf, cota_sup),
+    )
+
+    if resultado.x is not None:
+        # Limpio el ruido numérico de HiGHS (valores del orden de 1e-10) para que no aparezcan filas vacías
+        valores = np.where(np.abs(resultado.x) < TOLERANCIA, 0.0, resultado.x)
+        for v, valor in zip(variables, valores):
+            v.varValue = float(valor)
+    else:
+        # Sin solución no dejo en las variables los valores de la resolución anterior (modelos persistentes)
+        for v in variables:
+            v.varValue = None
+    # Gap MIP para las métricas (scipy solo lo da si hay variables enteras)
+    modelo._gap_mip = resultado.get("mip_gap")
+    modelo.status = _codigo_estado(resultado.status)
+    return LpStatus[modelo.status]
+
+
+# Traduzco el estado de scipy al código de PuLP para que el resto del flujo no cambie
+def _codigo_estado(estado_scipy):
+    if estado_scipy == 0:
+        return _ESTADO_OPTIMO
+    if estado_scipy == 2:
+        return _ESTADO_INFACTIBLE
+    if estado_scipy == 3:
+        return _ESTADO_NO_ACOTADO
+    return _ESTADO_NO_RESUELTO
+
+
+# Relajación lineal del modelo (todas las variables continuas) con HiGHS en el mismo proceso. No toca los
+# valores de las variables del modelo: devuelve el estado, el objetivo, los valores en el orden de la forma
+# matricial y la propia forma matricial, para que quien la pide redondee sobre ellos.
+def resolver_relajacion(modelo):
+    from scipy.optimize import milp, LinearConstraint, Bounds
+
+    variables, c, A, lb, ub, cota_inf, cota_sup, _ = modelo_a_matrices(modelo)
+    signo = -1 if modelo.sense == LpMaximize else 1
+    restricciones = [LinearConstraint(A, lb, ub)] if A.shape[0] else []
+    resultado = milp(signo * c, constraints=restricciones, bounds=Bounds(cota_inf, cota_sup))
+
+    valores, objetivo = None, None
+    if resultado.x is not None:
+        valores = np.where(np.abs(resultado.x) < TOLERANCIA, 0.0, resultado.x)
+        objetivo = float(c @ valores)
+    return LpStatus[_codigo_estado(resultado.status)], objetivo, valores, (variables, c, A, ub, cota_sup)
+
+
+BACKENDS = {
+    "cbc": resolver_cbc,
+    "highs": resolver_highs,
+}
+
+
+# Permito añadir otros motores (p. ej. Gurobi o HiGHS nativo) sin modificar este módulo
+def registrar_backend(nombre, funcion):
+    BACKENDS[nombre.lower()] = funcion
+
+
+def nombre_backend(nombre=None):
+    return (nombre or os.environ.get("AGROSMART_SOLVER", BACKEND_POR_DEFECTO)).lower()
+
+
+def obtener_backend(nombre=None):
+    nombre = nombre_backend(nombre)
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend de solver desconocido: {nombre}. Disponibles: {sorted(BACKENDS)}")
+    return BACKENDS[nombre]
+
+
+# Resuelvo el modelo con el backend elegido y devuelvo el estado en el formato de LpStatus.
+# Los backends reciben el modelo y el indicador de arranque en caliente. Con las métricas activas mido la
+# resolución y registro el tamaño del modelo, el estado y el gap MIP si el backend lo deja en `_gap_mip`.
+def resolver_modelo(modelo, backend=None, warm_start=False):
+    funcion = obtener_backend(backend)
+    if not metricas_activas():
+        return funcion(modelo, warm_start=warm_start)
+
+    modelo._gap_mip = None
+    with tramo("resolucion"):
+        inicio = time.perf_counter()
+        estado = funcion(modelo, warm_start=warm_start)
+        segundos = time.perf_counter() - inicio
+    registrar_resolucion(
+        nombre_backend(backend), estado, modelo.numVariables(), len(modelo.constraints), segundos, modelo._gap_mip
+    )
+    return estado
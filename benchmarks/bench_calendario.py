@@ -0,0 +1,108 @@
+import sys
+import time
+import unicodedata
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from agro.data import cargar_cultivos, normalizar_texto
+from agro.service.calendario import construir_calendario
+
+# -------------------------------
+# Benchmark del calendario de siembra y cosecha
+# -------------------------------
+# Comparo la construcción fila a fila original (apply con estimar_inicio / convertir_fecha / quitar_tildes)
+# con el módulo vectorizado agro.service.calendario sobre un volumen de filas como el de una exportación en lote.
+# Uso: python -m benchmarks.bench_calendario [n_filas]
+N_FILAS = 100_000
+REPETICIONES = 3
+
+
+# Implementaciones originales, conservadas solo como referencia para medir la mejora
+def calendario_multicultivo_original(df):
+    def estimar_inicio(mes):
+        try:
+            return datetime(2025, int(mes), 1)
+        except:
+            return pd.NaT
+
+    df["Inicio"] = df["Mes"].apply(estimar_inicio)
+    df["Fin"] = df.apply(
+        lambda row: row["Inicio"] + timedelta(days=int(row["Duracion_dias"])) if pd.notnull(row["Inicio"]) else pd.NaT,
+        axis=1
+    )
+    return df[["Cultivo", "Inicio", "Fin"]]
+
+
+def calendario_monocultivo_original(df):
+    def quitar_tildes(texto):
+        if isinstance(texto, str):
+            return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+        return texto
+
+    def convertir_fecha(fecha_texto, año_base=2025):
+        try:
+            if isinstance(fecha_texto, str):
+                fecha_texto = fecha_texto.strip().replace("/", "-")
+                dia, mes = map(int, fecha_texto.split("-"))
+                return datetime(año_base, mes, dia)
+        except:
+            return pd.NaT
+        return pd.NaT
+
+    df["Cultivo"] = df["Nombre_cultivo"].str.strip().str.lower().apply(quitar_tildes)
+    df["Inicio"] = df["Fecha_siembra"].astype(str).str.strip().apply(convertir_fecha)
+    df["Fin"] = df["Fecha_cosecha"].astype(str).str.strip().apply(convertir_fecha)
+    return df[["Cultivo", "Inicio", "Fin"]]
+
+
+def calendario_multicultivo_vectorizado(df):
+    return construir_calendario(df["Cultivo"], df["Mes"], duracion_dias=df["Duracion_dias"])
+
+
+def calendario_monocultivo_vectorizado(df):
+    return construir_calendario(normalizar_texto(df["Nombre_cultivo"]), df["Fecha_siembra"], fin=df["Fecha_cosecha"])
+
+
+def _medir(funcion, df):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        resultado = funcion(copia)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main(n=N_FILAS):
+    rng = np.random.default_rng(0)
+    cultivos_df = cargar_cultivos()
+    filas = cultivos_df.iloc[rng.integers(0, len(cultivos_df), n)].reset_index(drop=True)
+    resultados = pd.DataFrame({
+        "Cultivo": filas["Nombre_cultivo"].str.lower(),
+        "Mes": rng.integers(1, 13, n),
+        "Duracion_dias": filas["Duración_cultivo_días"],
+    })
+
+    print(f"Filas: {n:,}")
+    for nombre, original, vectorizado, df in [
+        ("Multicultivo", calendario_multicultivo_original, calendario_multicultivo_vectorizado, resultados),
+        ("Monocultivo", calendario_monocultivo_original, calendario_monocultivo_vectorizado, filas),
+    ]:
+        t_original, r_original = _medir(original, df)
+        t_nuevo, r_nuevo = _medir(vectorizado, df)
+        # El original no contempla ciclos que cruzan el fin de año: comparo solo los que no lo cruzan
+        comparables = (r_original["Fin"] >= r_original["Inicio"]).to_numpy()
+        iguales = (
+            r_original["Cultivo"].tolist() == r_nuevo["Cultivo"].tolist()
+            and (r_original["Inicio"] == r_nuevo["Inicio"]).all()
+            and (r_original["Fin"][comparables] == r_nuevo["Fin"][comparables]).all()
+        )
+        print(f"{nombre}:")
+        print(f"    Original:     {t_original * 1000:8.2f} ms")
+        print(f"    Vectorizado:  {t_nuevo * 1000:8.2f} ms  (x{t_original / t_nuevo:.1f})")
+        print(f"    Mismo resultado: {'sí' if iguales else 'NO'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_FILAS)
@@ -0,0 +1,38 @@
+import time
+import timeit
+
+from agro.data import cargar_cultivos, cargar_terreno, cargar_clima, MatrizCompatibilidad, UMBRAL_APTITUD, normalizar_nombre
+
+# -------------------------------
+# Benchmark de la matriz de compatibilidad
+# -------------------------------
+# Comparo el coste por petición de sacar los cultivos aptos para un perfil de suelo y clima con la matriz
+# precalculada (una consulta) frente a filtrar el catálogo con operaciones de texto en cada petición.
+# Uso: python -m benchmarks.bench_compatibilidad
+PERFIL = ("franco-arcilloso", 6.2, ("Barcelona",))
+REPETICIONES = 2_000
+
+
+# Filtro "a la antigua": normalizo las columnas de texto del catálogo y comparo en cada petición
+def _filtro_texto(cultivos_df, tipo_suelo, ph_suelo):
+    requerido = cultivos_df["Tipo_suelo_requerido"].str.strip().str.lower()
+    ph_ok = (cultivos_df["pH_optimo_min"] <= ph_suelo) & (cultivos_df["pH_optimo_max"] >= ph_suelo)
+    return cultivos_df.loc[(requerido == normalizar_nombre(tipo_suelo)) & ph_ok, "Nombre_cultivo"].tolist()
+
+
+def main():
+    cultivos_df, terreno_df, clima_df = cargar_cultivos(), cargar_terreno(), cargar_clima()
+    inicio = time.perf_counter()
+    matriz = MatrizCompatibilidad(cultivos_df, terreno_df, clima_df)
+    construccion = time.perf_counter() - inicio
+    print(f"Matriz {matriz.forma} ({matriz.puntuacion.nbytes / 1024:.0f} KiB) construida en {construccion * 1000:.1f} ms")
+
+    consulta = timeit.timeit(lambda: matriz.aptitud(*PERFIL), number=REPETICIONES) / REPETICIONES
+    texto = timeit.timeit(lambda: _filtro_texto(cultivos_df, *PERFIL[:2]), number=REPETICIONES) / REPETICIONES
+    aptos = int((matriz.aptitud(*PERFIL) >= UMBRAL_APTITUD).sum())
+    print(f"Consulta a la matriz: {consulta * 1e6:8.1f} µs por petición ({aptos} cultivos aptos)")
+    print(f"Filtro con texto:     {texto * 1e6:8.1f} µs por petición (solo textura exacta y pH)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+from agro.data import CuboDemanda, TablaCostes
+from agro.service.pipeline import preparar_resultado_multicultivo, preparar_resultado_monocultivo
+from app.multicultivo_module import preparar_datos_multicultivo, ModeloMulticultivo
+from app.monocultivo_module import generar_propuestas_monocultivo
+from benchmarks.sinteticos import ESCALAS, generar_datos
+
+# -------------------------------
+# Benchmark de los dos motores a escala
+# -------------------------------
+# Genero catálogo, demanda, terreno y costes sintéticos (benchmarks/sinteticos.py) a 10x, 100x y 1000x
+# los CSV reales y mido por separado cada fase de los motores:
+#   - multicultivo: construccion (datos + modelo PuLP), resolucion, vista_previa (relajación + redondeo),
+#     extraccion (solucion()) y preparacion_ui;
+#   - monocultivo: cubo (demanda preagregada), propuestas (sin caché) y preparacion_ui.
+# Con --json guardo los tiempos junto con el commit y la máquina; con --comparar enfrento dos informes
+# (p. ej. de dos commits) fase a fase. Cada fase se repite y me quedo con el mínimo; a 1000x solo una vez.
+# A 1000x hay umbrales para las fases que dependen de código nuestro y no del solver: si alguna los
+# supera, el script lo dice y termina con código 1, para que una regresión no pase sin que se note.
+# Uso: python -m benchmarks.bench_escala [--escalas 10 100] [--motor multicultivo] [--solver highs] [--json informe.json]
+#      python -m benchmarks.bench_escala --comparar antes.json despues.json
+MOTORES = ("multicultivo", "monocultivo")
+REPETICIONES = {10: 5, 100: 3}
+SUPERFICIE_HA = 1.5
+PROVINCIA = "Murcia"
+# Segundos máximos por fase a 1000x (hoy ~12 s de construcción y ~0,2 s de propuestas; antes de vectorizar
+# las consultas por nombre la construcción pasaba de 140 s)
+UMBRALES_1000X = {
+    ("multicultivo", "construccion"): 60.0,
+    ("multicultivo", "extraccion"): 5.0,
+    ("multicultivo", "preparacion_ui"): 5.0,
+    ("monocultivo", "cubo"): 10.0,
+    ("monocultivo", "propuestas"): 10.0,
+    ("monocultivo", "preparacion_ui"): 5.0,
+}
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _repeticiones(escala):
+    return REPETICIONES.get(escala, 1)
+
+
+def _medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def _fila(escala, motor, fase, segundos, filas):
+    return {"escala": escala, "motor": motor, "fase": fase, "segundos": round(segundos, 6), "filas": int(filas)}
+
+
+def medir_multicultivo(datos, escala, solver=None):
+    repeticiones = _repeticiones(escala)
+    cubo, costes = CuboDemanda.desde_transacciones(datos["demanda"]), TablaCostes(datos["eficiencia"])
+
+    def construir():
+        datos_modelo = preparar_datos_multicultivo(
+            datos["cultivos"], cubo, "alto", "mediterraneo", True, provincia_equiv=PROVINCIA, costes=costes
+        )
+        return ModeloMulticultivo(superficie_ha=SUPERFICIE_HA, **datos_modelo)
+
+    t_construccion, modelo_multi = _medir(construir, repeticiones)
+    # Cada resolución parte de un modelo recién construido: el arranque en caliente falsearía la medida
+    tiempos_resolucion = []
+    for i in range(repeticiones):
+        if i:
+            modelo_multi = construir()
+        inicio = time.perf_counter()
+        modelo_multi.resolver(solver)
+        tiempos_resolucion.append(time.perf_counter() - inicio)
+    # La vista previa (relajación lineal + redondeo) también parte de un modelo recién construido: la forma
+    # matricial que guarda en el modelo abarataría la resolución con HiGHS
+    tiempos_previa = []
+    for _ in range(repeticiones):
+        modelo_previa = construir()
+        inicio = time.perf_counter()
+        modelo_previa.vista_previa()
+        tiempos_previa.append(time.perf_counter() - inicio)
+    t_extraccion, resultado = _medir(modelo_multi.solucion, repeticiones)
+    # La preparación para la interfaz parte de un resultado sin completar en cada repetición
+    t_ui, salida = _medir(lambda: preparar_resultado_multicultivo(resultado.copiar(), datos["cultivos"]), repeticiones)
+    return [
+        _fila(escala, "multicultivo", "construccion", t_construccion, len(modelo_multi.pares)),
+        _fila(escala, "multicultivo", "resolucion", min(tiempos_resolucion), len(modelo_multi.pares)),
+        _fila(escala, "multicultivo", "vista_previa", min(tiempos_previa), len(modelo_multi.pares)),
+        _fila(escala, "multicultivo", "extraccion", t_extraccion, len(resultado)),
+        _fila(escala, "multicultivo", "preparacion_ui", t_ui, len(salida["resumen"])),
+    ]
+
+
+def medir_monocultivo(datos, escala):
+    repeticiones = _repeticiones(escala)
+    costes = TablaCostes(datos["eficiencia"])
+    t_cubo, cubo = _medir(lambda: CuboDemanda.desde_transacciones(datos["demanda"]), repeticiones)
+    t_propuestas, propuestas = _medir(
+        lambda: generar_propuestas_monocultivo.sin_cache(
+            datos["cultivos"], cubo, datos["terreno"], SUPERFICIE_HA, provincia_equiv=PROVINCIA, costes=costes
+        ),
+        repeticiones,
+    )
+    t_ui, salida = _medir(lambda: preparar_resultado_monocultivo(propuestas, datos["cultivos"]), repeticiones)
+    return [
+        _fila(escala, "monocultivo", "cubo", t_cubo, len(datos["demanda"])),
+        _fila(escala, "monocultivo", "propuestas", t_propuestas, len(propuestas)),
+        _fila(escala, "monocultivo", "preparacion_ui", t_ui, len(salida["calendario"])),
+    ]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(escalas=ESCALAS, motores=MOTORES, solver=None):
+    resultados = []
+    for escala in escalas:
+        datos = generar_datos(escala)
+        if "multicultivo" in motores:
+            resultados.extend(medir_multicultivo(datos, escala, solver))
+        if "monocultivo" in motores:
+            resultados.extend(medir_monocultivo(datos, escala))
+    return {
+        "commit": _commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "solver": solver,
+        "resultados": resultados,
+    }
+
+
+# Fases que superan su umbral (solo hay umbrales a 1000x)
+def fuera_de_umbral(resultados):
+    return [
+        {**r, "umbral": UMBRALES_1000X[(r["motor"], r["fase"])]}
+        for r in resultados
+        if r["escala"] == 1000 and r["segundos"] > UMBRALES_1000X.get((r["motor"], r["fase"]), float("inf"))
+    ]
+
+
+# Tiempos de dos informes fase a fase (relación > 1: el segundo es más lento)
+def comparar(base, nuevo):
+    clave = lambda r: (r["escala"], r["motor"], r["fase"])
+    tiempos_base = {clave(r): r["segundos"] for r in base["resultados"]}
+    filas = []
+    for r in nuevo["resultados"]:
+        anterior = tiempos_base.get(clave(r))
+        if anterior is not None:
+            filas.append({**r, "segundos_base": anterior, "relacion": r["segundos"] / anterior if anterior else None})
+    return filas
+
+
+def _imprimir(resultados):
+    print(f"{'Escala':>7}  {'Motor':<13}{'Fase':<16}{'Tiempo':>12}{'Filas':>10}")
+    for r in resultados:
+        print(f"{r['escala']:>6}x  {r['motor']:<13}{r['fase']:<16}{r['segundos'] * 1000:>9.1f} ms{r['filas']:>10,}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de AgroSmart con datos sintéticos a escala")
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS), help="Multiplicadores de los CSV reales")
+    parser.add_argument("--motor", choices=MOTORES, action="append", help="Motor a medir (por defecto, los dos)")
+    parser.add_argument("--solver", help="Solver del modelo multicultivo (por defecto, el configurado)")
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Comparar dos informes JSON")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        informes = []
+        for ruta in args.comparar:
+            with open(ruta, encoding="utf-8") as f:
+                informes.append(json.load(f))
+        base, nuevo = informes
+        print(f"Base: {base['commit']} ({base['fecha']})   Nuevo: {nuevo['commit']} ({nuevo['fecha']})")
+        print(f"{'Escala':>7}  {'Motor':<13}{'Fase':<16}{'Base':>12}{'Nuevo':>12}{'Relación':>10}")
+        for r in comparar(base, nuevo):
+            relacion = f"{r['relacion']:>9.2f}x" if r["relacion"] is not None else f"{'-':>10}"
+            print(
+                f"{r['escala']:>6}x  {r['motor']:<13}{r['fase']:<16}"
+                f"{r['segundos_base'] * 1000:>9.1f} ms{r['segundos'] * 1000:>9.1f} ms{relacion}"
+            )
+        return 0
+
+    informe = medir(args.escalas, args.motor or MOTORES, args.solver)
+    print(f"Commit {informe['commit']}, Python {informe['python']}, {informe['plataforma']}")
+    _imprimir(informe["resultados"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+    excedidas = fuera_de_umbral(informe["resultados"])
+    for r in excedidas:
+        print(f"Umbral superado: {r['escala']}x {r['motor']} {r['fase']} {r['segundos']:.1f} s > {r['umbral']:.1f} s")
+    return 1 if excedidas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+
+from agro.data import obtener_distribuciones_mercado, obtener_tabla_costes, cargar_cultivos, obtener_cubo_demanda
+from app.multicultivo_module import ModeloMulticultivo, preparar_datos_multicultivo, ejecutar_modelo_multicultivo
+from app.escenarios_module import evaluar_plan_multicultivo, resolver_media_muestral
+
+# -------------------------------
+# Benchmark del motor de escenarios (Monte Carlo)
+# -------------------------------
+# Evalúo el plan multicultivo de referencia en 10.000 y 100.000 escenarios de precio y rendimiento, en un
+# proceso y repartido entre todos los núcleos, y compruebo que las bandas no dependen del número de procesos.
+# Después resuelvo el modelo de media muestral con 50, 100 y 200 escenarios.
+# Uso: python -m benchmarks.bench_escenarios [solver]
+SUPERFICIE_HA = 1.0
+PROVINCIA = "Murcia"
+REPETICIONES = 3
+
+
+def _medir(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main(solver=None):
+    cultivos_df, cubo, costes = cargar_cultivos(copiar=False), obtener_cubo_demanda(), obtener_tabla_costes()
+    distribuciones = obtener_distribuciones_mercado()
+    demandas = cubo.por_producto()["demanda_total_kg"].to_dict()
+    resultado, _, beneficio = ejecutar_modelo_multicultivo(
+        cultivos_df, cubo, None, SUPERFICIE_HA, None, "alto", PROVINCIA, "mediterraneo", modo_flexible=True, costes=costes
+    )
+    df_resultados = resultado.tabla()
+    print(f"Plan de referencia: {df_resultados['Cultivo'].nunique()} cultivos, beneficio puntual € {beneficio:,.2f}")
+
+    print(f"\n{'Escenarios':>11}{'Procesos':>10}{'Tiempo':>12}{'P10 €':>12}{'P50 €':>12}{'P90 €':>12}")
+    for n in (10_000, 100_000):
+        for procesos in sorted({1, os.cpu_count() or 1}):
+            t, riesgo = _medir(lambda: evaluar_plan_multicultivo(
+                df_resultados, distribuciones, demandas, costes, PROVINCIA, n_escenarios=n, procesos=procesos
+            ))
+            fila = riesgo.iloc[0]
+            print(f"{n:>11,}{procesos:>10}{t * 1000:>9.1f} ms{fila['P10_€']:>12,.2f}{fila['P50_€']:>12,.2f}{fila['P90_€']:>12,.2f}")
+
+    print(f"\n{'SAA':>11}{'Tiempo':>12}{'Estado':>12}{'Beneficio medio €':>20}")
+    datos = preparar_datos_multicultivo(
+        cultivos_df, cubo, "alto", "mediterraneo", modo_flexible=True, provincia_equiv=PROVINCIA, costes=costes
+    )
+    coste_kg = dict(zip(datos["productos"], costes.coste_kg(datos["productos"], PROVINCIA)))
+    for n in (50, 100, 200):
+        inicio = time.perf_counter()
+        _, estado, beneficio_medio = resolver_media_muestral(
+            ModeloMulticultivo(superficie_ha=SUPERFICIE_HA, **datos), distribuciones, coste_kg, datos["demandas"], n_escenarios=n, solver=solver
+        )
+        t = time.perf_counter() - inicio
+        print(f"{n:>11}{t:>10.2f} s{estado:>12}{beneficio_medio or 0:>20,.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
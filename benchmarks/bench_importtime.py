@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# -------------------------------
+# Informe de tiempos de importación (equivalente a python -X importtime)
+# -------------------------------
+# Mido en un intérprete limpio lo que cuesta el arranque en frío de la app y el salto a la página
+# del formulario, que es la única que carga pandas, plotly y los modelos de optimización.
+# Uso: python -m benchmarks.bench_importtime [--json informe.json] [--top 15]
+FASES = {
+    "arranque (Inicio / Acerca de)": ["streamlit", "app.assets_module"],
+    "paso al formulario": [
+        "numpy",
+        "pandas",
+        "plotly.express",
+        "agro.data",
+        "agro.service",
+        "app.monocultivo_module",
+        "app.multicultivo_module",
+    ],
+}
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Lanzo un intérprete nuevo con -X importtime importando las fases en orden y devuelvo las líneas parseadas
+def medir_importaciones(fases=FASES):
+    codigo = "\n".join(f"import {modulo}" for modulos in fases.values() for modulo in modulos)
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+
+    registros = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        registros.append({
+            "modulo": nombre.strip(),
+            "nivel": (len(nombre) - len(nombre.lstrip()) - 1) // 2,
+            "propio_us": int(propio),
+            "acumulado_us": int(acumulado),
+        })
+    return registros
+
+
+# Sumo el tiempo acumulado de los módulos de primer nivel de cada fase: al medirlas en orden dentro del
+# mismo proceso, cada fase solo paga lo que no había importado la anterior (coste incremental)
+def resumir_fases(registros, fases=FASES):
+    primer_nivel = {r["modulo"]: r["acumulado_us"] for r in registros if r["nivel"] == 0}
+    resumen = {}
+    for fase, modulos in fases.items():
+        detalle = {m: primer_nivel.get(m, 0) / 1000 for m in modulos}
+        resumen[fase] = {"total_ms": sum(detalle.values()), "modulos_ms": detalle}
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Informe de tiempos de importación de AgroSmart")
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON")
+    parser.add_argument("--top", type=int, default=15, help="Número de módulos más lentos a listar")
+    args = parser.parse_args(argv)
+
+    registros = medir_importaciones()
+    resumen = resumir_fases(registros)
+
+    for fase, datos in resumen.items():
+        print(f"{fase}: {datos['total_ms']:.1f} ms")
+        for modulo, ms in datos["modulos_ms"].items():
+            print(f"    {modulo:<28} {ms:8.1f} ms")
+
+    print(f"\nMódulos con mayor tiempo propio (top {args.top}):")
+    for r in sorted(registros, key=lambda r: r["propio_us"], reverse=True)[:args.top]:
+        print(f"    {r['modulo']:<40} {r['propio_us'] / 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"fases": resumen, "modulos": registros}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from agro.data import cargar_cultivos, cargar_demanda, cargar_terreno, CuboDemanda
+from app.monocultivo_module import generar_propuestas_monocultivo
+
+# -------------------------------
+# Benchmark del motor de monocultivo
+# -------------------------------
+# Comparo la implementación vectorizada actual con la original (merge de todas las transacciones
+# + drop_duplicates + columnas derivadas para todo el catálogo) sobre una demanda sintética de 100k filas.
+# El motor actual consulta el cubo de demanda preagregado; su construcción se mide aparte.
+# Uso: python -m benchmarks.bench_monocultivo [n_transacciones]
+N_TRANSACCIONES = 100_000
+REPETICIONES = 5
+
+
+# Implementación original, conservada solo como referencia para medir la mejora
+def generar_propuestas_monocultivo_original(cultivos_df, demanda_df, terreno_df, superficie_ha):
+    cultivos_df["Rendimiento_kg_m2"] = cultivos_df["Rendimiento_promedio (kg/ha)"].fillna(0) / 10000
+    coste_generico = 0.30
+    demanda_df["beneficio_kg"] = demanda_df["Precio_kg_€"] - coste_generico
+    resumen = cultivos_df.merge(
+        demanda_df[["Producto", "Precio_kg_€", "beneficio_kg"]],
+        left_on="Nombre_cultivo", right_on="Producto", how="inner"
+    ).drop_duplicates(subset=["Nombre_cultivo"])
+    resumen["Duración del ciclo (días)"] = resumen["Duración_cultivo_días"]
+    resumen["Ciclos por año"] = (365 / resumen["Duración_cultivo_días"]).apply(np.floor).astype(int)
+    resumen["Producción (kg)"] = resumen["Rendimiento_kg_m2"] * superficie_ha * 10000
+    resumen["Producción total anual (kg)"] = resumen["Producción (kg)"] * resumen["Ciclos por año"]
+    resumen["Beneficio estimado (€)"] = resumen["Producción (kg)"] * resumen["beneficio_kg"]
+    resumen["Beneficio total anual (€)"] = resumen["Producción total anual (kg)"] * resumen["beneficio_kg"]
+    resumen["Beneficio mensual promedio (€)"] = resumen["Beneficio total anual (€)"] / 12
+    resumen["Producción mensual promedio (kg)"] = resumen["Producción total anual (kg)"] / 12
+    resumen["Superficie (ha)"] = superficie_ha
+    resumen_final = resumen[[
+        "Nombre_cultivo", "Duración del ciclo (días)", "Ciclos por año", "Producción (kg)",
+        "Producción mensual promedio (kg)", "Producción total anual (kg)", "Precio_kg_€",
+        "Beneficio estimado (€)", "Beneficio mensual promedio (€)", "Beneficio total anual (€)", "Superficie (ha)"
+    ]].rename(columns={"Nombre_cultivo": "Cultivo", "Precio_kg_€": "Precio estimado €/kg"})
+    return resumen_final.sort_values("Beneficio total anual (€)", ascending=False).head(10)
+
+
+# Demanda sintética con el mismo esquema que demanda_clientes.csv, muestreando las filas reales
+def demanda_sintetica(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    base = cargar_demanda()
+    demanda = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+    demanda["Kg_comprados"] = rng.uniform(10, 500, n).round(1)
+    return demanda
+
+
+def _medir(funcion, *args):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        copias = [a.copy() if isinstance(a, pd.DataFrame) else a for a in args]
+        inicio = time.perf_counter()
+        resultado = funcion(*copias)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main(n=N_TRANSACCIONES):
+    cultivos_df, terreno_df = cargar_cultivos(), cargar_terreno()
+    demanda_df = demanda_sintetica(n)
+    superficie_ha = 1.5
+
+    t_original, original = _medir(generar_propuestas_monocultivo_original, cultivos_df, demanda_df, terreno_df, superficie_ha)
+    # El motor actual lee del cubo de demanda, que se construye una vez y se reutiliza entre peticiones
+    t_cubo, cubo = _medir(CuboDemanda.desde_transacciones, demanda_df)
+    t_nuevo, nuevo = _medir(generar_propuestas_monocultivo.sin_cache, cultivos_df, cubo, terreno_df, superficie_ha)
+
+    iguales = np.allclose(
+        original["Beneficio total anual (€)"].to_numpy(), nuevo["Beneficio total anual (€)"].to_numpy()
+    ) and original["Cultivo"].tolist() == nuevo["Cultivo"].tolist()
+    print(f"Transacciones: {n:,}")
+    print(f"Original:     {t_original * 1000:8.2f} ms")
+    print(f"Vectorizado:  {t_nuevo * 1000:8.2f} ms  (x{t_original / t_nuevo:.1f})")
+    print(f"Construcción del cubo de demanda (una vez): {t_cubo * 1000:.2f} ms")
+    print(f"Mismo resultado: {'sí' if iguales else 'NO'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_TRANSACCIONES)
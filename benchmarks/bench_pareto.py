@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+from agro.data import cargar_cultivos, obtener_cubo_demanda, obtener_tabla_costes, obtener_ventanas_siembra
+from app.multicultivo_module import ejecutar_modelo_multicultivo, ejecutar_frontera_pareto
+
+# -------------------------------
+# Benchmark de la frontera de Pareto
+# -------------------------------
+# Comparo una resolución multicultivo con la frontera completa (beneficio / agua / diversidad), en un proceso
+# y con una cadena por proceso. Uso las versiones sin caché para medir la resolución, no la consulta a la caché.
+# Uso: python -m benchmarks.bench_pareto [solver]
+SUPERFICIES_HA = (0.5, 1.5, 5.0)
+PROVINCIA = "Murcia"
+
+
+def main(solver=None):
+    cultivos_df, cubo, costes, ventanas = cargar_cultivos(), obtener_cubo_demanda(), obtener_tabla_costes(), obtener_ventanas_siembra()
+    print(f"{'Superficie':>11}{'Procesos':>10}{'1 solución':>13}{'Frontera':>12}{'Puntos':>8}{'Eficientes':>12}{'Relación':>10}")
+    for superficie_ha in SUPERFICIES_HA:
+        inicio = time.perf_counter()
+        ejecutar_modelo_multicultivo.sin_cache(
+            cultivos_df, cubo, None, superficie_ha, None, "alto", PROVINCIA, "mediterraneo", True,
+            solver=solver, ventanas=ventanas, costes=costes
+        )
+        unica = time.perf_counter() - inicio
+        for procesos in sorted({1, os.cpu_count() or 1}):
+            inicio = time.perf_counter()
+            frontera = ejecutar_frontera_pareto.sin_cache(
+                cultivos_df, cubo, superficie_ha, "alto", PROVINCIA, "mediterraneo", modo_flexible=True,
+                ventanas=ventanas, costes=costes, procesos=procesos, solver=solver
+            )
+            t = time.perf_counter() - inicio
+            print(
+                f"{superficie_ha:>9.1f} ha{procesos:>10}{unica * 1000:>10.1f} ms{t * 1000:>9.1f} ms"
+                f"{len(frontera):>8}{len(frontera.eficientes()):>12}{t / unica:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
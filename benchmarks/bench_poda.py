@@ -0,0 +1,65 @@
+import sys
+import time
+
+from agro.data import CuboDemanda, TablaCostes, cargar_cultivos, obtener_cubo_demanda, obtener_tabla_costes
+from app.multicultivo_module import ModeloMulticultivo, preparar_datos_multicultivo, podar_dominados
+from benchmarks.sinteticos import generar_datos
+
+# -------------------------------
+# Benchmark de la poda de cultivos dominados
+# -------------------------------
+# Para los CSV reales y los catálogos sintéticos, con varias superficies y con y sin presupuesto de agua, comparo
+# el modelo multicultivo completo con el podado: cultivos, variables, tiempo de construcción y de resolución
+# (presolve incluido) y beneficio. El beneficio tiene que ser el mismo en todos los casos (ver la demostración
+# en podar_dominados); si alguno difiere, el script termina con error.
+# Uso: python -m benchmarks.bench_poda [--escalas 10 100] [--solver highs]
+SUPERFICIES_HA = (0.1, 1.5, 10.0)
+AGUA_L_POR_HA = 3_000_000
+PROVINCIA = "Murcia"
+TOLERANCIA_RELATIVA = 1e-6
+
+
+def _medir(datos, superficie_ha, presupuesto_agua_l, solver, podar):
+    inicio = time.perf_counter()
+    if podar:
+        datos, podados = podar_dominados(datos, superficie_ha, presupuesto_agua_l)
+    modelo_multi = ModeloMulticultivo(superficie_ha=superficie_ha, presupuesto_agua_l=presupuesto_agua_l, **datos)
+    construccion = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    estado, beneficio = modelo_multi.resolver(solver)
+    return len(modelo_multi.productos), len(modelo_multi.pares), construccion, time.perf_counter() - inicio, estado, beneficio
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    solver = argv[argv.index("--solver") + 1] if "--solver" in argv else None
+    escalas = [int(e) for e in argv[argv.index("--escalas") + 1:] if e.isdigit()] if "--escalas" in argv else [10]
+
+    catalogos = [("real", cargar_cultivos(), obtener_cubo_demanda(), obtener_tabla_costes())]
+    for escala in escalas:
+        datos = generar_datos(escala)
+        catalogos.append((f"{escala}x", datos["cultivos"], CuboDemanda.desde_transacciones(datos["demanda"]), TablaCostes(datos["eficiencia"])))
+
+    print(f"{'Datos':>6}{'Sup.':>7}{'Agua':>6}{'Cultivos':>15}{'Variables':>17}{'Construcción':>21}{'Resolución':>21}{'Beneficio':>13}")
+    diferencias = 0
+    for nombre, cultivos_df, cubo, costes in catalogos:
+        datos = preparar_datos_multicultivo(cultivos_df, cubo, "alto", "mediterraneo", True, provincia_equiv=PROVINCIA, costes=costes)
+        for superficie_ha in SUPERFICIES_HA:
+            for presupuesto_agua_l in (None, AGUA_L_POR_HA * superficie_ha):
+                n_c, n_v, t_c, t_r, estado, beneficio = _medir(datos, superficie_ha, presupuesto_agua_l, solver, podar=False)
+                p_c, p_v, pt_c, pt_r, estado_poda, beneficio_poda = _medir(datos, superficie_ha, presupuesto_agua_l, solver, podar=True)
+                igual = estado == estado_poda and abs(beneficio - beneficio_poda) <= TOLERANCIA_RELATIVA * max(abs(beneficio), 1.0)
+                diferencias += not igual
+                print(
+                    f"{nombre:>6}{superficie_ha:>7.1f}{'sí' if presupuesto_agua_l else 'no':>6}{n_c:>7,} -> {p_c:<5,}{n_v:>8,} -> {p_v:<6,}"
+                    f"{t_c * 1000:>8.1f} -> {pt_c * 1000:>6.1f} ms{t_r * 1000:>8.1f} -> {pt_r * 1000:>6.1f} ms"
+                    f"{beneficio:>13,.2f}{'' if igual else f'  DIFIERE ({beneficio_poda:,.2f})'}"
+                )
+    if diferencias:
+        print(f"{diferencias} casos con beneficio distinto tras la poda")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
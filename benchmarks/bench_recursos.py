@@ -0,0 +1,80 @@
+import sys
+import time
+import numpy as np
+
+from agro.data import cargar_cultivos, obtener_cubo_demanda, obtener_tabla_costes, obtener_catalogo_recursos
+from app.multicultivo_module import ModeloMulticultivo, preparar_datos_multicultivo, RECURSO_AGUA, RECURSO_MAQUINARIA
+
+# -------------------------------
+# Benchmark de las restricciones mensuales de recursos
+# -------------------------------
+# Mido construcción y resolución del modelo multicultivo sin restricciones de recursos, con agua mensual,
+# con horas de maquinaria y con ambas, para cada backend. Después añado recursos sintéticos (consumos
+# aleatorios por kg) para comprobar que el tiempo de construcción crece poco con cada recurso añadido.
+# Uso: python -m benchmarks.bench_recursos [superficie_ha]
+SUPERFICIE_HA = 5.0
+REPETICIONES = 5
+RECURSOS_SINTETICOS = (0, 5, 20, 50)
+
+
+def _medir(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+# Consumos aleatorios por kg (en el mes de siembra y a lo largo del ciclo) con una capacidad holgada
+def recursos_sinteticos(productos, n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    consumos, capacidades = {}, {}
+    for i in range(n):
+        nombre = f"sintetico_{i}"
+        consumos[nombre] = {
+            "siembra": dict(zip(productos, rng.uniform(0, 0.01, len(productos)).tolist())),
+            "ciclo": dict(zip(productos, rng.uniform(0, 1, len(productos)).tolist())),
+        }
+        capacidades[nombre] = 1e6
+    return consumos, capacidades
+
+
+def main(superficie_ha=SUPERFICIE_HA):
+    # Catálogo completo (modo flexible, agua alta) en la provincia de referencia para el modelo más grande
+    datos = preparar_datos_multicultivo(
+        cargar_cultivos(copiar=False), obtener_cubo_demanda(), "alto", "mediterraneo", modo_flexible=True,
+        provincia_equiv="Murcia", costes=obtener_tabla_costes()
+    )
+    # Agua mensual ajustada para que la restricción sea activa y horas de maquinaria del catálogo
+    escenarios = {
+        "sin recursos": None,
+        "agua mensual": {RECURSO_AGUA: 50_000.0},
+        "maquinaria": {RECURSO_MAQUINARIA: obtener_catalogo_recursos().horas_maquinaria_mes()},
+        "agua + maquinaria": {RECURSO_AGUA: 50_000.0, RECURSO_MAQUINARIA: obtener_catalogo_recursos().horas_maquinaria_mes()},
+    }
+
+    print(f"Cultivos: {len(datos['productos'])}  Superficie: {superficie_ha} ha")
+    print(f"{'Escenario':<20}{'Construcción':>14}{'CBC':>12}{'HiGHS':>12}{'Beneficio €':>14}")
+    for nombre, capacidades in escenarios.items():
+        t_construir, _ = _medir(lambda: ModeloMulticultivo(superficie_ha=superficie_ha, capacidades_recursos=capacidades, **datos))
+        tiempos = {}
+        for solver in ("cbc", "highs"):
+            t, (estado, beneficio) = _medir(
+                lambda: ModeloMulticultivo(superficie_ha=superficie_ha, capacidades_recursos=capacidades, **datos).resolver(solver)
+            )
+            tiempos[solver] = t - t_construir
+        print(f"{nombre:<20}{t_construir * 1000:>11.2f} ms{tiempos['cbc'] * 1000:>9.1f} ms"
+              f"{tiempos['highs'] * 1000:>9.1f} ms{beneficio:>14,.2f}")
+
+    # Escalado de la construcción con el número de recursos (matrices dispersas)
+    print("\nRecursos sintéticos  Construcción  Restricciones")
+    for n in RECURSOS_SINTETICOS:
+        consumos, capacidades = recursos_sinteticos(datos["productos"], n)
+        datos_n = dict(datos, consumos_recursos=dict(datos["consumos_recursos"], **consumos))
+        t, modelo_multi = _medir(lambda: ModeloMulticultivo(superficie_ha=superficie_ha, capacidades_recursos=capacidades or None, **datos_n))
+        print(f"{n:>19}{t * 1000:>11.2f} ms{len(modelo_multi.modelo.constraints):>15}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else SUPERFICIE_HA)
@@ -0,0 +1,50 @@
+import sys
+import time
+
+from agro.data import cargar_cultivos, obtener_cubo_demanda, obtener_tabla_costes, obtener_historial_cultivos, familias_por_cultivo
+from app.multicultivo_module import ModeloMulticultivo, planificar_rotacion
+
+# -------------------------------
+# Benchmark de la planificación plurianual con rotación
+# -------------------------------
+# Mido el plan de 1 a 5 campañas con horizonte rodante sobre el catálogo completo y una superficie pequeña
+# (para que la rotación sea activa), con rotación estricta y con penalización. El tiempo por campaña
+# debería mantenerse estable: el crecimiento con el número de años es lineal.
+# Uso: python -m benchmarks.bench_rotacion [solver]
+SUPERFICIE_HA = 0.2
+ID_TERRENO = 6
+REPETICIONES = 3
+
+
+def _medir(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def _plan(anios, penalizacion_ha, ocupacion_inicial, solver):
+    modelo_multi = ModeloMulticultivo.desde_datos(
+        cargar_cultivos(copiar=False), obtener_cubo_demanda(), SUPERFICIE_HA, "alto", "mediterraneo", modo_flexible=True,
+        provincia_equiv="Murcia", costes=obtener_tabla_costes()
+    )
+    familias = familias_por_cultivo(modelo_multi.productos)
+    return planificar_rotacion(modelo_multi, familias, anios, ocupacion_inicial, penalizacion_ha=penalizacion_ha, solver=solver)
+
+
+def main(solver=None):
+    _, ocupacion_inicial = obtener_historial_cultivos().ultima_campana(ID_TERRENO, SUPERFICIE_HA)
+    print(f"Terreno {ID_TERRENO}, {SUPERFICIE_HA} ha, estado inicial: {ocupacion_inicial}")
+    for etiqueta, penalizacion_ha in (("estricta", None), ("penalizada", 1000.0)):
+        print(f"\nRotación {etiqueta}")
+        print(f"{'Años':>5}{'Total':>12}{'Por año':>12}{'Beneficio €':>14}")
+        for anios in range(1, 6):
+            t, (_, resumen) = _medir(lambda: _plan(anios, penalizacion_ha, ocupacion_inicial, solver))
+            beneficio = resumen["Beneficio_€"].sum() - resumen["Penalizacion_€"].sum()
+            print(f"{anios:>5}{t * 1000:>9.1f} ms{t / anios * 1000:>9.1f} ms{beneficio:>14,.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
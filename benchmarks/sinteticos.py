@@ -0,0 +1,129 @@
+import os
+import numpy as np
+import pandas as pd
+
+from agro.data import (
+    DATASETS, cargar_cultivos, cargar_demanda, cargar_terreno, cargar_eficiencia, normalizar_texto
+)
+
+# -------------------------------
+# Generadores de datos sintéticos a escala
+# -------------------------------
+# Los CSV de agro/data son pequeños (39 cultivos, 200 transacciones, 30 terrenos). Para medir los motores
+# a escala genero catálogos, historiales de demanda, terrenos y tablas de eficiencia con el mismo esquema
+# que los CSV reales, multiplicados por `escala`. Cada cultivo real se replica en variedades
+# ("Tomate v0002", ...) con rendimiento, duración y temperaturas perturbados, y la demanda y los costes de
+# cada variedad se muestrean de los de su cultivo original. La primera variedad conserva el nombre real.
+# Con la misma escala y semilla los datos son siempre los mismos.
+ESCALAS = (10, 100, 1000)
+SUFIJO_VARIEDAD = r" v\d{4}$"
+
+
+# Aplico los tipos y las columnas clave normalizadas del esquema del loader, como si el dataset se hubiera leído del CSV
+def como_cargado(df, nombre):
+    esquema = DATASETS[nombre]
+    df = df.astype({col: tipo for col, tipo in esquema["dtypes"].items() if col in df.columns})
+    for col, col_clave in esquema["claves"].items():
+        if col in df.columns:
+            df[col_clave] = normalizar_texto(df[col])
+    return df
+
+
+# Nombre del cultivo real del que sale cada variedad sintética
+def cultivo_base(nombres):
+    return pd.Series(nombres).str.replace(SUFIJO_VARIEDAD, "", regex=True).to_numpy()
+
+
+def _variedades(df, escala, columna_nombre):
+    replicado = df.loc[df.index.repeat(escala)].reset_index(drop=True)
+    variedad = replicado.groupby(columna_nombre, sort=False).cumcount().to_numpy()
+    nombres = replicado[columna_nombre].to_numpy(dtype=object)
+    sufijos = np.char.mod(" v%04d", variedad + 1).astype(object)
+    replicado[columna_nombre] = np.where(variedad == 0, nombres, nombres + sufijos)
+    return replicado, variedad
+
+
+def catalogo_sintetico(escala, semilla=0):
+    rng = np.random.default_rng(semilla)
+    base = cargar_cultivos().drop(columns=["Clave_cultivo"])
+    catalogo, variedad = _variedades(base, escala, "Nombre_cultivo")
+    perturbar = variedad > 0
+    n = len(catalogo)
+    catalogo["ID_cultivo"] = np.arange(1, n + 1)
+    catalogo["Rendimiento_promedio (kg/ha)"] = np.where(
+        perturbar, catalogo["Rendimiento_promedio (kg/ha)"] * rng.uniform(0.8, 1.2, n), catalogo["Rendimiento_promedio (kg/ha)"]
+    ).round(0)
+    duracion = catalogo["Duración_cultivo_días"].to_numpy() + np.where(perturbar, rng.integers(-15, 16, n), 0)
+    catalogo["Duración_cultivo_días"] = np.clip(duracion, 30, 330)
+    desplazamiento = np.where(perturbar, rng.integers(-2, 3, n), 0)
+    catalogo["Temperatura_optima_min"] = catalogo["Temperatura_optima_min"] + desplazamiento
+    catalogo["Temperatura_optima_max"] = catalogo["Temperatura_optima_max"] + desplazamiento
+    return como_cargado(catalogo, "cultivos")
+
+
+# Transacciones de demanda: escala veces las reales, repartidas entre todas las variedades del catálogo.
+# El precio de cada transacción sale de los precios reales de su cultivo base con una variación lognormal.
+def demanda_sintetica(catalogo, escala, semilla=0):
+    rng = np.random.default_rng(semilla + 1)
+    base = cargar_demanda()
+    n = len(base) * escala
+    precios_base = base.groupby("Producto")["Precio_kg_€"].mean()
+    nombres = catalogo["Nombre_cultivo"].to_numpy()
+    nombres = nombres[pd.Index(cultivo_base(nombres)).isin(precios_base.index)]
+
+    productos = nombres[rng.integers(0, len(nombres), n)]
+    filas_base = rng.integers(0, len(base), n)
+    demanda = pd.DataFrame({
+        "Cliente": np.char.mod("Cliente_%d", rng.integers(1, 20 * escala + 1, n)),
+        "Tipo_cliente": base["Tipo_cliente"].to_numpy()[filas_base],
+        "Producto": productos,
+        "Kg_comprados": rng.uniform(10, 500, n).round(1),
+        "Fecha_compra": base["Fecha_compra"].to_numpy()[filas_base],
+        "Precio_kg_€": (precios_base.reindex(cultivo_base(productos)).to_numpy() * rng.lognormal(0, 0.1, n)).round(2),
+    })
+    return como_cargado(demanda, "demanda")
+
+
+def terreno_sintetico(escala, semilla=0):
+    rng = np.random.default_rng(semilla + 2)
+    base = cargar_terreno().drop(columns=["Clave_provincia"])
+    terreno, variedad = _variedades(base, escala, "Nombre_terreno")
+    perturbar = variedad > 0
+    n = len(terreno)
+    terreno["ID_terreno"] = np.arange(1, n + 1)
+    terreno["Superficie_ha"] = np.where(perturbar, terreno["Superficie_ha"] * rng.uniform(0.5, 2.0, n), terreno["Superficie_ha"]).round(2)
+    terreno["pH_suelo"] = np.where(perturbar, np.clip(terreno["pH_suelo"] + rng.normal(0, 0.2, n), 4.5, 9.0), terreno["pH_suelo"]).round(1)
+    return como_cargado(terreno, "terreno")
+
+
+# Costes por (variedad, provincia): las filas del cultivo base con los costes y el agua perturbados un ±10 %
+def eficiencia_sintetica(catalogo, semilla=0):
+    rng = np.random.default_rng(semilla + 3)
+    base = cargar_eficiencia().drop(columns=["Clave_cultivo", "Clave_provincia"])
+    nombres = catalogo["Nombre_cultivo"].to_numpy()
+    variedades = pd.DataFrame({"Cultivo_sintetico": nombres, "Cultivo": cultivo_base(nombres)})
+    eficiencia = variedades.merge(base, on="Cultivo", how="inner")
+    eficiencia["Cultivo"] = eficiencia.pop("Cultivo_sintetico")
+    factor = rng.uniform(0.9, 1.1, len(eficiencia))
+    for columna in ("Coste_total_estimado_€/kg", "Agua_litros_por_kg"):
+        eficiencia[columna] = (eficiencia[columna] * factor).round(4)
+    return como_cargado(eficiencia[base.columns], "eficiencia")
+
+
+# Todos los datasets de una escala, coherentes entre sí
+def generar_datos(escala, semilla=0):
+    catalogo = catalogo_sintetico(escala, semilla)
+    return {
+        "cultivos": catalogo,
+        "demanda": demanda_sintetica(catalogo, escala, semilla),
+        "terreno": terreno_sintetico(escala, semilla),
+        "eficiencia": eficiencia_sintetica(catalogo, semilla),
+    }
+
+
+# Escribo los datasets con el nombre y las columnas de los CSV reales (sin las columnas clave)
+def guardar_csv(datos, directorio):
+    os.makedirs(directorio, exist_ok=True)
+    for nombre, df in datos.items():
+        claves = list(DATASETS[nombre]["claves"].values())
+        df.drop(columns=claves, errors="ignore").to_csv(os.path.join(directorio, DATASETS[nombre]["archivo"]), index=False)
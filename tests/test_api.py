@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+from agro.service.api import ErrorPeticion, app, cerrar_pool, validar_parametros
+from agro.data import obtener_tabla_costes
+from agro.service.pipeline import recomendar_plan_rotacion, resolver_provincia
+
+BASE = {"superficie_ha": 1.5, "acceso_agua": "medio", "provincia": "Murcia"}
+
+
+def test_parametros_validos():
+    parametros = validar_parametros("multicultivo", {**BASE, "acceso_agua": " Alto ", "semilla": 3, "modo_flexible": True})
+    assert parametros["acceso_agua"] == "alto"
+    assert parametros["superficie_ha"] == 1.5
+    assert parametros["semilla"] == 3
+
+
+@pytest.mark.parametrize("cuerpo", [
+    [],
+    {"acceso_agua": "medio", "provincia": "Murcia"},
+    {**BASE, "desconocido": 1},
+    {**BASE, "superficie_ha": "1.5"},
+    {**BASE, "superficie_ha": True},
+    {**BASE, "superficie_ha": 0},
+    {**BASE, "superficie_ha": -2.0},
+    {**BASE, "superficie_ha": float("nan")},
+    {**BASE, "superficie_ha": float("inf")},
+    {**BASE, "presupuesto_agua_l": float("-inf")},
+    {**BASE, "presupuesto_agua_l": -1},
+    {**BASE, "semilla": True},
+    {**BASE, "semilla": 1.5},
+    {**BASE, "n_escenarios": False},
+    {**BASE, "n_escenarios": -1},
+    {**BASE, "modo_flexible": 1},
+    {**BASE, "acceso_agua": "mucho"},
+    {**BASE, "ph_suelo": 15},
+    {**BASE, "uso_suelo": "otro"},
+    {**BASE, "vista_previa": True, "escenarios_saa": 10},
+])
+def test_parametros_malformados(cuerpo):
+    with pytest.raises(ErrorPeticion) as error:
+        validar_parametros("multicultivo", cuerpo)
+    assert error.value.codigo == 400
+
+
+@pytest.mark.parametrize("puntos", [True, 1.5, "3"])
+def test_enteros_malformados(puntos):
+    with pytest.raises(ErrorPeticion):
+        validar_parametros("sensibilidad", {**BASE, "puntos": puntos})
+
+
+def test_anios_booleano_en_plurianual():
+    with pytest.raises(ErrorPeticion):
+        validar_parametros("plurianual", {**BASE, "anios": True})
+
+
+def test_terreno_desconocido():
+    with pytest.raises(ValueError, match="Terreno desconocido"):
+        recomendar_plan_rotacion(1.5, "medio", "Murcia", id_terreno=99_999)
+
+
+def _agua_por_anio(salida):
+    plan = salida["plan"]
+    agua_l_kg = obtener_tabla_costes().agua_l_kg(plan["Cultivo"].to_numpy(), resolver_provincia("Murcia")[0])
+    return (plan["Cantidad_kg"] * agua_l_kg).groupby(plan["Año"]).sum()
+
+
+def test_plan_plurianual_respeta_el_presupuesto_de_agua():
+    libre = recomendar_plan_rotacion(1.5, "medio", "Murcia", anios=2)
+    presupuesto = float(_agua_por_anio(libre).min()) / 2
+    limitado = recomendar_plan_rotacion(1.5, "medio", "Murcia", anios=2, presupuesto_agua_l=presupuesto)
+    assert (_agua_por_anio(limitado) <= presupuesto * (1 + 1e-6)).all()
+    assert limitado["beneficio_total"] < libre["beneficio_total"]
+
+
+def test_plan_plurianual_pasa_los_limites_mensuales():
+    validar_parametros("plurianual", {**BASE, "agua_mensual_l": 1e5, "limitar_maquinaria": True})
+    libre = recomendar_plan_rotacion(1.5, "medio", "Murcia", anios=2)
+    limitado = recomendar_plan_rotacion(1.5, "medio", "Murcia", anios=2, agua_mensual_l=1.0, limitar_maquinaria=True)
+    assert limitado["beneficio_total"] < libre["beneficio_total"]
+
+
+# NaN e Infinity llegan así en el JSON (json.loads los acepta) y la ruta responde 400 sin tocar el pool
+def test_ruta_rechaza_superficie_no_finita():
+    async def llamar(cuerpo):
+        mensajes = []
+
+        async def recibir():
+            return {"type": "http.request", "body": cuerpo.encode(), "more_body": False}
+
+        async def enviar(mensaje):
+            mensajes.append(mensaje)
+
+        await app({"type": "http", "method": "POST", "path": "/v1/multicultivo", "headers": []}, recibir, enviar)
+        return mensajes[0]["status"], json.loads(mensajes[1]["body"])
+
+    try:
+        for valor in ("NaN", "Infinity"):
+            codigo, respuesta = asyncio.run(llamar(f'{{"superficie_ha": {valor}, "acceso_agua": "medio", "provincia": "Murcia"}}'))
+            assert codigo == 400
+            assert "superficie_ha" in respuesta["error"]
+    finally:
+        cerrar_pool()
@@ -0,0 +1,30 @@
+import pytest
+
+from agro.service.pipeline import recomendar_monocultivo, recomendar_multicultivo
+from app.batch_module import COLUMNAS_PERFIL, _resolver_lote, perfiles_desde_terreno, preparar_perfiles
+
+
+@pytest.fixture(scope="module")
+def fincas():
+    perfiles = preparar_perfiles(perfiles_desde_terreno())
+    return perfiles[COLUMNAS_PERFIL + ["provincia_equiv", "zona_climatica"]].head(6).to_dict("records")
+
+
+# Cada finca del lote tiene que dar lo mismo que el formulario (o el servicio) con su suelo, pH y provincia
+def test_lote_igual_que_el_pipeline(fincas):
+    for finca in fincas:
+        registros = {r["motor"]: r for r in _resolver_lote([finca], ("monocultivo", "multicultivo"), None)}
+        multi = recomendar_multicultivo(
+            finca["superficie_ha"], finca["acceso_agua"], finca["provincia"], tipo_suelo=finca["tipo_suelo"], ph_suelo=finca["ph_suelo"]
+        )
+        mono = recomendar_monocultivo(finca["superficie_ha"], finca["provincia"], tipo_suelo=finca["tipo_suelo"], ph_suelo=finca["ph_suelo"])
+        beneficio_mono = float(mono["resultados"]["Beneficio total anual (€)"].max()) if len(mono["resultados"]) else 0.0
+        assert registros["multicultivo"]["beneficio_€"] == pytest.approx(multi["beneficio_total"], abs=0.01)
+        assert registros["monocultivo"]["beneficio_€"] == pytest.approx(beneficio_mono, abs=0.01)
+
+
+def test_fincas_con_distinta_aptitud_no_comparten_plantilla():
+    perfiles = preparar_perfiles(perfiles_desde_terreno())
+    mismo_grupo = perfiles.groupby(["acceso_agua", "zona_climatica", "provincia_equiv", "modo_flexible", "clave_aptitud"])
+    assert all(grupo[["tipo_suelo"]].nunique().iloc[0] == 1 for _, grupo in mismo_grupo)
+    assert preparar_perfiles(perfiles_desde_terreno(), "ninguno")["clave_aptitud"].eq("").all()
@@ -0,0 +1,84 @@
+import os
+import sys
+import types
+
+import pytest
+
+from app import cache_module
+from app.cache_module import CacheResultados, clave_canonica, memoizar
+
+
+def test_textos_distintos_no_comparten_clave():
+    assert clave_canonica("motor", {"zona": "mediterraneo"}) != clave_canonica("motor", {"zona": "Mediterraneo "})
+    assert clave_canonica("motor", {"superficie_ha": 1.5}) == clave_canonica("motor", {"superficie_ha": 1.50})
+
+
+def test_solver_por_defecto_en_la_clave(monkeypatch):
+    cache = CacheResultados()
+    llamadas = []
+
+    @memoizar(cache=cache)
+    def motor(superficie_ha, solver=None):
+        from app.solver_module import nombre_backend
+
+        llamadas.append(nombre_backend(solver))
+        return llamadas[-1]
+
+    monkeypatch.setenv("AGROSMART_SOLVER", "cbc")
+    assert motor(1.5) == "cbc"
+    monkeypatch.setenv("AGROSMART_SOLVER", "highs")
+    assert motor(1.5) == "highs"
+    # solver=None con AGROSMART_SOLVER=highs es la misma entrada que pedir "highs" explícitamente
+    assert motor(1.5, solver="highs") == "highs"
+    assert llamadas == ["cbc", "highs"]
+
+
+# Una entrada de disco que no se puede cargar (p. ej. de una versión anterior del código) es un fallo, no un error
+def test_entrada_de_disco_ilegible(tmp_path, monkeypatch):
+    # Pickle de una clase cuyo módulo desaparece después: pickle.load lanza ModuleNotFoundError
+    modulo = types.ModuleType("modulo_borrado")
+    modulo.Clase = type("Clase", (), {"__module__": "modulo_borrado"})
+    monkeypatch.setitem(sys.modules, "modulo_borrado", modulo)
+    cache = CacheResultados(directorio=str(tmp_path))
+    cache.guardar("vieja", modulo.Clase())
+    monkeypatch.delitem(sys.modules, "modulo_borrado")
+
+    cache.limpiar()
+    assert cache.obtener("vieja") == (False, None)
+    assert not (tmp_path / "vieja.pkl").exists()
+    assert cache.estadisticas()["fallos"] == 1
+
+
+# La capa de disco no pasa del tope: se borran primero las entradas usadas hace más tiempo
+def test_disco_con_tope_lru(tmp_path):
+    cache = CacheResultados(directorio=str(tmp_path), tamano_disco_mb=3.5 / 1024)
+    for i, clave in enumerate(("a", "b", "c")):
+        cache.guardar(clave, bytes(1000))
+        os.utime(tmp_path / f"{clave}.pkl", (i, i))
+    # Leer "a" desde disco la marca como recién usada
+    cache.limpiar()
+    assert cache.obtener("a")[0]
+    cache.guardar("d", bytes(1000))
+    assert sorted(p.stem for p in tmp_path.glob("*.pkl")) == ["a", "c", "d"]
+
+
+# Las claves cambian con la versión del formato y con el código de los motores
+def test_version_en_la_clave(monkeypatch):
+    clave = clave_canonica("motor", {"superficie_ha": 1.5})
+    monkeypatch.setattr(cache_module, "VERSION_FORMATO", cache_module.VERSION_FORMATO + 1)
+    assert clave_canonica("motor", {"superficie_ha": 1.5}) != clave
+    monkeypatch.undo()
+    monkeypatch.setattr(cache_module, "huella_codigo", lambda: "otro código")
+    assert clave_canonica("motor", {"superficie_ha": 1.5}) != clave
+
+
+# Un objeto sin huella() no puede entrar en la clave (su repr lleva la dirección de memoria)
+def test_parametro_sin_huella():
+    with pytest.raises(TypeError, match="huella"):
+        clave_canonica("motor", {"datos": object()})
+
+    class ConHuella:
+        def huella(self):
+            return "abc"
+
+    assert clave_canonica("motor", {"datos": ConHuella()}) == clave_canonica("motor", {"datos": ConHuella()})
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agro.data import cargar_cultivos, normalizar_texto, obtener_matriz_compatibilidad
+from agro.data.compatibilidad import MESES_CLIMA, MatrizCompatibilidad, filtrar_aptitud
+
+# Catálogo pequeño con factores conocidos: "Anual" ocupa los 12 meses (clima = meses en rango / 12) y
+# "Corto" tres meses (clima = 1 en cuanto haya tres meses en rango)
+CULTIVOS = pd.DataFrame({
+    "Nombre_cultivo": ["Anual", "Corto"],
+    "Tipo_suelo_requerido": ["Franco", "Arcilloso"],
+    "Duración_cultivo_días": [360, 90],
+    "pH_optimo_min": [6.0, 6.0],
+    "pH_optimo_max": [7.0, 7.0],
+    "Temperatura_optima_min": [10.0, 10.0],
+    "Temperatura_optima_max": [30.0, 30.0],
+})
+ANUAL, CORTO = 0, 1
+TERRENO = pd.DataFrame({"ID_terreno": [1], "Tipo_suelo": ["Arenoso"], "pH_suelo": [6.5], "Ubicación": ["Cálida"]})
+
+
+def _clima(provincia, temperaturas):
+    fila = {"Provincia": provincia, "Clave_provincia": normalizar_texto(pd.Series([provincia])).iloc[0], "Zona_climática": "x"}
+    fila.update({f"Temp_media_{mes}": t for mes, t in zip(MESES_CLIMA, temperaturas)})
+    return fila
+
+
+CLIMA = pd.DataFrame([
+    _clima("Cálida", [20] * 12),
+    _clima("Fría", [5] * 12),
+    _clima("Mixta", [20] * 6 + [5] * 6),
+])
+
+
+@pytest.fixture(scope="module")
+def matriz():
+    return MatrizCompatibilidad(CULTIVOS, TERRENO, CLIMA)
+
+
+@pytest.mark.parametrize("tipo_suelo, esperado", [
+    ("franco", 1.0),
+    ("  FRANCO ", 1.0),
+    ("franco-arenoso", 0.75),
+    ("arenoso", 0.5),
+    ("limoso", 0.875),
+    ("arcilloso", 0.5),
+    (None, 1.0),
+    ("desconocido", 1.0),
+])
+def test_factor_textura(matriz, tipo_suelo, esperado):
+    assert matriz.aptitud(tipo_suelo, 6.5, ("Cálida",))[ANUAL] == pytest.approx(esperado)
+
+
+@pytest.mark.parametrize("ph_suelo, esperado", [
+    (6.5, 1.0),
+    (7.0, 1.0),
+    (7.5, 0.5),
+    (5.5, 0.5),
+    (5.0, 0.0),
+    (9.0, 0.0),
+    (None, 1.0),
+    (np.nan, 1.0),
+])
+def test_factor_ph(matriz, ph_suelo, esperado):
+    assert matriz.aptitud("franco", ph_suelo, ("Cálida",))[ANUAL] == pytest.approx(esperado)
+
+
+@pytest.mark.parametrize("provincias, anual, corto", [
+    (("Cálida",), 1.0, 1.0),
+    (("Fría",), 0.0, 0.0),
+    (("Mixta",), 0.5, 1.0),
+    (("Sin datos", "mixta"), 0.5, 1.0),
+    (("Sin datos",), 1.0, 1.0),
+    ((), 1.0, 1.0),
+])
+def test_factor_clima(matriz, provincias, anual, corto):
+    aptitud = matriz.aptitud("arcilloso", 6.5, provincias)
+    # Anual pide franco (dos pasos: 0,5) y Corto arcilloso (1)
+    assert aptitud[ANUAL] == pytest.approx(0.5 * anual)
+    assert aptitud[CORTO] == pytest.approx(corto)
+
+
+def test_producto_de_factores(matriz):
+    assert matriz.aptitud("arenoso", 7.5, ("Mixta",))[ANUAL] == pytest.approx(0.5 * 0.5 * 0.5)
+
+
+def test_perfil_terreno(matriz):
+    assert matriz.perfil_terreno(1) == {"tipo_suelo": "Arenoso", "ph_suelo": 6.5, "provincia": "Cálida"}
+    assert matriz.perfil_terreno(2) is None
+
+
+def test_aptitud_alineada_con_las_filas_del_catalogo():
+    # Un cultivo repetido toma la puntuación de su última aparición, como en la matriz
+    catalogo = pd.concat([CULTIVOS, CULTIVOS.iloc[[0]].assign(Tipo_suelo_requerido="Arcilloso")], ignore_index=True)
+    aptitud = MatrizCompatibilidad(catalogo, TERRENO, CLIMA).aptitud("arcilloso", 6.5, ("Cálida",))
+    assert aptitud.tolist() == pytest.approx([1.0, 1.0, 1.0])
+
+
+def test_filtrar_aptitud():
+    factor, aptos = filtrar_aptitud([0.0, 0.3, 0.8], 3, "filtro")
+    assert aptos.tolist() == [False, False, True]
+    assert filtrar_aptitud(factor, 3, "ponderar")[1].tolist() == [False, True, True]
+    with pytest.raises(ValueError):
+        filtrar_aptitud(factor, 4, "filtro")
+    with pytest.raises(ValueError):
+        filtrar_aptitud(factor, 3, "otro")
+
+
+def test_matriz_real_cubre_el_catalogo():
+    matriz = obtener_matriz_compatibilidad()
+    aptitud = matriz.aptitud("franco", 6.8, ("Murcia",))
+    assert aptitud.shape == (len(cargar_cultivos()),)
+    assert ((aptitud >= 0.0) & (aptitud <= 1.0)).all()
+    assert matriz.huella() == obtener_matriz_compatibilidad().huella()
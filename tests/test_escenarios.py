@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agro.data import obtener_distribuciones_mercado, obtener_tabla_costes
+from app.escenarios_module import evaluar_plan_multicultivo, simular_beneficios
+
+PLAN = pd.DataFrame({
+    "Cultivo": ["Tomate", "Lechuga", "Tomate"],
+    "Mes": [3, 4, 9],
+    "Cantidad_kg": [1200.0, 800.0, 600.0],
+})
+
+
+def test_muestreo_con_nombres_sin_normalizar():
+    distribuciones = obtener_distribuciones_mercado()
+    precios, factores = distribuciones.muestrear(["Tomate", "  TOMATE "], 200, np.random.default_rng(1))
+    # Las dos columnas son el mismo producto: mismas observaciones y misma dispersión
+    assert not np.isnan(precios).any()
+    np.testing.assert_array_equal(distribuciones.cv_precio(["Tomate"]), distribuciones.cv_precio(["  TOMATE "]))
+    assert factores.shape == (200, 2)
+
+
+def test_producto_desconocido_usa_precio_de_referencia():
+    precios, _ = obtener_distribuciones_mercado().muestrear(["Cultivo inventado"], 50, 0, {"Cultivo inventado": 2.0})
+    # Sin calendario su dispersión es 0: el precio es exactamente el de referencia
+    np.testing.assert_allclose(precios, 2.0)
+
+
+def test_resultado_independiente_de_los_procesos():
+    distribuciones = obtener_distribuciones_mercado()
+    argumentos = (distribuciones, ["Tomate", "Lechuga"], np.array([1800.0, 800.0]), np.array([0.3, 0.3]))
+    uno = simular_beneficios(*argumentos, n_escenarios=6_000, semilla=7, procesos=1)
+    dos = simular_beneficios(*argumentos, n_escenarios=6_000, semilla=7, procesos=2)
+    np.testing.assert_array_equal(uno, dos)
+
+
+def test_bandas_ordenadas():
+    riesgo = evaluar_plan_multicultivo(
+        PLAN, obtener_distribuciones_mercado(), costes=obtener_tabla_costes(), provincia_equiv="Murcia", n_escenarios=5_000
+    ).iloc[0]
+    assert riesgo["Escenarios"] == 5_000
+    assert riesgo["P10_€"] <= riesgo["P50_€"] <= riesgo["P90_€"]
+    assert 0 <= riesgo["Prob_perdida"] <= 1
+
+
+def test_media_muestral_reparte_el_beneficio_medio_por_filas():
+    from agro.data import cargar_cultivos, obtener_cubo_demanda
+    from app.escenarios_module import resolver_media_muestral
+    from app.multicultivo_module import ModeloMulticultivo
+
+    modelo_multi = ModeloMulticultivo.desde_datos(cargar_cultivos(), obtener_cubo_demanda(), 1.5, "medio", "mediterránea", True)
+    productos = modelo_multi.productos
+    coste_kg = dict(zip(productos, obtener_tabla_costes().coste_kg(productos, "Murcia")))
+    plan, estado, beneficio_medio = resolver_media_muestral(
+        modelo_multi, obtener_distribuciones_mercado(), coste_kg, modelo_multi.demandas, n_escenarios=20, semilla=3,
+        solver="highs"
+    )
+    assert estado == "Optimal" and not plan.empty
+    # Las filas llevan el beneficio medio de los escenarios, no el margen con precio medio
+    assert plan["Beneficio_€"].sum() == pytest.approx(beneficio_medio, abs=0.01 * len(plan))
@@ -0,0 +1,20 @@
+from agro.data import loader
+from agro.data.loader import singleton_versionado
+
+
+# El objeto se construye una vez y solo se reconstruye cuando cambia la versión de alguno de sus datasets
+def test_singleton_versionado(monkeypatch):
+    versiones = {"demanda": 1, "calendario": 1}
+    monkeypatch.setattr(loader, "version_dataset", lambda nombre: versiones[nombre])
+    construidos = []
+
+    @singleton_versionado("demanda", "calendario")
+    def obtener_objeto():
+        construidos.append(object())
+        return construidos[-1]
+
+    assert obtener_objeto() is obtener_objeto() is construidos[0]
+    versiones["calendario"] = 2
+    assert obtener_objeto() is construidos[1]
+    assert obtener_objeto.__name__ == "obtener_objeto"
+    assert len(construidos) == 2
@@ -0,0 +1,92 @@
+import re
+
+import pytest
+
+from app import metricas_module
+from app.metricas_module import LIMITES_HISTOGRAMA, PREFIJO, REGISTRO, RegistroMetricas, activar_metricas, tramo
+
+LINEA = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+# Muestras del texto de Prometheus: {(métrica, etiquetas): valor}, comprobando de paso el formato de cada línea
+def _muestras(texto):
+    muestras = {}
+    for linea in texto.splitlines():
+        if linea.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) \w+ ", linea)
+            continue
+        coincidencia = LINEA.match(linea)
+        assert coincidencia, linea
+        nombre, etiquetas, valor = coincidencia.groups()
+        muestras[nombre, etiquetas or ""] = float(valor)
+    return muestras
+
+
+@pytest.fixture
+def metricas_activas():
+    antes = metricas_module.metricas_activas()
+    activar_metricas(True)
+    REGISTRO.reiniciar()
+    yield REGISTRO
+    REGISTRO.reiniciar()
+    activar_metricas(antes)
+
+
+def test_histograma_acumulado():
+    registro = RegistroMetricas()
+    for segundos in (0.0005, 0.02, 0.02, 3.0, 100.0):
+        registro.observar("resolucion", segundos)
+    registro.observar("resolucion", 0.2, error=True)
+    muestras = _muestras(registro.texto_prometheus())
+
+    cubetas = [muestras[f"{PREFIJO}_tramo_segundos_bucket", f'tramo="resolucion",le="{limite}"'] for limite in LIMITES_HISTOGRAMA]
+    assert cubetas == sorted(cubetas)
+    assert cubetas[0] == 1
+    assert muestras[f"{PREFIJO}_tramo_segundos_bucket", f'tramo="resolucion",le="{LIMITES_HISTOGRAMA[-1]}"'] == 5
+    assert muestras[f"{PREFIJO}_tramo_segundos_bucket", 'tramo="resolucion",le="+Inf"'] == 6
+    assert muestras[f"{PREFIJO}_tramo_segundos_count", 'tramo="resolucion"'] == 6
+    assert muestras[f"{PREFIJO}_tramo_segundos_sum", 'tramo="resolucion"'] == pytest.approx(103.2405)
+    assert muestras[f"{PREFIJO}_tramo_errores_total", 'tramo="resolucion"'] == 1
+
+
+def test_resoluciones_y_ultima_resolucion():
+    registro = RegistroMetricas()
+    registro.registrar_resolucion({"backend": "cbc", "estado": "Optimal", "variables": 10, "restricciones": 5, "segundos": 0.1, "gap": None})
+    registro.registrar_resolucion({"backend": "highs", "estado": "Optimal", "variables": 12, "restricciones": 6, "segundos": 0.2, "gap": 0.0})
+    muestras = _muestras(registro.texto_prometheus())
+    assert muestras[f"{PREFIJO}_resoluciones_total", 'backend="cbc",estado="Optimal"'] == 1
+    assert muestras[f"{PREFIJO}_solver_variables", 'backend="highs"'] == 12
+    assert muestras[f"{PREFIJO}_solver_gap", 'backend="highs"'] == 0.0
+
+
+def test_combinar_suma_lo_extraido():
+    origen, destino = RegistroMetricas(), RegistroMetricas()
+    origen.observar("poda", 0.003)
+    destino.observar("poda", 0.004)
+    destino.combinar(origen.extraer())
+    assert destino.tramos["poda"][0] == 2
+    assert destino.tramos["poda"][1] == pytest.approx(0.007)
+    assert origen.tramos == {}
+
+
+def test_tramos_anidados_forman_la_traza(metricas_activas):
+    with tramo("pipeline"):
+        with tramo("filtrado"):
+            pass
+        with tramo("resolucion"):
+            pass
+    traza = metricas_activas.trazas["pipeline"]
+    assert [fila["Tramo"] for fila in traza] == ["pipeline", "  filtrado", "  resolucion"]
+    assert {fila["Tramo"] for fila in metricas_activas.resumen()} >= {"pipeline"}
+
+
+def test_error_dentro_de_un_tramo(metricas_activas):
+    with pytest.raises(RuntimeError):
+        with tramo("extraccion"):
+            raise RuntimeError
+    assert metricas_activas.tramos["extraccion"][3] == 1
+
+
+def test_desactivadas_no_miden(monkeypatch):
+    monkeypatch.setitem(metricas_module._estado, "activas", False)
+    assert tramo("resolucion") is metricas_module._TRAMO_NULO
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+from agro.data import cargar_cultivos, obtener_cubo_demanda, obtener_tabla_costes, obtener_ventanas_siembra
+from app.multicultivo_module import ModeloMulticultivo, ResultadoMulticultivo, preparar_datos_multicultivo
+
+# Configuraciones de datos reales: (acceso al agua, zona climática, modo flexible, provincia equivalente)
+CONFIGURACIONES = [
+    ("medio", "mediterraneo", False, "Valencia"),
+    ("alto", "continental", False, "Zaragoza"),
+    ("alto", "mediterraneo", True, "Murcia"),
+]
+
+
+def _datos(acceso_agua, zona, modo_flexible, provincia_equiv):
+    return preparar_datos_multicultivo(
+        cargar_cultivos(), obtener_cubo_demanda(), acceso_agua, zona, modo_flexible, provincia_equiv=provincia_equiv,
+        ventanas=obtener_ventanas_siembra(), costes=obtener_tabla_costes()
+    )
+
+
+@pytest.fixture(scope="module", params=CONFIGURACIONES, ids=lambda c: "-".join(map(str, c)))
+def modelo_resuelto(request):
+    modelo_multi = ModeloMulticultivo(superficie_ha=1.5, **_datos(*request.param))
+    estado, beneficio = modelo_multi.resolver("highs")
+    assert estado == "Optimal"
+    return modelo_multi, beneficio
+
+
+# La extracción vectorizada da las mismas filas que recorrer las variables una a una
+def test_solucion_igual_que_recorrer_variables(modelo_resuelto):
+    modelo_multi, _ = modelo_resuelto
+    filas = []
+    for (p, m), x in modelo_multi.x.items():
+        if x.varValue and x.varValue > 0:
+            filas.append({
+                "Cultivo": p, "Mes": m, "Cantidad_kg": round(x.varValue, 2),
+                "Beneficio_€": round(x.varValue * modelo_multi.beneficios[p], 2),
+                "Superficie_ha": round(x.varValue / modelo_multi.rendimientos[p] / 10000, 4),
+            })
+    esperado = pd.DataFrame(filas).sort_values(["Cultivo", "Mes"]).reset_index(drop=True)
+    tabla = modelo_multi.resultado().sort_values(["Cultivo", "Mes"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(tabla, esperado, check_dtype=False)
+
+
+def test_tablas_completas_cuadran(modelo_resuelto):
+    modelo_multi, _ = modelo_resuelto
+    resultado = modelo_multi.solucion().completar(cargar_cultivos())
+    tablas = resultado.tablas()
+    resumen = tablas["resumen"]
+    assert resumen["Total_kg"].sum() == pytest.approx(resultado.cantidad_kg.sum())
+    assert resumen["Total_beneficio"].sum() == pytest.approx(resultado.beneficio.sum())
+    assert tablas["superficie_por_cultivo"]["Superficie_ha"].sum() == pytest.approx(resultado.superficie_ha.sum())
+    assert resumen["Cultivo"].is_monotonic_increasing
+    assert len(tablas["resultados"]) == len(resultado)
+    assert tablas["resultados"]["Plantas estimadas"].sum() == resumen["Plantas_estimadas"].sum()
+
+
+def test_copiar_y_desde_tabla(modelo_resuelto):
+    modelo_multi, _ = modelo_resuelto
+    resultado = modelo_multi.solucion().completar(cargar_cultivos())
+    copia = resultado.copiar()
+    copia.cantidad_kg[:] = 0
+    assert resultado.cantidad_kg.sum() > 0
+    # Las tablas salen copiadas: modificarlas no toca el resultado ni la copia
+    esperado = resultado.tablas()["resumen"]
+    assert esperado["Total_kg"].sum() > 0
+    resumen = copia.tablas()["resumen"]
+    resumen["Total_kg"] = 0
+    pd.testing.assert_frame_equal(resultado.tablas()["resumen"], esperado)
+    pd.testing.assert_frame_equal(copia.tablas()["resumen"], esperado)
+    pd.testing.assert_frame_equal(ResultadoMulticultivo.desde_tabla(resultado.tabla()).tabla(), resultado.tabla())
+
+
+def test_resultado_vacio():
+    vacio = ResultadoMulticultivo.desde_tabla(None).completar(cargar_cultivos())
+    assert len(vacio) == 0
+    assert all(tabla.empty for tabla in vacio.tablas().values())
+
+
+# Vista previa: fijo x al plan redondeado y z[p] = 1 en los cultivos que produce, y compruebo todas las
+# restricciones del MILP. El beneficio de la relajación acota por arriba el óptimo exacto.
+@pytest.mark.parametrize("configuracion", CONFIGURACIONES, ids=lambda c: "-".join(map(str, c)))
+@pytest.mark.parametrize("superficie_ha, presupuesto_agua_l", [(0.2, None), (1.5, None), (1.5, 1_500_000), (8.0, None)])
+def test_vista_previa_factible_y_acotada(configuracion, superficie_ha, presupuesto_agua_l):
+    datos = _datos(*configuracion)
+    modelo_multi = ModeloMulticultivo(superficie_ha=superficie_ha, presupuesto_agua_l=presupuesto_agua_l, **datos)
+    resultado, estado, beneficio_previa = modelo_multi.vista_previa()
+    assert estado == "Optimal"
+
+    kg = dict.fromkeys(modelo_multi.pares, 0.0)
+    for p, m, cantidad in zip(resultado.productos[resultado.indice], resultado.meses, resultado.cantidad_kg):
+        kg[p, m] = cantidad
+    for par, x in modelo_multi.x.items():
+        x.varValue = kg[par]
+        assert kg[par] == int(kg[par])
+    usados = {p for (p, _), cantidad in kg.items() if cantidad > 0}
+    for p, z in modelo_multi.z.items():
+        z.varValue = 1.0 if p in usados else 0.0
+    assert modelo_multi.modelo.valid(1e-6)
+    assert all(v.varValue >= 0 for v in modelo_multi.x.values())
+
+    exacto = ModeloMulticultivo(superficie_ha=superficie_ha, presupuesto_agua_l=presupuesto_agua_l, **datos)
+    _, beneficio_exacto = exacto.resolver("highs")
+    assert resultado.cota_superior >= beneficio_exacto - 0.01
+    assert beneficio_previa <= beneficio_exacto + 0.01
+    assert beneficio_previa == pytest.approx(resultado.beneficio.sum(), abs=0.05)
+
+
+def test_vista_previa_rechaza_modelos_ampliados():
+    modelo_multi = ModeloMulticultivo(superficie_ha=1.5, **_datos(*CONFIGURACIONES[0]))
+    modelo_multi.anadir_epsilon()
+    with pytest.raises(ValueError):
+        modelo_multi.vista_previa()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from agro.data import obtener_cubo_demanda, cargar_cultivos, obtener_tabla_costes, obtener_ventanas_siembra
+from app.multicultivo_module import frontera_pareto, marcar_eficientes, preparar_datos_multicultivo
+
+
+# Definición directa: j domina a i si es igual o mejor en los tres objetivos y estrictamente mejor en alguno
+def _dominado(puntos, i):
+    b, a, c = puntos[i]
+    return any(
+        bj >= b and aj <= a and cj >= c and (bj > b or aj < a or cj > c)
+        for j, (bj, aj, cj) in enumerate(puntos) if j != i
+    )
+
+
+def test_marcar_eficientes_ejemplo():
+    # (beneficio, agua, cultivos): el segundo está dominado por el primero, el cuarto repite al tercero
+    puntos = [(100.0, 50.0, 3), (90.0, 60.0, 3), (80.0, 20.0, 2), (80.0, 20.0, 2), (70.0, 20.0, 5)]
+    eficientes = marcar_eficientes(*zip(*puntos))
+    assert eficientes.tolist() == [True, False, True, True, True]
+
+
+def test_marcar_eficientes_aleatorio():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        puntos = list(zip(rng.integers(0, 6, 15).astype(float), rng.integers(0, 6, 15).astype(float), rng.integers(0, 4, 15)))
+        eficientes = marcar_eficientes(*zip(*puntos))
+        assert eficientes.tolist() == [not _dominado(puntos, i) for i in range(len(puntos))]
+
+
+@pytest.fixture(scope="module")
+def frontera():
+    datos = preparar_datos_multicultivo(
+        cargar_cultivos(), obtener_cubo_demanda(), "alto", "mediterraneo", True, provincia_equiv="Murcia",
+        ventanas=obtener_ventanas_siembra(), costes=obtener_tabla_costes()
+    )
+    return frontera_pareto(datos, {"superficie_ha": 1.5}, puntos_agua=5, niveles_diversidad=3)
+
+
+def test_frontera_solo_marca_no_dominados(frontera):
+    optimos = frontera.puntos[frontera.puntos["Estado"] == "Optimal"]
+    puntos = list(zip(optimos["Beneficio_€"].round(4), optimos["Agua_l"], optimos["Cultivos"].astype(int)))
+    assert optimos["Eficiente"].any()
+    for i, eficiente in enumerate(optimos["Eficiente"]):
+        assert eficiente == (not _dominado(puntos, i))
+    assert not frontera.puntos.loc[frontera.puntos["Estado"] != "Optimal", "Eficiente"].any()
+
+
+def test_frontera_respeta_los_limites(frontera):
+    optimos = frontera.puntos[frontera.puntos["Estado"] == "Optimal"]
+    limitados = optimos.dropna(subset=["Agua_max_l"])
+    assert (limitados["Agua_l"] <= limitados["Agua_max_l"] * (1 + 1e-6) + 1).all()
+    assert (optimos["Cultivos"] >= optimos["Cultivos_min"]).all()
+    # Ningún punto con límites supera el óptimo sin límites
+    assert (optimos["Beneficio_€"] <= frontera.referencia["Beneficio_€"] + 1e-6).all()
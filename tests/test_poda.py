@@ -0,0 +1,145 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from agro.data import cargar_cultivos, cargar_terreno, obtener_cubo_demanda, obtener_tabla_costes, obtener_ventanas_siembra
+from agro.service.pipeline import resolver_provincia
+from app.multicultivo_module import COLUMNAS_PODA, ModeloMulticultivo, ejecutar_modelo_multicultivo, podar_dominados
+
+# La poda no puede cambiar el óptimo: mismo estado y mismo beneficio con y sin ella
+PROVINCIAS = ("Murcia", "Valencia", "Zaragoza")
+NIVELES_AGUA = ("medio", "alto")
+SUPERFICIES_HA = (0.1, 1.5, 10.0)
+AGUA_L_POR_HA = 3_000_000
+TOLERANCIA = 1e-6
+
+
+def _resolver(datos, superficie_ha, presupuesto_agua_l=None):
+    modelo_multi = ModeloMulticultivo(superficie_ha=superficie_ha, presupuesto_agua_l=presupuesto_agua_l, **datos)
+    return modelo_multi.resolver("highs")
+
+
+def _mismo_optimo(con_poda, sin_poda):
+    assert con_poda[0] == sin_poda[0]
+    assert con_poda[1] == pytest.approx(sin_poda[1], rel=TOLERANCIA, abs=0.01)
+
+
+@pytest.mark.parametrize("provincia, acceso_agua, superficie_ha, modo_flexible, con_presupuesto", list(itertools.product(
+    PROVINCIAS, NIVELES_AGUA, SUPERFICIES_HA, (False, True), (False, True)
+)))
+def test_poda_no_cambia_el_optimo(provincia, acceso_agua, superficie_ha, modo_flexible, con_presupuesto):
+    provincia_equiv, zona = resolver_provincia(provincia)
+    argumentos = (
+        cargar_cultivos(), obtener_cubo_demanda(), cargar_terreno(), superficie_ha, "franco", acceso_agua, provincia_equiv, zona,
+        modo_flexible,
+    )
+    opciones = {
+        "solver": "highs", "ventanas": obtener_ventanas_siembra(), "costes": obtener_tabla_costes(),
+        "presupuesto_agua_l": AGUA_L_POR_HA * superficie_ha if con_presupuesto else None,
+    }
+    resultado, estado, beneficio = ejecutar_modelo_multicultivo.sin_cache(*argumentos, podar=True, **opciones)
+    _, estado_sin_poda, beneficio_sin_poda = ejecutar_modelo_multicultivo.sin_cache(*argumentos, podar=False, **opciones)
+    _mismo_optimo((estado, beneficio), (estado_sin_poda, beneficio_sin_poda))
+    # Con los datos reales siempre hay algo que podar; la dominancia la cubren los catálogos sintéticos
+    assert list(resultado.podados.columns) == COLUMNAS_PODA
+    assert not resultado.podados.empty
+
+
+# Catálogo sintético para los casos límite: cultivos con el mismo beneficio y duración, meses de inicio
+# encajados y agua por m² parecida
+def _datos(productos, beneficio, rendimiento, duracion, demanda, meses=None, agua=None):
+    datos = {
+        "productos": list(productos),
+        "beneficios": dict(zip(productos, beneficio)),
+        "rendimientos": dict(zip(productos, rendimiento)),
+        "duraciones": dict(zip(productos, duracion)),
+        "demandas": dict(zip(productos, demanda)),
+    }
+    if meses is not None:
+        datos["meses_inicio"] = dict(zip(productos, meses))
+    if agua is not None:
+        datos["consumo_agua"] = dict(zip(productos, agua))
+    return datos
+
+
+def test_empates_de_beneficio_y_duracion():
+    # A y B son idénticos y C es peor; A o B cubren solos todo el terreno, así que C sobra, pero no los dos gemelos
+    productos = ["A", "B", "C"]
+    datos = _datos(productos, [1.0, 1.0, 0.5], [1.0, 1.0, 1.0], [3, 3, 3], [100_000, 100_000, 100_000])
+    podados, registro = podar_dominados(datos, 1.0)
+    assert set(registro["Cultivo"]) <= {"B", "C"}
+    assert "A" in podados["productos"]
+    assert len(podados["productos"]) >= 1
+    _mismo_optimo(_resolver(podados, 1.0), _resolver(datos, 1.0))
+
+
+def test_empates_sin_demanda_suficiente():
+    # Con poca demanda ningún gemelo cubre el terreno: no se poda nada
+    productos = ["A", "B", "C"]
+    datos = _datos(productos, [1.0, 1.0, 1.0], [1.0, 1.0, 1.0], [3, 3, 3], [1_000, 1_000, 1_000])
+    podados, registro = podar_dominados(datos, 1.0)
+    assert registro.empty
+    assert podados is datos
+
+
+def test_empates_con_presupuesto_de_agua():
+    # A y B empatan en beneficio y duración pero B gasta más agua por m²: A domina a B
+    productos = ["A", "B"]
+    datos = _datos(productos, [1.0, 1.0], [1.0, 1.0], [3, 3], [100_000, 100_000], agua=[10.0, 20.0])
+    _, registro = podar_dominados(datos, 1.0, presupuesto_agua_l=50_000)
+    assert set(registro["Cultivo"]) == {"B"}
+    assert registro["Dominado_por"].tolist() == ["A"]
+    podados, _ = podar_dominados(datos, 1.0, presupuesto_agua_l=50_000)
+    _mismo_optimo(_resolver(podados, 1.0, 50_000), _resolver(datos, 1.0, 50_000))
+
+
+def test_presupuesto_de_agua_impide_dominar():
+    # A da más beneficio pero gasta más agua: con presupuesto de agua no domina a B, sin él sí
+    productos = ["A", "B"]
+    datos = _datos(productos, [1.5, 1.0], [1.0, 1.0], [3, 3], [100_000, 100_000], agua=[20.0, 10.0])
+    _, registro = podar_dominados(datos, 1.0, presupuesto_agua_l=50_000)
+    assert registro.empty
+    _, registro = podar_dominados(datos, 1.0)
+    assert set(registro["Cultivo"]) == {"B"}
+
+
+# Catálogos aleatorios pequeños con muchos empates (beneficios, duraciones y aguas de pocos valores)
+SEMILLAS = range(40)
+
+
+def _catalogo(semilla):
+    rng = np.random.default_rng(semilla)
+    n = 10
+    productos = [f"c{i}" for i in range(n)]
+    meses = [sorted(rng.choice(np.arange(1, 13), rng.integers(1, 13), replace=False).tolist()) for _ in range(n)]
+    datos = _datos(
+        productos,
+        beneficio=rng.choice([-0.2, 0.5, 1.0, 1.5], n),
+        rendimiento=rng.choice([0.5, 1.0, 2.0], n),
+        duracion=rng.integers(1, 7, n),
+        demanda=rng.choice([500, 5_000, 50_000, 200_000], n),
+        meses=meses if semilla % 2 else None,
+        agua=rng.choice([5.0, 10.0, 20.0], n),
+    )
+    superficie_ha = float(rng.choice([0.5, 1.0, 3.0]))
+    return datos, superficie_ha, (None, float(rng.choice([20_000, 100_000, 400_000])))
+
+
+@pytest.mark.parametrize("semilla", SEMILLAS)
+def test_catalogos_aleatorios(semilla):
+    datos, superficie_ha, presupuestos = _catalogo(semilla)
+    for presupuesto_agua_l in presupuestos:
+        podados, _ = podar_dominados(datos, superficie_ha, presupuesto_agua_l)
+        _mismo_optimo(_resolver(podados, superficie_ha, presupuesto_agua_l), _resolver(datos, superficie_ha, presupuesto_agua_l))
+
+
+# Los catálogos aleatorios tienen que podar por dominancia, con y sin agua (si no, la prueba anterior no demuestra nada)
+def test_catalogos_aleatorios_podan_dominados():
+    for con_presupuesto in (False, True):
+        motivos = []
+        for semilla in SEMILLAS:
+            datos, superficie_ha, presupuestos = _catalogo(semilla)
+            _, registro = podar_dominados(datos, superficie_ha, presupuestos[con_presupuesto])
+            motivos.extend(registro["Motivo"])
+        assert "dominado" in motivos
@@ -0,0 +1,87 @@
+import pytest
+
+from app.multicultivo_module import ModeloMulticultivo, planificar_rotacion
+
+# Catálogo sintético: la familia F1 da más beneficio que F2, así que sin rotación ocuparía todo el terreno
+SUPERFICIE_HA = 1.0
+FAMILIAS = {"A": "F1", "B": "F1", "C": "F2", "D": "F2"}
+TOLERANCIA = 1e-6
+
+
+def _modelo():
+    productos = list(FAMILIAS)
+    return ModeloMulticultivo(
+        productos=productos,
+        beneficios=dict(zip(productos, [2.0, 1.8, 1.0, 0.9])),
+        demandas=dict.fromkeys(productos, 100_000),
+        rendimientos=dict.fromkeys(productos, 1.0),
+        duraciones=dict(zip(productos, [4, 3, 4, 2])),
+        superficie_ha=SUPERFICIE_HA,
+    )
+
+
+def _coeficientes(modelo_multi):
+    return {
+        nombre: sorted((variable.name, coef) for variable, coef in restriccion.items())
+        for nombre, restriccion in modelo_multi.modelo.constraints.items()
+    }
+
+
+def test_actualizar_rotacion_solo_cambia_el_lado_derecho():
+    modelo_multi = _modelo()
+    modelo_multi.anadir_rotacion(FAMILIAS, {"F1": 0.25})
+    coeficientes = _coeficientes(modelo_multi)
+    constantes = {nombre: r.constant for nombre, r in modelo_multi.modelo.constraints.items()}
+
+    modelo_multi.actualizar_rotacion({"F1": 0.6, "F2": 2.0})
+    assert _coeficientes(modelo_multi) == coeficientes
+    restricciones = modelo_multi.rotacion["restricciones"]
+    # La superficie libre nunca es negativa aunque la campaña anterior declare más de la que hay
+    assert restricciones["F1"].constant == pytest.approx(-(SUPERFICIE_HA - 0.6))
+    assert restricciones["F2"].constant == 0.0
+    cambiadas = {n for n, r in modelo_multi.modelo.constraints.items() if r.constant != constantes[n]}
+    assert cambiadas == {r.name for r in restricciones.values()}
+
+
+@pytest.mark.parametrize("solver", ["cbc", "highs"])
+def test_modelo_persistente_igual_que_uno_nuevo(solver):
+    persistente = _modelo()
+    persistente.anadir_rotacion(FAMILIAS)
+    persistente.resolver(solver)
+    for previa in ({"F1": 0.6}, {"F1": 0.3, "F2": 0.7}, {}):
+        persistente.actualizar_rotacion(previa)
+        estado, beneficio = persistente.resolver(solver)
+        nuevo = _modelo()
+        nuevo.anadir_rotacion(FAMILIAS, previa)
+        assert (estado, beneficio) == pytest.approx(nuevo.resolver(solver), rel=TOLERANCIA)
+        for familia, ocupada in persistente.ocupacion_por_familia().items():
+            assert ocupada <= SUPERFICIE_HA - previa.get(familia, 0.0) + TOLERANCIA
+
+
+def test_penalizacion_permite_repetir_familia():
+    estricto, penalizado = _modelo(), _modelo()
+    estricto.anadir_rotacion(FAMILIAS, {"F1": SUPERFICIE_HA})
+    penalizado.anadir_rotacion(FAMILIAS, {"F1": SUPERFICIE_HA}, penalizacion_ha=1.0)
+    _, beneficio_estricto = estricto.resolver("highs")
+    _, beneficio_penalizado = penalizado.resolver("highs")
+    assert "F1" not in estricto.ocupacion_por_familia()
+    assert penalizado.penalizacion_rotacion() > 0
+    assert beneficio_penalizado >= beneficio_estricto - TOLERANCIA
+
+
+def test_planificar_rotacion_respeta_la_campana_anterior():
+    plan, resumen = planificar_rotacion(_modelo(), FAMILIAS, 4, {"F1": 0.4}, solver="highs")
+    assert resumen["Año"].tolist() == [1, 2, 3, 4]
+    assert set(plan["Familia"]) == {"F1", "F2"}
+    # Ocupación de cada familia por año (ha): máximo mensual de la superficie de sus siembras
+    previa = {"F1": 0.4}
+    modelo_multi = _modelo()
+    modelo_multi.anadir_rotacion(FAMILIAS, previa)
+    for anio in resumen["Año"]:
+        modelo_multi.resolver("highs")
+        ocupacion = modelo_multi.ocupacion_por_familia()
+        assert set(ocupacion) == set(plan.loc[plan["Año"] == anio, "Familia"])
+        for familia, ocupada in ocupacion.items():
+            assert ocupada <= SUPERFICIE_HA - previa.get(familia, 0.0) + TOLERANCIA
+        previa = ocupacion
+        modelo_multi.actualizar_rotacion(previa)
@@ -0,0 +1,136 @@
+import pytest
+from pulp import LpMaximize, LpProblem, LpVariable, value
+
+from agro.data import cargar_cultivos, cargar_terreno, obtener_cubo_demanda, obtener_tabla_costes, obtener_ventanas_siembra
+from agro.service.pipeline import resolver_provincia
+from app.multicultivo_module import ModeloMulticultivo, ejecutar_modelo_multicultivo
+from app.solver_module import BACKENDS, invalidar_estructura, resolver_modelo
+
+# CBC (subproceso) y HiGHS (en proceso) tienen que dar el mismo óptimo sobre el mismo modelo multicultivo
+PROVINCIAS = ("Murcia", "Valencia", "Zaragoza", "Badajoz")
+NIVELES_AGUA = ("medio", "alto")
+TOLERANCIA_RELATIVA = 1e-6
+
+
+def _modelo(provincia, acceso_agua, modo_flexible=False, presupuesto_agua_l=None):
+    provincia_equiv, zona = resolver_provincia(provincia)
+    return ModeloMulticultivo.desde_datos(
+        cargar_cultivos(), obtener_cubo_demanda(), 1.5, acceso_agua, zona, modo_flexible,
+        provincia_equiv=provincia_equiv, ventanas=obtener_ventanas_siembra(), costes=obtener_tabla_costes(),
+        presupuesto_agua_l=presupuesto_agua_l
+    )
+
+
+def _objetivo(modelo_multi, backend):
+    estado = resolver_modelo(modelo_multi.modelo, backend)
+    return estado, value(modelo_multi.modelo.objective)
+
+
+def test_backends_registrados():
+    assert {"cbc", "highs"} <= set(BACKENDS)
+
+
+@pytest.mark.parametrize("provincia", PROVINCIAS)
+@pytest.mark.parametrize("acceso_agua", NIVELES_AGUA)
+@pytest.mark.parametrize("modo_flexible", (False, True))
+def test_cbc_y_highs_mismo_objetivo(provincia, acceso_agua, modo_flexible):
+    estado_cbc, objetivo_cbc = _objetivo(_modelo(provincia, acceso_agua, modo_flexible), "cbc")
+    estado_highs, objetivo_highs = _objetivo(_modelo(provincia, acceso_agua, modo_flexible), "highs")
+    assert estado_cbc == estado_highs == "Optimal"
+    assert objetivo_highs == pytest.approx(objetivo_cbc, rel=TOLERANCIA_RELATIVA, abs=1e-6)
+
+
+@pytest.mark.parametrize("provincia", PROVINCIAS)
+def test_cbc_y_highs_mismo_objetivo_con_presupuesto_agua(provincia):
+    estado_cbc, objetivo_cbc = _objetivo(_modelo(provincia, "alto", presupuesto_agua_l=1_000_000), "cbc")
+    estado_highs, objetivo_highs = _objetivo(_modelo(provincia, "alto", presupuesto_agua_l=1_000_000), "highs")
+    assert estado_cbc == estado_highs == "Optimal"
+    assert objetivo_highs == pytest.approx(objetivo_cbc, rel=TOLERANCIA_RELATIVA, abs=1e-6)
+
+
+# Con acceso al agua "bajo" ningún cultivo del catálogo pasa el filtro: no se llega a construir el modelo
+@pytest.mark.parametrize("solver", ("cbc", "highs"))
+def test_agua_bajo_sin_solucion(solver):
+    provincia_equiv, zona = resolver_provincia("Murcia")
+    resultado, estado, beneficio = ejecutar_modelo_multicultivo.sin_cache(
+        cargar_cultivos(), obtener_cubo_demanda(), cargar_terreno(), 1.5, "franco", "bajo", provincia_equiv, zona,
+        solver=solver
+    )
+    assert estado == "Sin solución"
+    assert beneficio == 0.0
+    assert len(resultado) == 0
+
+
+# Un modelo infactible (todos los cultivos obligados a producir sin gastar agua) da Infeasible en los dos
+@pytest.mark.parametrize("solver", ("cbc", "highs"))
+def test_modelo_infactible(solver):
+    modelo_multi = _modelo("Murcia", "alto")
+    modelo_multi.anadir_epsilon()
+    modelo_multi.actualizar_epsilon(agua_max_l=0, cultivos_min=1)
+    assert resolver_modelo(modelo_multi.modelo, solver) == "Infeasible"
+
+
+# La forma matricial cacheada en el modelo no puede sobrevivir a un cambio de objetivo o de restricciones
+def _modelo_pequeno():
+    modelo = LpProblem("pequeno", LpMaximize)
+    x, y = LpVariable("x", lowBound=0), LpVariable("y", lowBound=0)
+    modelo += x + 2 * y
+    modelo += x + y <= 10, "capacidad"
+    return modelo, x, y
+
+
+def test_highs_detecta_cambio_de_objetivo():
+    modelo, x, y = _modelo_pequeno()
+    resolver_modelo(modelo, "highs")
+    assert (x.varValue, y.varValue) == (0.0, 10.0)
+    modelo.setObjective(3 * x + y)
+    resolver_modelo(modelo, "highs")
+    assert (x.varValue, y.varValue) == (10.0, 0.0)
+
+
+def test_highs_detecta_restriccion_sustituida():
+    modelo, x, y = _modelo_pequeno()
+    resolver_modelo(modelo, "highs")
+    modelo.constraints["capacidad"] = x + 4 * y <= 10
+    resolver_modelo(modelo, "highs")
+    assert (x.varValue, y.varValue) == pytest.approx((10.0, 0.0))
+
+
+def test_highs_coeficientes_cambiados_en_el_sitio():
+    modelo, x, y = _modelo_pequeno()
+    resolver_modelo(modelo, "highs")
+    modelo.constraints["capacidad"].addInPlace(3 * y)
+    invalidar_estructura(modelo)
+    resolver_modelo(modelo, "highs")
+    assert (x.varValue, y.varValue) == pytest.approx((10.0, 0.0))
+
+
+def test_highs_reutiliza_la_estructura_si_solo_cambia_el_lado_derecho():
+    modelo, x, y = _modelo_pequeno()
+    resolver_modelo(modelo, "highs")
+    estructura = modelo._estructura_matricial
+    modelo.constraints["capacidad"].constant = -20
+    resolver_modelo(modelo, "highs")
+    assert modelo._estructura_matricial is estructura
+    assert y.varValue == 20.0
+
+
+# Un modelo persistente que pasa a infactible no conserva el plan de la resolución anterior
+def test_highs_infactible_limpia_los_valores():
+    modelo, x, y = _modelo_pequeno()
+    modelo += x >= 5, "minimo_x"
+    assert resolver_modelo(modelo, "highs") == "Optimal"
+    assert x.varValue == 5.0
+    modelo.constraints["capacidad"].constant = 0
+    assert resolver_modelo(modelo, "highs") == "Infeasible"
+    assert x.varValue is None and y.varValue is None
+
+
+@pytest.mark.parametrize("solver", ("cbc", "highs"))
+def test_modelo_persistente_infactible_sin_plan(solver):
+    modelo_multi = _modelo("Murcia", "alto")
+    assert modelo_multi.resolver(solver)[0] == "Optimal"
+    modelo_multi.anadir_epsilon()
+    modelo_multi.actualizar_epsilon(agua_max_l=0, cultivos_min=1)
+    assert modelo_multi.resolver(solver) == ("Infeasible", 0.0)
+    assert len(modelo_multi.solucion()) == 0